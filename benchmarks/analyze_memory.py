@@ -0,0 +1,185 @@
+"""
+Peak memory of the /analyze ingest path (upload -> raw store ->
+normalize -> normalized store): the old read()-and-copy path against
+main._ingest.
+
+    python benchmarks/analyze_memory.py [--width 4032 --height 3024]
+
+Each mode runs in a fresh interpreter; peak RSS is the VmHWM growth
+over the ingest call, traced peak is tracemalloc (numpy included). The
+storage sink mimics google-cloud-storage: upload_from_string wraps the
+payload in a BytesIO, upload_from_file streams in chunks. "after"
+imports main, so it needs the service's dependencies installed.
+"""
+import os
+import io
+import sys
+import json
+import argparse
+import functools
+import resource
+import subprocess
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess import normalize_image
+from utils import storage_io
+
+# Starlette's UploadFile spool threshold
+SPOOL_MAX = 1024 * 1024
+CHUNK = 256 * 1024
+
+
+class _SinkBlob:
+    def upload_from_string(self, data, content_type=None):
+        stream = io.BytesIO(bytes(data) if not isinstance(data, bytes) else data)
+        while stream.read(CHUNK):
+            pass
+
+    def upload_from_file(self, f, size=None, content_type=None):
+        while f.read(CHUNK):
+            pass
+
+
+class _SinkBackend:
+    # storage_io backend over _SinkBlob, as GCSBackend calls the blob
+    kind = "sink"
+
+    def put_stream(self, name, fileobj, size=None, content_type=None):
+        fileobj.seek(0)
+        _SinkBlob().upload_from_file(fileobj, size=size, content_type=content_type)
+        return f"gs://sink/{name}"
+
+    def put_bytes(self, name, data, content_type=None):
+        _SinkBlob().upload_from_string(data, content_type=content_type)
+        return f"gs://sink/{name}"
+
+
+def _make_photo(width: int, height: int) -> bytes:
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 255, (height // 16, width // 16, 3), dtype=np.uint8)
+    img = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.integers(0, 24, img.shape, dtype=np.uint8)
+    ok, jpg = cv2.imencode(".jpg", cv2.add(img, noise), [cv2.IMWRITE_JPEG_QUALITY, 95])
+    return jpg.tobytes()
+
+
+def _spool(photo: bytes):
+    f = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    f.write(photo)
+    f.seek(0)
+    return f
+
+
+def run_before(spool):
+    # Previous main.analyze: read(), upload_from_string, defensive copies
+    raw_bytes = spool.read()
+    _SinkBlob().upload_from_string(raw_bytes)
+    norm_bytes, _ = normalize_image(raw_bytes)
+    if hasattr(norm_bytes, "tobytes"):
+        norm_bytes = norm_bytes.tobytes()
+    _SinkBlob().upload_from_string(bytes(norm_bytes))
+    return len(norm_bytes)
+
+
+def _import_main():
+    import main
+    storage_io._backends[main.BUCKET_NAME] = _SinkBackend()
+    return main
+
+
+def run_after(spool, main):
+    upload = SimpleNamespace(file=spool, filename="photo.jpg", content_type="image/jpeg")
+    norm_bytes, _, _, writes, _ = main._ingest(upload, 0, "bench")
+    for w in writes:
+        w.result()
+    return len(norm_bytes)
+
+
+def _reset_peak_rss():
+    # ru_maxrss survives fork+exec; Linux can reset the high-water mark
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(mode: str, photo_path: str) -> dict:
+    with open(photo_path, "rb") as f:
+        photo = f.read()
+    spool = _spool(photo)
+    del photo
+    # Imported up front so the service's own footprint is not counted
+    run = run_before if mode == "before" else functools.partial(run_after, main=_import_main())
+
+    _reset_peak_rss()
+    base_rss = _peak_rss_kb()
+    tracemalloc.start()
+    run(spool)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak_rss = _peak_rss_kb()
+
+    return {
+        "mode": mode,
+        "traced_peak_mb": round(peak / 2**20, 2),
+        "rss_growth_mb": round((peak_rss - base_rss) / 1024, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--width", type=int, default=4032)
+    ap.add_argument("--height", type=int, default=3024)
+    ap.add_argument("--mode", choices=("before", "after"))
+    ap.add_argument("--photo")
+    args = ap.parse_args()
+
+    if args.mode:
+        print(json.dumps(_measure(args.mode, args.photo)))
+        return
+
+    photo = _make_photo(args.width, args.height)
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        f.write(photo)
+        photo_path = f.name
+
+    print(f"photo: {args.width}x{args.height}, {len(photo) / 2**20:.2f} MB JPEG")
+    try:
+        for mode in ("before", "after"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--photo", photo_path],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(
+                f"{r['mode']:>6}: traced peak {r['traced_peak_mb']:7.2f} MB"
+                f"   RSS growth {r['rss_growth_mb']:7.2f} MB"
+            )
+    finally:
+        os.unlink(photo_path)
+
+
+if __name__ == "__main__":
+    main()
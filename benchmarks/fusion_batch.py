@@ -0,0 +1,114 @@
+"""
+Per-record cost of run_fusion_batch against repeated run_fusion calls.
+
+    python benchmarks/fusion_batch.py [--records 20000 --singles 2000 --repeat 5]
+
+Both paths see the same reliability snapshot (get_branch_reliability is
+pinned), so only the fusion work is timed. Records carry all five
+branches with a random one dropped 5% of the time, like /analyze
+results with a skipped or failed branch. Every timing is the best of
+--repeat runs; the batch moments engine is also checked against
+run_fusion with FUSION_ENGINE=moments.
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fusion import tfp_fusion
+from fusion.fusion_service import run_fusion, run_fusion_batch
+from fusion.weights_store import DEFAULTS
+
+
+def _records(n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    names = list(DEFAULTS)
+    out = []
+    for _ in range(n):
+        drop = names[rng.integers(len(names))] if rng.random() < 0.05 else None
+        out.append({
+            name: {
+                "confidence": float(rng.random()),
+                "p_same_object": float(rng.random()),
+            }
+            for name in names
+            if name != drop
+        })
+    return out
+
+
+def _close(a: dict, b: dict, tol: float = 1.5e-3) -> bool:
+    vals = lambda d: (
+        [d["probability_same_object"], *d["confidence_interval"]]
+        + [d["branch_weights"][k] for k in sorted(d["branch_weights"])]
+    )
+    return (
+        a["branch_weights"].keys() == b["branch_weights"].keys()
+        and np.allclose(vals(a), vals(b), rtol=0.0, atol=tol)
+    )
+
+
+def _best_us(fn, n: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best / n * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--records", type=int, default=20000)
+    ap.add_argument("--singles", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--min-ratio", type=float, default=50.0)
+    args = ap.parse_args()
+
+    snapshot = {k: dict(v) for k, v in DEFAULTS.items()}
+    tfp_fusion.get_branch_reliability = lambda: snapshot
+
+    records = _records(args.records)
+    singles = records[: args.singles]
+
+    single_us = _best_us(
+        lambda: [run_fusion(r) for r in singles], len(singles), args.repeat
+    )
+    print(f"run_fusion ({tfp_fusion.FUSION_ENGINE:8s}) {single_us:9.2f} us/record")
+
+    ratios = {}
+    for engine in ("moments", "numpy_mc"):
+        batch_us = _best_us(
+            lambda: run_fusion_batch(records, reliability=snapshot, engine=engine),
+            len(records), args.repeat,
+        )
+        ratios[engine] = single_us / batch_us
+        print(
+            f"run_fusion_batch ({engine:8s}) {batch_us:7.2f} us/record  "
+            f"{ratios[engine]:6.1f}x"
+        )
+
+    # Summation order differs, so a value on a rounding edge may move
+    # by one unit in the last (third) decimal
+    tfp_fusion.FUSION_ENGINE = "moments"
+    batch = run_fusion_batch(singles, reliability=snapshot, engine="moments")
+    mismatches = sum(
+        not _close(a, run_fusion(r)) for a, r in zip(batch, singles)
+    )
+    print(f"moments batch vs single: {mismatches} / {len(singles)} records differ")
+
+    default = tfp_fusion.BATCH_ENGINE
+    ok = ratios[default] >= args.min_ratio and mismatches == 0
+    print(
+        f"default batch engine {default}: {ratios[default]:.1f}x "
+        f"(target {args.min_ratio:.0f}x) {'OK' if ok else 'FAIL'}"
+    )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
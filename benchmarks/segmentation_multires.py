@@ -0,0 +1,116 @@
+"""
+Branch D foreground segmentation: full-resolution GrabCut vs the
+multi-resolution mode (downscaled GrabCut + band refinement).
+
+    python benchmarks/segmentation_multires.py [--repeat 3] [--work-side 384]
+
+Images from images/ and test-images/ are normalized like /analyze
+(768px max side). Reports per-image wall time for both modes, the
+speedup and the IoU of the multires mask against the full one. GrabCut
+initializes its colour models with k-means, so the full mask also
+varies with the RNG seed; "full~full" is the IoU between two seeds and
+is the noise floor for the multires IoU. Every run is seeded.
+--selfie also initializes from the MediaPipe selfie mask (needs
+mediapipe; its own cost is excluded, as in /analyze where Branch C
+already computed it).
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+
+import numpy as np
+import cv2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from preprocess import normalize_image
+from pipeline.frame import Frame
+from branch_de import segmentation
+
+_EXTS = (".png", ".jpg", ".jpeg")
+
+
+def _images() -> list:
+    paths = []
+    for d in ("images", "test-images"):
+        paths += sorted(
+            p for p in glob.glob(os.path.join(ROOT, d, "*"))
+            if p.lower().endswith(_EXTS)
+        )
+    return paths
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> float:
+    union = np.logical_or(a, b).sum()
+    if union == 0:
+        return 1.0
+    return float(np.logical_and(a, b).sum() / union)
+
+
+def _time(fn, repeat: int, seed: int = 0):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        cv2.setRNGSeed(seed)
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return out, best * 1000.0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--work-side", type=int, default=segmentation.SEGMENTATION_WORK_SIDE)
+    ap.add_argument("--band", type=int, default=segmentation.SEGMENTATION_BAND_PX)
+    ap.add_argument("--selfie", action="store_true")
+    args = ap.parse_args()
+
+    segmentation.SEGMENTATION_WORK_SIDE = args.work_side
+    segmentation.SEGMENTATION_BAND_PX = args.band
+    segmentation.SEGMENTATION_INIT = "auto"
+
+    rows = []
+    for path in _images():
+        with open(path, "rb") as f:
+            norm_bytes, _ = normalize_image(f.read())
+        frame = Frame.from_bytes(norm_bytes)
+        if args.selfie:
+            from branch_c.mask import foreground_mask
+            foreground_mask(frame)
+
+        full, full_ms = _time(lambda: segmentation._segment_full(frame.bgr), args.repeat)
+        full_alt, _ = _time(lambda: segmentation._segment_full(frame.bgr), 1, seed=1)
+        multi, multi_ms = _time(lambda: segmentation._segment_multires(frame), args.repeat)
+        rows.append((
+            os.path.relpath(path, ROOT), frame.shape, full_ms, multi_ms,
+            _iou(full, multi), _iou(full, full_alt),
+        ))
+
+    print(
+        f"{'image':28s} {'size':>9s} {'full ms':>9s} {'multi ms':>9s} "
+        f"{'speedup':>8s} {'IoU':>6s} {'full~full':>9s}"
+    )
+    for name, shape, full_ms, multi_ms, iou, floor in rows:
+        print(
+            f"{name:28s} {shape[1]:>4d}x{shape[0]:<4d} {full_ms:9.1f} {multi_ms:9.1f} "
+            f"{full_ms / multi_ms:7.1f}x {iou:6.3f} {floor:9.3f}"
+        )
+    if rows:
+        full_total = sum(r[2] for r in rows)
+        multi_total = sum(r[3] for r in rows)
+        ious = [r[4] for r in rows]
+        floors = [r[5] for r in rows]
+        print(
+            f"\n{len(rows)} images  total {full_total:.0f} ms -> {multi_total:.0f} ms "
+            f"({full_total / multi_total:.1f}x)  IoU mean {np.mean(ious):.3f} "
+            f"median {np.median(ious):.3f} min {np.min(ious):.3f}  "
+            f"(full~full mean {np.mean(floors):.3f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 import torch
-import timm
 import numpy as np
 import hashlib
-import io
 import logging
 from PIL import Image
 
+from pipeline.frame import Frame, as_frame
+from models.vit_backbone import trunk_tokens, features_from_trunk
+from models.batcher import make_batched
+
 # -------------------------------------------------------------------
 # Cloud Run SAFE settings
 # -------------------------------------------------------------------
@@ -14,7 +16,6 @@ _DEVICE = torch.device("cpu")  # FORCE CPU (Cloud Run safe)
 
 _clip_model = None
 _clip_preprocess = None
-_manuf_model = None
 
 # -------------------------------------------------------------------
 # Lazy model loaders
@@ -34,42 +35,37 @@ def _load_clip():
     return _clip_model, _clip_preprocess
 
 
-def _load_manuf_vit():
-    global _manuf_model
-    if _manuf_model is None:
-        logging.info("Loading ViT-Base for manufacturing signature (CPU)")
-        _manuf_model = timm.create_model(
-            "vit_base_patch16_224",
-            pretrained=True,
-            num_classes=0,
-        )
-        _manuf_model.eval()
-        _manuf_model.to(_DEVICE)
-    return _manuf_model
-
 # -------------------------------------------------------------------
 # Utility
 # -------------------------------------------------------------------
 
-def _load_image_from_bytes(image_bytes: bytes) -> Image.Image:
-    return Image.open(io.BytesIO(image_bytes)).convert("RGB")
+def _load_image_from_bytes(image_bytes: bytes | Frame) -> Image.Image:
+    # Wraps the shared decoded RGB view; no JPEG decode here
+    return Image.fromarray(as_frame(image_bytes).rgb)
 
 # -------------------------------------------------------------------
 # Branch A1 — CLIP semantic embedding
 # -------------------------------------------------------------------
 
-def get_clip_embedding_bytes(image_bytes: bytes) -> list:
+def _encode_clip_batch(image_input: torch.Tensor) -> torch.Tensor:
+    clip_model, _ = _load_clip()
+    with torch.no_grad():
+        emb = clip_model.encode_image(image_input.to(_DEVICE))
+        return emb / (emb.norm(dim=-1, keepdim=True) + 1e-6)
+
+
+# CLIP forwards from concurrent requests run as one batch
+_batched_clip = make_batched("clip", _encode_clip_batch)
+
+
+def get_clip_embedding_bytes(image_bytes: bytes | Frame) -> list:
     """
     CLIP semantic embedding (512D).
     """
     try:
-        clip_model, preprocess = _load_clip()
+        _, preprocess = _load_clip()
         image = _load_image_from_bytes(image_bytes)
-        image_input = preprocess(image).unsqueeze(0).to(_DEVICE)
-
-        with torch.no_grad():
-            emb = clip_model.encode_image(image_input)
-            emb = emb / (emb.norm(dim=-1, keepdim=True) + 1e-6)
+        emb = _batched_clip(preprocess(image).unsqueeze(0))
 
         return emb.cpu().numpy().flatten().tolist()
 
@@ -81,24 +77,16 @@ def get_clip_embedding_bytes(image_bytes: bytes) -> list:
 # Branch A2 — Manufacturing signature (ViT patch variance)
 # -------------------------------------------------------------------
 
-def get_manufacturing_signature_bytes(image_bytes: bytes) -> dict:
+def get_manufacturing_signature_bytes(image_bytes: bytes | Frame) -> dict:
     """
     Latent manufacturing fingerprint via ViT patch variance.
+
+    Uses the shared ViT-Base backbone; the trunk pass is cached on the
+    frame and reused by the Grad-CAM explainer.
     """
     try:
-        model = _load_manuf_vit()
-        image = _load_image_from_bytes(image_bytes).resize((224, 224))
-
-        img_tensor = (
-            torch.tensor(np.array(image))
-            .permute(2, 0, 1)
-            .unsqueeze(0)
-            .float()
-            / 255.0
-        ).to(_DEVICE)
-
-        with torch.no_grad():
-            features = model.forward_features(img_tensor)
+        tokens = trunk_tokens(as_frame(image_bytes))
+        features = features_from_trunk(tokens)
 
         patch_embeddings = features[:, 1:, :]  # drop CLS
         signature = torch.var(patch_embeddings, dim=1)
@@ -136,11 +124,54 @@ def get_manufacturing_signature_bytes(image_bytes: bytes) -> dict:
 # Unified processor
 # -------------------------------------------------------------------
 
-def process_image_bytes(image_bytes: bytes) -> dict:
+# Sub-signals Branch A can produce, in evaluation order
+BRANCH_A_OUTPUTS = ("manufacturing_signature", "clip_embedding")
+
+_PRODUCERS = {
+    "manufacturing_signature": get_manufacturing_signature_bytes,
+    "clip_embedding": get_clip_embedding_bytes,
+}
+
+
+def _resolve_outputs(outputs) -> tuple:
+    if outputs is None:
+        return BRANCH_A_OUTPUTS
+    selected = set(outputs)
+    unknown = selected - set(BRANCH_A_OUTPUTS)
+    if unknown:
+        raise ValueError(f"Unknown Branch A outputs: {sorted(unknown)}")
+    return tuple(o for o in BRANCH_A_OUTPUTS if o in selected)
+
+
+def process_image_bytes(
+    image_bytes: bytes | Frame,
+    outputs=None,
+) -> dict:
     """
     Unified Branch A output.
+
+    outputs: sub-signals to compute (default: all). Unselected
+    sub-signals are not computed and are absent from the result.
     """
+    frame = as_frame(image_bytes)
     return {
-        "clip_embedding": get_clip_embedding_bytes(image_bytes),
-        "manufacturing_signature": get_manufacturing_signature_bytes(image_bytes),
+        name: _PRODUCERS[name](frame)
+        for name in _resolve_outputs(outputs)
     }
+
+
+def run_branch_a(
+    image_bytes: bytes | Frame,
+    outputs=("manufacturing_signature",),
+) -> dict:
+    """
+    Branch A payload for /analyze: the manufacturing signature, with
+    the CLIP embedding attached when it is selected.
+    """
+    selected = set(outputs) | {"manufacturing_signature"}
+    out = process_image_bytes(image_bytes, outputs=selected)
+
+    payload = dict(out["manufacturing_signature"])
+    if "clip_embedding" in out:
+        payload["clip_embedding"] = out["clip_embedding"]
+    return payload
@@ -6,6 +6,8 @@ import google.auth
 from google import genai
 from google.genai.types import Part
 
+from utils import gemini_cache
+
 # -------------------------------------------------------------------
 # Environment
 # -------------------------------------------------------------------
@@ -51,10 +53,38 @@ def _get_client():
         )
     return _client
 
+
+def set_client(client):
+    """
+    Injects a client (e.g. utils.gemini_stub.StubGeminiClient) in place
+    of the Vertex AI one.
+    """
+    global _client
+    _client = client
+
 # -------------------------------------------------------------------
 # Robust JSON parsing (MANDATORY)
 # -------------------------------------------------------------------
 
+def _parse_json(text: str):
+    # Direct parse, then the first {...} block; None if neither works
+    try:
+        return json.loads(text)
+    except Exception:
+        pass
+    match = re.search(r"\{[\s\S]*?\}", text)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except Exception:
+            pass
+    return None
+
+
+def _is_json_object(text: str) -> bool:
+    return isinstance(_parse_json(text), dict)
+
+
 def _safe_json_parse(text: str) -> dict:
     if not text:
         return {
@@ -67,19 +97,10 @@ def _safe_json_parse(text: str) -> dict:
             "confidence": 0.5,
         }
 
-    # 1️⃣ Direct parse
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
-
-    # 2️⃣ Extract first JSON block (non-greedy)
-    match = re.search(r"\{[\s\S]*?\}", text)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except Exception:
-            pass
+    # 1️⃣ Direct parse, 2️⃣ first JSON block (non-greedy)
+    parsed = _parse_json(text)
+    if parsed is not None:
+        return parsed
 
     # 3️⃣ Hard fallback (never crash)
     logging.warning("Gemini returned malformed JSON, using fallback")
@@ -97,8 +118,26 @@ def _safe_json_parse(text: str) -> dict:
 # Gemini Vision – BYTES
 # -------------------------------------------------------------------
 
+SCENE_PROMPT = (
+    "Analyze the image and return ONLY valid JSON with keys:\n"
+    "{"
+    "\"semantics\":\"\","
+    "\"object_type\":\"\","
+    "\"distinctive_marks\":\"\","
+    "\"materials\":\"\","
+    "\"scene_context\":\"\","
+    "\"lighting_notes\":\"\","
+    "\"confidence\":0.0"
+    "}"
+)
+SCENE_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 300,
+}
+
+
 def gemini_scene_understanding_from_bytes(image_bytes: bytes) -> dict:
-    if not PROJECT_ID:
+    if not PROJECT_ID and _client is None:
         return {
             "semantics": "",
             "object_type": "object",
@@ -114,35 +153,26 @@ def gemini_scene_understanding_from_bytes(image_bytes: bytes) -> dict:
     try:
         client = _get_client()
 
-        prompt = (
-            "Analyze the image and return ONLY valid JSON with keys:\n"
-            "{"
-            "\"semantics\":\"\","
-            "\"object_type\":\"\","
-            "\"distinctive_marks\":\"\","
-            "\"materials\":\"\","
-            "\"scene_context\":\"\","
-            "\"lighting_notes\":\"\","
-            "\"confidence\":0.0"
-            "}"
-        )
-
-        response = client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[
-                Part.from_bytes(
-                    data=image_bytes,
-                    mime_type="image/jpeg",
-                ),
-                prompt,
-            ],
-            config={
-                "temperature": 0.2,
-                "max_output_tokens": 300,
-            },
+        def _generate():
+            response = client.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=[
+                    Part.from_bytes(
+                        data=image_bytes,
+                        mime_type="image/jpeg",
+                    ),
+                    SCENE_PROMPT,
+                ],
+                config=SCENE_CONFIG,
+            )
+            return getattr(response, "text", "") or ""
+
+        # Same photo + model + prompt -> reuse the stored answer
+        text = gemini_cache.memoized_text(
+            gemini_cache.make_key(image_bytes, GEMINI_MODEL, SCENE_PROMPT, SCENE_CONFIG),
+            _generate,
+            validate=_is_json_object,
         )
-
-        text = getattr(response, "text", "") or ""
         return _safe_json_parse(text)
 
     except Exception as e:
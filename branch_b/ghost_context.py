@@ -3,13 +3,28 @@ import numpy as np
 from branch_b.gemini_vision import gemini_scene_understanding_from_bytes
 from branch_b.mediapipe_geometry import mediapipe_geometry_from_bytes
 from branch_b.ghost_signals import ghost_signal_features_from_bytes
+from pipeline.frame import Frame, as_frame
 
 
-def build_ghost_context_embedding(norm_bytes: bytes) -> dict:
+# Returned when the request no longer needs this branch (early exit)
+CANCELLED = {"confidence": 0.0, "interpretation": "Cancelled"}
+
+
+def build_ghost_context_embedding(norm_bytes: bytes | Frame, cancel=None) -> dict:
+    """
+    cancel: optional threading.Event; once set, the Gemini call is
+    not started and the branch returns CANCELLED.
+    """
+    frame = as_frame(norm_bytes)
+    if cancel is not None and cancel.is_set():
+        return dict(CANCELLED)
+
     # Run sub-branches defensively
-    gemini = gemini_scene_understanding_from_bytes(norm_bytes) or {}
-    mp_geo = mediapipe_geometry_from_bytes(norm_bytes) or {}
-    ghost = ghost_signal_features_from_bytes(norm_bytes) or {}
+    gemini = gemini_scene_understanding_from_bytes(frame.encoded) or {}
+    if cancel is not None and cancel.is_set():
+        return dict(CANCELLED)
+    mp_geo = mediapipe_geometry_from_bytes(frame) or {}
+    ghost = ghost_signal_features_from_bytes(frame) or {}
 
     # Geometry vector (always fixed length)
     geo_vec = [
@@ -1,10 +1,11 @@
 import numpy as np
 import cv2
 
+from pipeline.frame import Frame, as_frame
 
-def _shadow_mask_score(bgr: np.ndarray) -> dict:
-    lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB)
-    L, _, _ = cv2.split(lab)
+
+def _shadow_mask_score(frame: Frame) -> dict:
+    L, _, _ = cv2.split(frame.lab)
 
     blur = cv2.GaussianBlur(L, (5, 5), 0)
     thr = cv2.adaptiveThreshold(
@@ -24,9 +25,8 @@ def _shadow_mask_score(bgr: np.ndarray) -> dict:
     return {"shadow_ratio": shadow_ratio}
 
 
-def _perspective_line_cues(bgr: np.ndarray) -> dict:
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 60, 160)
+def _perspective_line_cues(frame: Frame) -> dict:
+    edges = cv2.Canny(frame.gray, 60, 160)
 
     lines = cv2.HoughLinesP(
         edges, 1, np.pi / 180, threshold=80, minLineLength=60, maxLineGap=10
@@ -48,8 +48,8 @@ def _perspective_line_cues(bgr: np.ndarray) -> dict:
     return {"line_count": int(len(angles)), "angle_hist": hist}
 
 
-def _intensity_micro_patterns(bgr: np.ndarray) -> dict:
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+def _intensity_micro_patterns(frame: Frame) -> dict:
+    gray = frame.gray
     gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
     gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
     mag = cv2.magnitude(gx, gy)
@@ -57,16 +57,16 @@ def _intensity_micro_patterns(bgr: np.ndarray) -> dict:
     return {"gradient_energy": energy}
 
 
-def ghost_signal_features_from_bytes(image_bytes: bytes) -> dict:
-    bgr = cv2.imdecode(
-        np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR
-    )
-    if bgr is None:
+def ghost_signal_features_from_bytes(image_bytes: bytes | Frame) -> dict:
+    frame = as_frame(image_bytes)
+    try:
+        frame.bgr
+    except ValueError:
         return {"error": "Invalid image for ghost signals", "ghost_vector": []}
 
-    shadow = _shadow_mask_score(bgr)
-    perspective = _perspective_line_cues(bgr)
-    intensity = _intensity_micro_patterns(bgr)
+    shadow = _shadow_mask_score(frame)
+    perspective = _perspective_line_cues(frame)
+    intensity = _intensity_micro_patterns(frame)
 
     vector = [
         float(shadow.get("shadow_ratio", 0.0)),
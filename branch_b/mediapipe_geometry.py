@@ -1,16 +1,25 @@
-import numpy as np
-import cv2
 import logging
+import threading
 import mediapipe as mp
 
+from pipeline.frame import Frame, as_frame
+
 mp_holistic = mp.solutions.holistic
 
-# Global reusable holistic model
-_HOLISTIC = mp_holistic.Holistic(
-    static_image_mode=True,
-    model_complexity=1,
-    refine_face_landmarks=False,
-)
+# Global reusable holistic model (lazy; graphs are not re-entrant)
+_HOLISTIC = None
+_HOLISTIC_LOCK = threading.Lock()
+
+def _get_holistic():
+    global _HOLISTIC
+    if _HOLISTIC is None:
+        logging.info("Building MediaPipe Holistic graph")
+        _HOLISTIC = mp_holistic.Holistic(
+            static_image_mode=True,
+            model_complexity=1,
+            refine_face_landmarks=False,
+        )
+    return _HOLISTIC
 
 def _landmark_stats(landmarks, img_w: int, img_h: int):
     xs = [lm.x * img_w for lm in landmarks.landmark]
@@ -24,16 +33,16 @@ def _landmark_stats(landmarks, img_w: int, img_h: int):
         "count": len(landmarks.landmark),
     }
 
-def mediapipe_geometry_from_bytes(image_bytes: bytes) -> dict:
+def mediapipe_geometry_from_bytes(image_bytes: bytes | Frame) -> dict:
     try:
-        img = cv2.imdecode(
-            np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR
-        )
-        if img is None:
+        frame = as_frame(image_bytes)
+        try:
+            frame.bgr
+        except ValueError:
             return {"error": "Invalid image for mediapipe"}
 
-        h, w = img.shape[:2]
-        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        h, w = frame.height, frame.width
+        rgb = frame.rgb
 
         out = {
             "has_face": False,
@@ -46,7 +55,8 @@ def mediapipe_geometry_from_bytes(image_bytes: bytes) -> dict:
             "pose": None,
         }
 
-        res = _HOLISTIC.process(rgb)
+        with _HOLISTIC_LOCK:
+            res = _get_holistic().process(rgb)
 
         if res.face_landmarks:
             out["has_face"] = True
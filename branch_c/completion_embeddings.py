@@ -1,10 +1,15 @@
 import os
+import threading
 import numpy as np
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT")
 GEMINI_LOCATION = os.environ.get("GEMINI_LOCATION", "us-central1")
 
+# Max in-flight embedding requests across all Branch C calls
+EMBED_CONCURRENCY = int(os.environ.get("COMPLETION_EMBED_CONCURRENCY", "5"))
+
 _vertex_initialized = False
 _mm_model = None
 
@@ -49,3 +54,56 @@ def embed_completion_image_bytes(image_bytes: bytes) -> dict:
     except Exception as e:
         logging.exception("Completion embedding failed")
         return {"dims": 0, "embedding": [], "error": str(e)}
+
+
+# -------------------------------------------------------------------
+# Concurrent fan-out
+#
+# multimodalembedding@001 embeds one image per request, so completions
+# are embedded in parallel on a bounded pool (~1 RTT instead of n).
+# -------------------------------------------------------------------
+
+_embed_pool = None
+_embed_pool_lock = threading.Lock()
+
+
+def _get_embed_pool() -> ThreadPoolExecutor:
+    global _embed_pool
+    if _embed_pool is None:
+        with _embed_pool_lock:
+            if _embed_pool is None:
+                _embed_pool = ThreadPoolExecutor(
+                    max_workers=max(1, EMBED_CONCURRENCY),
+                    thread_name_prefix="completion-embed",
+                )
+    return _embed_pool
+
+
+def _embed_unless_cancelled(image_bytes: bytes, cancel=None) -> dict:
+    if cancel is not None and cancel.is_set():
+        return {"dims": 0, "embedding": [], "error": "cancelled"}
+    return embed_completion_image_bytes(image_bytes)
+
+
+def iter_completion_embeddings(images: list, cancel=None):
+    """
+    Yields (index, embedding dict) for each image as soon as its
+    embedding returns, in completion order.
+
+    cancel: optional threading.Event checked before each embedding
+    call; images not yet sent come back with dims=0.
+    """
+    if not images:
+        return
+    if len(images) == 1:
+        yield 0, _embed_unless_cancelled(images[0], cancel)
+        return
+
+    pool = _get_embed_pool()
+    futures = {
+        pool.submit(_embed_unless_cancelled, img, cancel): i
+        for i, img in enumerate(images)
+    }
+    for fut in as_completed(futures):
+        # embed_completion_image_bytes never raises
+        yield futures[fut], fut.result()
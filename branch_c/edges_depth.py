@@ -1,38 +1,73 @@
+from functools import lru_cache
+
 import numpy as np
 import cv2
 
+from pipeline.frame import Frame, as_frame
 
-def edge_map_bytes(image_bytes: bytes) -> bytes:
-    bgr = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
-    if bgr is None:
-        raise ValueError("Invalid image for edges")
-
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 60, 160)
+# -------------------------------------------------------------------
+# In-process conditioning maps (uint8 arrays, no PNG round-trip)
+# -------------------------------------------------------------------
 
-    ok, png = cv2.imencode(".png", edges)
-    if not ok:
-        raise RuntimeError("Edge map encode failed")
-    return png.tobytes()
+def edge_map(image_bytes: bytes | Frame) -> np.ndarray:
+    """
+    Canny edges [H,W] uint8, computed once per frame.
+    """
+    frame = as_frame(image_bytes)
+    return frame.memo("edge_map", lambda: cv2.Canny(frame.gray, 60, 160))
 
 
-def depth_prior_bytes(image_bytes: bytes) -> bytes:
+@lru_cache(maxsize=32)
+def depth_prior(h: int, w: int) -> np.ndarray:
     """
-    Cheap depth prior: radial gradient (center=near).
+    Cheap depth prior: radial gradient (center=near). Depends only on
+    the size, so it is built once per (h, w) and shared read-only.
     """
-    bgr = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
-    if bgr is None:
-        raise ValueError("Invalid image for depth prior")
-
-    h, w = bgr.shape[:2]
-    yy, xx = np.mgrid[0:h, 0:w]
     cy, cx = h / 2.0, w / 2.0
-    dist = np.sqrt((yy - cy) ** 2 + (xx - cx) ** 2)
-    dist = dist / (dist.max() + 1e-6)
+    yy = (np.arange(h, dtype=np.float32) - cy) ** 2
+    xx = (np.arange(w, dtype=np.float32) - cx) ** 2
+    dist = np.sqrt(yy[:, None] + xx[None, :])
+    dist /= dist.max() + 1e-6
 
     depth = ((1.0 - dist) * 255.0).astype(np.uint8)
+    depth.flags.writeable = False
+    return depth
+
+# -------------------------------------------------------------------
+# Conditioning-artifact stage
+# -------------------------------------------------------------------
+
+CONDITIONING_ARTIFACTS = {
+    "edges": edge_map,
+    "depth_prior": lambda frame: depth_prior(frame.height, frame.width),
+}
+
+
+def build_conditioning(image_bytes: bytes | Frame, requires) -> dict:
+    """
+    Produces only the artifacts a downstream consumer declared it needs.
+    """
+    unknown = [r for r in requires if r not in CONDITIONING_ARTIFACTS]
+    if unknown:
+        raise ValueError(f"Unknown conditioning artifacts: {unknown}")
+
+    frame = as_frame(image_bytes)
+    return {name: CONDITIONING_ARTIFACTS[name](frame) for name in requires}
+
+# -------------------------------------------------------------------
+# PNG encoders (for consumers outside this process)
+# -------------------------------------------------------------------
+
+def edge_map_bytes(image_bytes: bytes | Frame) -> bytes:
+    ok, png = cv2.imencode(".png", edge_map(image_bytes))
+    if not ok:
+        raise RuntimeError("Edge map encode failed")
+    return png.tobytes()
+
 
-    ok, png = cv2.imencode(".png", depth)
+def depth_prior_bytes(image_bytes: bytes | Frame) -> bytes:
+    frame = as_frame(image_bytes)
+    ok, png = cv2.imencode(".png", depth_prior(frame.height, frame.width))
     if not ok:
         raise RuntimeError("Depth prior encode failed")
     return png.tobytes()
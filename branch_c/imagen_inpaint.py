@@ -5,6 +5,10 @@ PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT")
 IMAGEN_LOCATION = os.environ.get("IMAGEN_LOCATION", "us-central1")
 IMAGEN_MODEL = os.environ.get("IMAGEN_MODEL", "imagegeneration@002")
 
+# Conditioning maps (branch_c.edges_depth) this model consumes besides
+# base image + mask. edit_image takes neither edges nor depth.
+REQUIRES_CONDITIONING = ()
+
 _vertex_initialized = False
 _imagen_model = None
 
@@ -2,31 +2,48 @@ import numpy as np
 import cv2
 import mediapipe as mp
 import logging
+import threading
+
+from pipeline.frame import Frame, as_frame
 
 mp_selfie = mp.solutions.selfie_segmentation
 
-# Reusable segmentation model
-_SELFIE = mp_selfie.SelfieSegmentation(model_selection=1)
+# Reusable segmentation model (lazy; graphs are not re-entrant)
+_SELFIE = None
+_SELFIE_LOCK = threading.Lock()
+
+
+def _get_selfie():
+    global _SELFIE
+    if _SELFIE is None:
+        logging.info("Building MediaPipe selfie segmentation graph")
+        _SELFIE = mp_selfie.SelfieSegmentation(model_selection=1)
+    return _SELFIE
 
 
-def generate_object_mask_bytes(image_bytes: bytes) -> bytes:
+def _segment(frame: Frame) -> np.ndarray:
+    with _SELFIE_LOCK:
+        res = _get_selfie().process(frame.rgb)
+    if res.segmentation_mask is None:
+        raise RuntimeError("Segmentation failed")
+    return res.segmentation_mask
+
+
+def foreground_mask(image_bytes: bytes | Frame) -> np.ndarray:
     """
-    Returns a PNG mask (white=edit area, black=keep area).
+    Boolean foreground mask [H,W]; one MediaPipe pass per frame, shared
+    by the occlusion estimate and the inpaint mask.
     """
-    try:
-        bgr = cv2.imdecode(
-            np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR
-        )
-        if bgr is None:
-            raise ValueError("Invalid image for mask")
-
-        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-        res = _SELFIE.process(rgb)
+    frame = as_frame(image_bytes)
+    return frame.memo("selfie_foreground", lambda: _segment(frame) > 0.5)
 
-        if res.segmentation_mask is None:
-            raise RuntimeError("Segmentation failed")
 
-        mask = (res.segmentation_mask > 0.5).astype(np.uint8) * 255
+def generate_object_mask_bytes(image_bytes: bytes | Frame) -> bytes:
+    """
+    Returns a PNG mask (white=edit area, black=keep area).
+    """
+    try:
+        mask = foreground_mask(image_bytes).astype(np.uint8) * 255
         inv = 255 - mask
         inv = cv2.GaussianBlur(inv, (9, 9), 0)
 
@@ -0,0 +1,124 @@
+import os
+import math
+import numpy as np
+import cv2
+
+from branch_c.mask import foreground_mask
+from pipeline.frame import Frame, as_frame
+
+# -------------------------------------------------------------------
+# Policy configuration
+# -------------------------------------------------------------------
+
+MAX_COMPLETIONS = 5
+# Below this occlusion score the object counts as fully visible (n=0)
+SKIP_BELOW = float(os.environ.get("BRANCH_C_OCCLUSION_SKIP", "0.1"))
+# Foreground coverage outside [min, max] gives nothing sensible to inpaint
+MIN_COVERAGE = float(os.environ.get("BRANCH_C_MIN_COVERAGE", "0.01"))
+MAX_COVERAGE = float(os.environ.get("BRANCH_C_MAX_COVERAGE", "0.98"))
+# Without a usable (person) foreground the branch has seen nothing:
+# neutral vote, low weight in fusion
+NO_FOREGROUND_CONFIDENCE = float(os.environ.get("BRANCH_C_NO_FOREGROUND_CONFIDENCE", "0.2"))
+# Fully visible object, inpainting skipped: no completions, so still a
+# neutral vote, weighted a little above the no-foreground case
+FULLY_VISIBLE_CONFIDENCE = float(os.environ.get("BRANCH_C_FULLY_VISIBLE_CONFIDENCE", "0.3"))
+
+# Rough list prices (USD) used for the per-request cost record
+IMAGEN_COST_PER_IMAGE = float(os.environ.get("IMAGEN_COST_PER_IMAGE_USD", "0.02"))
+EMBED_COST_PER_IMAGE = float(os.environ.get("MM_EMBED_COST_PER_IMAGE_USD", "0.0002"))
+
+# -------------------------------------------------------------------
+# Occlusion estimate from the foreground mask
+# -------------------------------------------------------------------
+
+def estimate_occlusion(image_bytes: bytes | Frame) -> dict:
+    """
+    Cheap occlusion score in [0,1] from the segmentation mask:
+      - border: share of the object's outline lying on the image edge
+        (object cut off by the frame)
+      - concavity: 1 - solidity (foreground pixels / convex hull area);
+        bites and holes cut into the silhouette by occluders
+      - fragmentation: object split into several sizeable components
+    """
+    fg = foreground_mask(as_frame(image_bytes))
+    h, w = fg.shape
+    coverage = float(fg.mean())
+
+    out = {
+        "coverage": round(coverage, 4),
+        "border": 0.0,
+        "concavity": 0.0,
+        "fragments": 0,
+        "score": 0.0,
+    }
+    if coverage < MIN_COVERAGE or coverage > MAX_COVERAGE:
+        return out
+
+    mask = fg.astype(np.uint8)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+
+    min_area = MIN_COVERAGE * h * w
+    areas = np.array([cv2.contourArea(c) for c in contours], dtype=np.float64)
+    big = [c for c, a in zip(contours, areas) if a >= min_area]
+    if not big:
+        return out
+
+    pts = np.concatenate([c.reshape(-1, 2) for c in big])
+    on_edge = (
+        (pts[:, 0] == 0) | (pts[:, 0] == w - 1)
+        | (pts[:, 1] == 0) | (pts[:, 1] == h - 1)
+    )
+    border = float(on_edge.mean())
+
+    # Pixel count, not contour area, so interior holes count too
+    area = float(np.count_nonzero(mask))
+    hull_area = float(cv2.contourArea(cv2.convexHull(pts.astype(np.int32))))
+    concavity = max(0.0, 1.0 - area / hull_area) if hull_area > 0 else 0.0
+
+    fragments = len(big)
+    fragmentation = 1.0 - 1.0 / fragments
+
+    score = min(1.0, 2.0 * border + 0.8 * concavity + 0.5 * fragmentation)
+
+    out.update(
+        {
+            "border": round(border, 4),
+            "concavity": round(concavity, 4),
+            "fragments": fragments,
+            "score": round(score, 4),
+        }
+    )
+    return out
+
+# -------------------------------------------------------------------
+# Completion-count policy
+# -------------------------------------------------------------------
+
+def choose_completion_count(occlusion: dict, max_n: int = MAX_COMPLETIONS) -> tuple:
+    """
+    Returns (n, reason). n scales with the occlusion score; fully
+    visible objects (or no usable foreground) skip inpainting.
+    """
+    coverage = occlusion["coverage"]
+    if coverage < MIN_COVERAGE:
+        return 0, "no_foreground"
+    if coverage > MAX_COVERAGE:
+        return 0, "foreground_fills_frame"
+    if occlusion["score"] < SKIP_BELOW:
+        return 0, "fully_visible"
+    n = min(max_n, max(1, math.ceil(occlusion["score"] * max_n)))
+    return n, "occluded"
+
+
+def skipped_confidence(reason: str) -> float:
+    """
+    Confidence of the neutral (p_same_object=0.5) output returned when
+    no completions are generated.
+    """
+    if reason == "fully_visible":
+        return FULLY_VISIBLE_CONFIDENCE
+    return NO_FOREGROUND_CONFIDENCE
+
+
+def completion_cost_usd(n: int) -> float:
+    return round(n * (IMAGEN_COST_PER_IMAGE + EMBED_COST_PER_IMAGE), 5)
@@ -1,18 +1,48 @@
 from branch_c.mask import generate_object_mask_bytes
-from branch_c.edges_depth import edge_map_bytes, depth_prior_bytes
-from branch_c.imagen_inpaint import imagen_inpaint_completions
-from branch_c.completion_embeddings import embed_completion_image_bytes
+from branch_c.edges_depth import build_conditioning
+from branch_c.imagen_inpaint import imagen_inpaint_completions, REQUIRES_CONDITIONING
+from branch_c.completion_embeddings import iter_completion_embeddings
+from branch_c.occlusion import (
+    MAX_COMPLETIONS,
+    estimate_occlusion,
+    choose_completion_count,
+    completion_cost_usd,
+    skipped_confidence,
+)
+from pipeline.frame import Frame, as_frame
 import logging
 
 
-def run_partial_object_completion(norm_jpg_bytes: bytes, n: int = 5) -> dict:
+def run_partial_object_completion(
+    norm_jpg_bytes: bytes | Frame,
+    n: int | None = None,
+    requires: tuple = (),
+    max_n: int = MAX_COMPLETIONS,
+    cancel=None,
+) -> dict:
     """
     Full Branch C pipeline with graceful degradation.
+
+    n=None picks the completion count (0..max_n) from an occlusion
+    estimate on the segmentation mask; an explicit n is used as is.
+
+    Edge / depth conditioning maps are built only if Imagen or the
+    caller (requires) asks for them.
+
+    cancel: optional threading.Event checked before the Imagen call and
+    before each embedding call; once set, the remaining paid calls are
+    not made.
     """
+    frame = as_frame(norm_jpg_bytes)
     try:
-        mask_png = generate_object_mask_bytes(norm_jpg_bytes)
-        _ = edge_map_bytes(norm_jpg_bytes)
-        _ = depth_prior_bytes(norm_jpg_bytes)
+        occlusion = estimate_occlusion(frame)
+        if n is None:
+            n, reason = choose_completion_count(occlusion, max_n=max_n)
+        else:
+            reason = "fixed"
+        conditioning = build_conditioning(
+            frame, tuple(dict.fromkeys(REQUIRES_CONDITIONING + tuple(requires)))
+        )
     except Exception:
         logging.exception("Preprocessing failed for partial completion")
         return {
@@ -22,45 +52,93 @@ def run_partial_object_completion(norm_jpg_bytes: bytes, n: int = 5) -> dict:
             "interpretation": "Preprocessing failed",
         }
 
+    policy = {
+        "occlusion": occlusion,
+        "n_requested": n,
+        "max_n": max_n,
+        "reason": reason,
+        "estimated_cost_usd": completion_cost_usd(n),
+        "saved_cost_usd": completion_cost_usd(max(0, max_n - n)),
+    }
+
+    if n <= 0:
+        # Fully visible (or nothing to inpaint): no Imagen / embedding calls.
+        # Fusion falls back to confidence for p_same_object; pin the vote
+        # to neutral so the low confidence only lowers its weight
+        return {
+            "confidence": skipped_confidence(reason),
+            "p_same_object": 0.5,
+            "completions_generated": 0,
+            "has_edges": "edges" in conditioning,
+            "has_depth_prior": "depth_prior" in conditioning,
+            "interpretation": f"Inpainting skipped ({reason})",
+            "completion_policy": policy,
+            "completion_embeddings": [],
+        }
+
+    try:
+        mask_png = generate_object_mask_bytes(frame)
+    except Exception:
+        logging.exception("Mask generation failed for partial completion")
+        return {
+            "confidence": 0.0,
+            "completions_generated": 0,
+            "completion_embeddings": [],
+            "completion_policy": policy,
+            "interpretation": "Preprocessing failed",
+        }
+
     prompt = (
         "Complete the partially visible object realistically. "
         "Preserve the object's original material, color, and structure. "
         "Do not change the background."
     )
 
+    if cancel is not None and cancel.is_set():
+        return {
+            "confidence": 0.0,
+            "completions_generated": 0,
+            "completion_embeddings": [],
+            "completion_policy": policy,
+            "interpretation": "Cancelled",
+        }
+
     completions = imagen_inpaint_completions(
-        base_jpg_bytes=norm_jpg_bytes,
+        base_jpg_bytes=frame.encoded,
         mask_png_bytes=mask_png,
         prompt=prompt,
         n=n,
     )
 
-    completion_outputs = []
-
+    images = []
     for img in completions:
         img_bytes = getattr(img, "_image_bytes", None) or getattr(
             img, "image_bytes", None
         )
-        if not img_bytes:
+        if img_bytes:
+            images.append(img_bytes)
+
+    # Embedded concurrently; kept in completion-index order
+    by_index = {}
+    for i, emb in iter_completion_embeddings(images, cancel=cancel):
+        if emb.get("dims", 0) <= 0:
             continue
+        by_index[i] = {
+            "embedding_dims": emb["dims"],
+            "embedding": emb["embedding"],
+        }
 
-        emb = embed_completion_image_bytes(img_bytes)
-        if emb.get("dims", 0) > 0:
-            completion_outputs.append(
-                {
-                    "embedding_dims": emb["dims"],
-                    "embedding": emb["embedding"],
-                }
-            )
+    completion_outputs = [by_index[i] for i in sorted(by_index)]
 
     return {
         "confidence": 0.78,
         "completions_generated": len(completion_outputs),
-        "has_edges": True,
-        "has_depth_prior": True,
+        "has_edges": "edges" in conditioning,
+        "has_depth_prior": "depth_prior" in conditioning,
         "interpretation": (
             "Imagen inpainting completions + embeddings "
             "for occlusion robustness"
         ),
+        "completion_policy": policy,
         "completion_embeddings": completion_outputs,
     }
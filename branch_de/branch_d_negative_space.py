@@ -1,18 +1,17 @@
 from branch_de.segmentation import segment_foreground_mask
-from branch_de.negative_space_signature import (
-    edge_irregularity_score,
-    find_void_regions,
-    negative_space_signature_128,
-)
+from branch_de.geometry import extract_geometry
+from branch_de.negative_space_signature import negative_space_signature_128
 from branch_de.void_graph import build_void_graph
+from pipeline.frame import Frame
 import logging
 
 
-def run_branch_d_negative_space(norm_jpg_bytes: bytes) -> dict:
+def run_branch_d_negative_space(norm_jpg_bytes: bytes | Frame) -> dict:
     try:
         fg_mask = segment_foreground_mask(norm_jpg_bytes)
-        edge_irreg = edge_irregularity_score(fg_mask)
-        voids, _ = find_void_regions(fg_mask)
+        # One contour / hull / component pass shared by everything below
+        voids = extract_geometry(fg_mask)
+        edge_irreg = voids.edge_irregularity()
 
         sig128 = negative_space_signature_128(voids, edge_irreg)
         graph = build_void_graph(voids)
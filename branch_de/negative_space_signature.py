@@ -1,65 +1,25 @@
 import numpy as np
-import cv2
 
+from branch_de.geometry import VoidGeometry, extract_geometry, void_arrays
 
-def edge_irregularity_score(fg_mask: np.ndarray) -> float:
-    fg = (fg_mask * 255).astype(np.uint8)
-    contours, _ = cv2.findContours(
-        fg, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-    )
-    if not contours:
-        return 1.0
 
-    c = max(contours, key=cv2.contourArea)
-    perim = cv2.arcLength(c, True)
-    area = cv2.contourArea(c)
-
-    circularity = 4 * np.pi * area / (perim * perim + 1e-6)
-    circularity = max(circularity, 1e-3)
-
-    return float(1.0 / circularity)
+def edge_irregularity_score(fg_mask: np.ndarray | VoidGeometry) -> float:
+    geom = fg_mask if isinstance(fg_mask, VoidGeometry) else extract_geometry(fg_mask)
+    return geom.edge_irregularity()
 
 
 def find_void_regions(fg_mask: np.ndarray):
-    fg = (fg_mask * 255).astype(np.uint8)
-
-    contours, _ = cv2.findContours(
-        fg, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
-    )
-    if not contours:
-        return [], np.zeros_like(fg)
+    """
+    Legacy interface: (per-void dicts, void mask). Branch D uses
+    extract_geometry() directly.
+    """
+    geom = extract_geometry(fg_mask)
+    return geom.to_records(), geom.void_mask
 
-    c = max(contours, key=cv2.contourArea)
-    hull = cv2.convexHull(c)
 
-    filled = np.zeros_like(fg)
-    cv2.drawContours(filled, [hull], -1, 255, thickness=-1)
-
-    void_mask = cv2.subtract(filled, fg)
-
-    n, labels, stats, centroids = cv2.connectedComponentsWithStats(
-        void_mask
-    )
-
-    voids = []
-    for i in range(1, n):
-        x, y, w, h, area = stats[i]
-        if area < 100:
-            continue
-        cx, cy = centroids[i]
-        voids.append(
-            {
-                "bbox": [int(x), int(y), int(x + w), int(y + h)],
-                "area": int(area),
-                "centroid": [float(cx), float(cy)],
-            }
-        )
-
-    return voids, void_mask
-
-
-def negative_space_signature_128(voids: list, edge_irreg: float) -> list:
-    areas = np.array([v["area"] for v in voids], dtype=np.float32)
+def negative_space_signature_128(voids: VoidGeometry | list, edge_irreg: float) -> list:
+    areas, centroids = void_arrays(voids)
+    areas = areas.astype(np.float32)
 
     if areas.size == 0:
         area_hist = np.zeros(64, dtype=np.float32)
@@ -71,10 +31,10 @@ def negative_space_signature_128(voids: list, edge_irreg: float) -> list:
         area_hist = area_hist.astype(np.float32)
         area_hist /= area_hist.sum() + 1e-6
 
-    if len(voids) == 0:
+    if areas.size == 0:
         rad_hist = np.zeros(32, dtype=np.float32)
     else:
-        cxy = np.array([v["centroid"] for v in voids], dtype=np.float32)
+        cxy = centroids.astype(np.float32)
         minxy = cxy.min(axis=0)
         maxxy = cxy.max(axis=0)
         norm = (cxy - minxy) / ((maxxy - minxy) + 1e-6)
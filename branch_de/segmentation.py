@@ -1,46 +1,207 @@
+import os
 import numpy as np
 import cv2
 import logging
 
+from pipeline.frame import Frame, as_frame
 
-def segment_foreground_mask(norm_jpg_bytes: bytes) -> np.ndarray:
+# -------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------
+
+# "full": GrabCut on the full image; "multires" (opt-in): GrabCut on a
+# downscaled copy, refined at full resolution in a band around the
+# boundary. multires masks diverge from full ones beyond GrabCut's own
+# run-to-run noise, so its negative_space_128d vectors do not match
+# catalog vectors built with "full": re-embed the catalog before
+# switching a deployment over
+SEGMENTATION_MODE = os.environ.get("SEGMENTATION_MODE", "full").lower()
+SEGMENTATION_WORK_SIDE = int(os.environ.get("SEGMENTATION_WORK_SIDE", "384"))
+# Half-width of the refined boundary band, in full-resolution pixels
+SEGMENTATION_BAND_PX = int(os.environ.get("SEGMENTATION_BAND_PX", "6"))
+# GrabCut initializer: "auto" (selfie mask if this frame already has
+# one, else rectangle), "selfie" (compute it if needed) or "rect"
+SEGMENTATION_INIT = os.environ.get("SEGMENTATION_INIT", "auto").lower()
+
+GRABCUT_ITERS = 4
+_RECT_MARGIN = 0.08
+# Selfie masks covering less than this share of the rectangle are
+# ignored (non-person objects often come back nearly empty)
+_MIN_INIT_COVERAGE = 0.02
+# A downscaled cut keeping less than this share of the rectangle has
+# collapsed (the smoothness term weighs more at low resolution); such
+# images are redone at full resolution
+_MIN_FG_COVERAGE = 0.01
+
+
+def _rect(w: int, h: int) -> tuple:
+    return (
+        int(w * _RECT_MARGIN),
+        int(h * _RECT_MARGIN),
+        int(w * (1 - 2 * _RECT_MARGIN)),
+        int(h * (1 - 2 * _RECT_MARGIN)),
+    )
+
+
+def _fallback(h: int, w: int) -> np.ndarray:
+    # Simple central foreground
+    fg = np.zeros((h, w), dtype="uint8")
+    fg[int(h * 0.15): int(h * 0.85), int(w * 0.15): int(w * 0.85)] = 1
+    return fg
+
+
+def _to_binary(mask: np.ndarray) -> np.ndarray:
+    return np.where(
+        (mask == cv2.GC_FGD) | (mask == cv2.GC_PR_FGD), 1, 0
+    ).astype("uint8")
+
+# -------------------------------------------------------------------
+# Full resolution (original path)
+# -------------------------------------------------------------------
+
+def _segment_full(img: np.ndarray) -> np.ndarray:
+    h, w = img.shape[:2]
+    mask = np.zeros((h, w), np.uint8)
+    bgdModel = np.zeros((1, 65), np.float64)
+    fgdModel = np.zeros((1, 65), np.float64)
+
+    cv2.grabCut(
+        img, mask, _rect(w, h), bgdModel, fgdModel, GRABCUT_ITERS, cv2.GC_INIT_WITH_RECT
+    )
+    return _to_binary(mask)
+
+# -------------------------------------------------------------------
+# Multi-resolution
+# -------------------------------------------------------------------
+
+def _selfie_init(frame: Frame) -> np.ndarray | None:
     """
-    Returns binary mask (1=foreground object, 0=background).
-    Safe GrabCut with fallback.
+    Branch C's MediaPipe foreground mask, if usable as an initializer.
+    "auto" only reuses one already memoized on this frame.
     """
-    img = cv2.imdecode(
-        np.frombuffer(norm_jpg_bytes, np.uint8), cv2.IMREAD_COLOR
-    )
-    if img is None:
-        raise ValueError("Invalid image for segmentation")
+    if SEGMENTATION_INIT == "rect":
+        return None
+    if SEGMENTATION_INIT == "selfie":
+        try:
+            from branch_c.mask import foreground_mask
+            return foreground_mask(frame)
+        except Exception:
+            logging.exception("Selfie mask unavailable; GrabCut uses the rectangle")
+            return None
+    return frame.peek("selfie_foreground")
+
+
+def _gmm_loglik(model: np.ndarray, pixels: np.ndarray) -> np.ndarray:
+    """
+    Log-likelihood of Nx3 pixels under an OpenCV GrabCut GMM model
+    (1x65: 5 weights, 5x3 means, 5x3x3 covariances).
+    """
+    k = 5
+    weights = model[0, :k]
+    means = model[0, k: 4 * k].reshape(k, 3)
+    covs = model[0, 4 * k:].reshape(k, 3, 3)
+
+    x = pixels.astype(np.float64)
+    out = np.zeros(x.shape[0])
+    for wgt, mu, cov in zip(weights, means, covs):
+        if wgt <= 0:
+            continue
+        cov = cov + np.eye(3) * 1e-3
+        inv = np.linalg.inv(cov)
+        d = x - mu
+        maha = np.einsum("ni,ij,nj->n", d, inv, d)
+        out += wgt * np.exp(-0.5 * maha) / np.sqrt(((2 * np.pi) ** 3) * np.linalg.det(cov))
+    return np.log(out + 1e-300)
 
+
+def _segment_multires(frame: Frame) -> np.ndarray:
+    img = frame.bgr
     h, w = img.shape[:2]
+    scale = min(1.0, SEGMENTATION_WORK_SIDE / float(max(h, w)))
+    if scale >= 1.0:
+        return _segment_full(img)
 
-    try:
-        mask = np.zeros((h, w), np.uint8)
-        bgdModel = np.zeros((1, 65), np.float64)
-        fgdModel = np.zeros((1, 65), np.float64)
-
-        rect = (
-            int(w * 0.08),
-            int(h * 0.08),
-            int(w * 0.84),
-            int(h * 0.84),
-        )
+    sw, sh = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+    small = cv2.resize(img, (sw, sh), interpolation=cv2.INTER_AREA)
 
+    bgdModel = np.zeros((1, 65), np.float64)
+    fgdModel = np.zeros((1, 65), np.float64)
+    rect = _rect(sw, sh)
+
+    init = _selfie_init(frame)
+    mask = None
+    if init is not None:
+        x, y, rw, rh = rect
+        init_small = cv2.resize(
+            init.astype(np.uint8), (sw, sh), interpolation=cv2.INTER_NEAREST
+        ).astype(bool)
+        inside = np.zeros((sh, sw), bool)
+        inside[y: y + rh, x: x + rw] = True
+        if (init_small & inside).sum() >= _MIN_INIT_COVERAGE * inside.sum():
+            mask = np.full((sh, sw), cv2.GC_BGD, np.uint8)
+            mask[inside] = cv2.GC_PR_BGD
+            mask[inside & init_small] = cv2.GC_PR_FGD
+
+    if mask is not None:
+        cv2.grabCut(
+            small, mask, None, bgdModel, fgdModel, GRABCUT_ITERS, cv2.GC_INIT_WITH_MASK
+        )
+    else:
+        mask = np.zeros((sh, sw), np.uint8)
         cv2.grabCut(
-            img, mask, rect, bgdModel, fgdModel, 4, cv2.GC_INIT_WITH_RECT
+            small, mask, rect, bgdModel, fgdModel, GRABCUT_ITERS, cv2.GC_INIT_WITH_RECT
         )
 
-        fg = np.where(
-            (mask == cv2.GC_FGD) | (mask == cv2.GC_PR_FGD), 1, 0
-        ).astype("uint8")
-        return fg
+    fg_small = _to_binary(mask)
+    if fg_small.sum() < _MIN_FG_COVERAGE * rect[2] * rect[3]:
+        logging.info("Downscaled GrabCut collapsed; segmenting at full resolution")
+        return _segment_full(img)
+
+    # Bilinear upsample of the binary mask = soft prior near the boundary
+    prior = cv2.resize(
+        fg_small.astype(np.float32), (w, h), interpolation=cv2.INTER_LINEAR
+    )
+    coarse = (prior >= 0.5).astype(np.uint8)
+
+    # Edge-aware refinement only inside the band: per-pixel colour
+    # likelihood under the GrabCut fg/bg models plus the upsampled prior
+    band_k = max(1, SEGMENTATION_BAND_PX)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * band_k + 1, 2 * band_k + 1))
+    band = cv2.dilate(coarse, kernel) != cv2.erode(coarse, kernel)
+    if not band.any():
+        return coarse
+
+    ys, xs = np.nonzero(band)
+    pixels = img[ys, xs]
+    p = np.clip(prior[ys, xs], 0.05, 0.95)
+    score = (
+        _gmm_loglik(fgdModel, pixels) + np.log(p)
+        - _gmm_loglik(bgdModel, pixels) - np.log(1.0 - p)
+    )
+
+    out = coarse.copy()
+    out[ys, xs] = (score > 0).astype(np.uint8)
+    # Remove single-pixel speckle the per-pixel decision leaves in the band
+    smoothed = cv2.medianBlur(out * 255, 5) // 255
+    out[band] = smoothed[band]
+    return out
+
+
+def segment_foreground_mask(norm_jpg_bytes: bytes | Frame) -> np.ndarray:
+    """
+    Returns binary mask (1=foreground object, 0=background).
+    Safe GrabCut with fallback.
+    """
+    frame = as_frame(norm_jpg_bytes)
+    img = frame.bgr
+
+    h, w = img.shape[:2]
+
+    try:
+        if SEGMENTATION_MODE == "full":
+            return _segment_full(img)
+        return _segment_multires(frame)
 
     except Exception:
         logging.exception("GrabCut failed; using fallback segmentation")
-
-        # Fallback: simple central foreground
-        fg = np.zeros((h, w), dtype="uint8")
-        fg[int(h * 0.15): int(h * 0.85), int(w * 0.15): int(w * 0.85)] = 1
-        return fg
+        return _fallback(h, w)
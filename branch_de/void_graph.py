@@ -1,32 +1,33 @@
 import numpy as np
 
-def build_void_graph(voids: list, max_edges_per_node: int = 3) -> dict:
+from branch_de.geometry import VoidGeometry, void_arrays
+
+def build_void_graph(voids: VoidGeometry | list, max_edges_per_node: int = 3) -> dict:
     """
     Returns a lightweight graph:
     nodes: {id, area, centroid}
     edges: {src, dst, dist}
     """
-    nodes = []
-    for i, v in enumerate(voids):
-        nodes.append({
-            "id": i,
-            "area": v["area"],
-            "centroid": v["centroid"]
-        })
+    areas, centroids = void_arrays(voids)
+    nodes = [
+        {"id": i, "area": a, "centroid": c}
+        for i, (a, c) in enumerate(zip(areas.tolist(), centroids.tolist()))
+    ]
 
     if len(nodes) < 2:
         return {"nodes": nodes, "edges": []}
 
-    c = np.array([n["centroid"] for n in nodes], dtype=np.float32)
-    edges = []
-    for i in range(len(nodes)):
-        d = np.sqrt(np.sum((c - c[i]) ** 2, axis=1))
-        nn = np.argsort(d)[1: max_edges_per_node + 1]
-        for j in nn:
-            edges.append({
-                "src": int(i),
-                "dst": int(j),
-                "dist": float(d[j])
-            })
+    # All pairwise distances at once; row i matches the per-node loop
+    c = centroids.astype(np.float32)
+    d = np.sqrt(np.sum((c[None, :, :] - c[:, None, :]) ** 2, axis=2))
+    nn = np.argsort(d, axis=1)[:, 1: max_edges_per_node + 1]
+
+    src = np.repeat(np.arange(len(nodes)), nn.shape[1])
+    dst = nn.ravel()
+    dist = d[src, dst]
+    edges = [
+        {"src": s, "dst": t, "dist": w}
+        for s, t, w in zip(src.tolist(), dst.tolist(), dist.tolist())
+    ]
 
     return {"nodes": nodes, "edges": edges}
@@ -8,8 +8,10 @@ export interface AnalysisResult {
   };
   branch_confidences: Record<string, number>;
   explainability: {
-    summary: string;
+    summary: string | null;
     heatmap_object_path: string;
+    // "pending" until the background job finishes; see fetchExplanation
+    status?: "pending" | "done" | "error";
   };
   top_k: Array<{
     object_id: string;
@@ -72,6 +74,118 @@ export const analyzeImage = async (file: File): Promise<AnalysisResult> => {
   return response.json();
 };
 
+export interface BranchEvent {
+  key: string;
+  label?: string;
+  status: "ok" | "error" | "timeout";
+  wall_ms: number | null;
+  confidence: number | null;
+}
+
+export interface FusionEvent {
+  provisional: boolean;
+  completed: string[];
+  confidence: number;
+  confidence_interval?: [number, number];
+  branch_weights: Record<string, number>;
+}
+
+export interface AnalyzeStreamHandlers {
+  onAccepted?: (data: { request_id: string; timestamp: number; normalized_gcs_uri: string }) => void;
+  onBranch?: (data: BranchEvent) => void;
+  onFusion?: (data: FusionEvent) => void;
+}
+
+// POST /analyze/stream: server-sent events, parsed from the fetch body
+// (EventSource cannot POST). Resolves with the same payload as /analyze.
+export const analyzeImageStream = async (
+  file: File,
+  handlers: AnalyzeStreamHandlers = {}
+): Promise<AnalysisResult> => {
+  const apiUrl = getApiUrl();
+  const formData = new FormData();
+  formData.append("file", file);
+
+  const response = await fetch(`${apiUrl}/analyze/stream`, {
+    method: "POST",
+    body: formData,
+    headers: { Accept: "text/event-stream" },
+  });
+
+  if (!response.ok || !response.body) {
+    const errorText = await response.text();
+    throw new Error(`Analysis failed: ${response.status} ${response.statusText} - ${errorText}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      if (!data) continue;
+      const payload = JSON.parse(data);
+
+      if (event === "accepted") handlers.onAccepted?.(payload);
+      else if (event === "branch") handlers.onBranch?.(payload);
+      else if (event === "fusion") handlers.onFusion?.(payload);
+      else if (event === "result") return payload as AnalysisResult;
+      else if (event === "error") throw new Error(`Analysis failed: ${payload.message}`);
+    }
+  }
+
+  throw new Error("Analysis stream ended without a result");
+};
+
+export interface ExplanationResult {
+  request_id: string;
+  status: "pending" | "running" | "done" | "error";
+  heatmap_object_path: string | null;
+  summary?: string | null;
+  gemini_explanation?: Record<string, unknown>;
+  xai_notes?: string;
+}
+
+// Long-polls GET /explain/{request_id} until the explanation is ready
+export const fetchExplanation = async (
+  requestId: string,
+  { waitS = 20, attempts = 6 }: { waitS?: number; attempts?: number } = {}
+): Promise<ExplanationResult> => {
+  const apiUrl = getApiUrl();
+  let last: ExplanationResult | null = null;
+  for (let i = 0; i < attempts; i++) {
+    const response = await fetch(
+      `${apiUrl}/explain/${encodeURIComponent(requestId)}?wait_s=${waitS}`
+    );
+    if (!response.ok && response.status !== 202) {
+      const errorText = await response.text();
+      throw new Error(`Explanation failed: ${response.status} ${response.statusText} - ${errorText}`);
+    }
+    last = await response.json();
+    if (last && (last.status === "done" || last.status === "error")) {
+      return last;
+    }
+  }
+  if (!last) {
+    throw new Error("Explanation not available");
+  }
+  return last;
+};
+
 export const createItem = async (data: ItemCreate): Promise<ItemResponse> => {
   const apiUrl = getApiUrl();
   
@@ -5,6 +5,8 @@ import logging
 from google import genai
 from google.genai.types import Part
 
+from utils import gemini_cache
+
 PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT")
 GEMINI_LOCATION = os.environ.get("GEMINI_LOCATION", "asia-south1")
 GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
@@ -23,28 +25,46 @@ def _get_client():
     return _client
 
 
-def _safe_json_parse(text: str) -> dict:
-    if not text or not text.strip():
-        return {
-            "summary": "No LLM explanation available",
-            "confidence": "low",
-            "reasoning": [],
-            "source": "fallback"
-        }
+def set_client(client):
+    """
+    Injects a client (e.g. utils.gemini_stub.StubGeminiClient) in place
+    of the Vertex AI one.
+    """
+    global _client
+    _client = client
 
-    # direct parse
+
+def _parse_json(text: str):
+    # Direct parse, then the outermost {...}; None if neither works
     try:
         return json.loads(text)
     except Exception:
         pass
-
-    # extract {...}
     match = re.search(r"\{[\s\S]*\}", text)
     if match:
         try:
             return json.loads(match.group(0))
         except Exception:
             pass
+    return None
+
+
+def _is_json_object(text: str) -> bool:
+    return isinstance(_parse_json(text), dict)
+
+
+def _safe_json_parse(text: str) -> dict:
+    if not text or not text.strip():
+        return {
+            "summary": "No LLM explanation available",
+            "confidence": "low",
+            "reasoning": [],
+            "source": "fallback"
+        }
+
+    parsed = _parse_json(text)
+    if parsed is not None:
+        return parsed
 
     logging.warning("Gemini returned malformed JSON")
     return {
@@ -55,36 +75,53 @@ def _safe_json_parse(text: str) -> dict:
     }
 
 
+EXPLAIN_PROMPT_TEMPLATE = (
+    "You are generating an explainable identity-confidence report.\n"
+    "Return ONLY valid JSON:\n"
+    "{{"
+    "\"short_reason\":\"...\","
+    "\"key_visual_cues\":[\"...\"],"
+    "\"what_might_reduce_confidence\":[\"...\"],"
+    "\"confidence_summary\":\"...\""
+    "}}\n\n"
+    "Context:\n{context}"
+)
+EXPLAIN_CONFIG = {
+    "response_mime_type": "application/json",
+    "temperature": 0.2,
+    "max_output_tokens": 350,
+}
+
+
 def gemini_explain_match_from_bytes(image_bytes: bytes, context: dict) -> dict:
     client = _get_client()
 
-    prompt = (
-        "You are generating an explainable identity-confidence report.\n"
-        "Return ONLY valid JSON:\n"
-        "{"
-        "\"short_reason\":\"...\","
-        "\"key_visual_cues\":[\"...\"],"
-        "\"what_might_reduce_confidence\":[\"...\"],"
-        "\"confidence_summary\":\"...\""
-        "}\n\n"
-        f"Context:\n{json.dumps(context)[:1200]}"
-    )
+    context_json = json.dumps(context)[:1200]
+    prompt = EXPLAIN_PROMPT_TEMPLATE.format(context=context_json)
 
-    resp = client.models.generate_content(
-        model=GEMINI_MODEL,
-        contents=[
-            prompt,
-            Part.from_bytes(
-                data=image_bytes,
-                mime_type="image/jpeg",
-            ),
-        ],
-        config={  # ✅ THIS IS CORRECT
-            "response_mime_type": "application/json",
-            "temperature": 0.2,
-            "max_output_tokens": 350,
-        },
-    )
+    def _generate():
+        resp = client.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=[
+                prompt,
+                Part.from_bytes(
+                    data=image_bytes,
+                    mime_type="image/jpeg",
+                ),
+            ],
+            config=EXPLAIN_CONFIG,
+        )
+        return getattr(resp, "text", "") or ""
 
-    text = getattr(resp, "text", "") or ""
+    text = gemini_cache.memoized_text(
+        gemini_cache.make_key(
+            image_bytes,
+            GEMINI_MODEL,
+            EXPLAIN_PROMPT_TEMPLATE,
+            EXPLAIN_CONFIG,
+            context=context_json,
+        ),
+        _generate,
+        validate=_is_json_object,
+    )
     return _safe_json_parse(text)
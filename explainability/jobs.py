@@ -0,0 +1,345 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from explainability.visual_identity_confidence import (
+    build_visual_identity_confidence,
+)
+from utils import storage_io
+
+# -------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------
+
+# "async": /analyze returns before Grad-CAM + Gemini finish and the
+# result is fetched from GET /explain/{request_id}; "sync": inline
+EXPLAIN_MODE = os.environ.get("EXPLAIN_MODE", "async").lower()
+EXPLAIN_WORKERS = int(os.environ.get("EXPLAIN_WORKERS", "2"))
+EXPLAIN_MAX_JOBS = int(os.environ.get("EXPLAIN_MAX_JOBS", "1000"))
+EXPLAIN_MAX_WAIT_S = float(os.environ.get("EXPLAIN_MAX_WAIT_S", "30"))
+# Queued + running jobs; each holds its whole Frame, so past this the
+# explanation is skipped instead of queued
+EXPLAIN_MAX_PENDING = int(os.environ.get("EXPLAIN_MAX_PENDING", "32"))
+
+# Job records (pending, then final) are also written here so any
+# worker can answer GET /explain
+RESULT_PREFIX = "explanations"
+# Shutdown waits this long for a dropped job's pending record to land
+_MARKER_WAIT_S = 5.0
+
+
+def is_async() -> bool:
+    return EXPLAIN_MODE == "async"
+
+
+def result_object_name(request_id: str) -> str:
+    return f"{RESULT_PREFIX}/{request_id}.json"
+
+# -------------------------------------------------------------------
+# Jobs
+# -------------------------------------------------------------------
+
+FINAL_STATUSES = ("done", "error", "skipped")
+
+
+class ExplainJob:
+    """
+    One background explainability run. status: "pending" | "running" |
+    "done" | "error" (pipeline failed, no heatmap was stored or the
+    worker shut down first) | "skipped" (queue full, never ran).
+    """
+
+    def __init__(self, request_id: str, heatmap_object_path: str, bucket_name: str | None = None):
+        self.request_id = request_id
+        self.heatmap_object_path = heatmap_object_path
+        self.bucket_name = bucket_name
+        self.status = "pending"
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.result = None
+        self.future = Future()
+        self.task = None     # worker pool future, None until queued
+        self.marker = None   # write of the stored "pending" record
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINAL_STATUSES
+
+    def finish(self, status: str, result: dict):
+        self.result = result
+        self.status = status
+        self.finished_at = time.time()
+        if not self.future.done():
+            self.future.set_result(result)
+
+    def on_done(self, fn):
+        """
+        fn(explainability dict) once the job finishes, in the worker
+        thread (or immediately if already finished).
+        """
+        def call(fut):
+            try:
+                fn(fut.result())
+            except Exception:
+                logging.exception("Explainability callback failed")
+        self.future.add_done_callback(call)
+
+    def to_dict(self) -> dict:
+        out = {
+            "request_id": self.request_id,
+            "status": self.status,
+            "heatmap_object_path": self.heatmap_object_path,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+        if self.result is not None:
+            out.update(response_fields(self.result))
+        return out
+
+
+def response_fields(explainability: dict) -> dict:
+    return {
+        "summary": explainability.get("interpretation"),
+        "heatmap_object_path": explainability.get("heatmap_object_path"),
+        "gemini_explanation": explainability.get("gemini_explanation", {}),
+        "xai_notes": explainability.get("xai_notes", ""),
+    }
+
+
+def placeholder(request_id: str, heatmap_object_path: str | None, status: str = "pending") -> dict:
+    """
+    Explainability entry for an analysis whose job is still running
+    (the heatmap path is already final) or was skipped.
+    """
+    return {
+        "status": status,
+        "job_id": request_id,
+        "heatmap_url": None,
+        "heatmap_object_path": heatmap_object_path,
+        "gemini_explanation": {},
+        "xai_notes": "",
+        "interpretation": None,
+    }
+
+# -------------------------------------------------------------------
+# Worker pool + job table (process-local)
+# -------------------------------------------------------------------
+
+_pool = None
+_pool_lock = threading.Lock()
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+_pending = 0   # queued + running, guarded by _jobs_lock
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=max(1, EXPLAIN_WORKERS),
+                    thread_name_prefix="explain",
+                )
+    return _pool
+
+
+def executor() -> ThreadPoolExecutor:
+    """
+    The explain worker pool, also used by EXPLAIN_MODE=sync to keep
+    Grad-CAM and Gemini off the event loop.
+    """
+    return _get_pool()
+
+
+def _remember(job: ExplainJob):
+    with _jobs_lock:
+        _jobs[job.request_id] = job
+        # Drop the oldest finished jobs; their results stay in storage
+        excess = len(_jobs) - EXPLAIN_MAX_JOBS
+        for rid in [r for r, j in _jobs.items() if j.done][:max(0, excess)]:
+            del _jobs[rid]
+
+
+def _store(job: ExplainJob, bucket_name: str) -> Future | None:
+    try:
+        return storage_io.submit_put(
+            result_object_name(job.request_id),
+            json.dumps(job.to_dict()),
+            "application/json",
+            bucket_name,
+        )
+    except Exception:
+        logging.exception("[%s] Explainability result upload failed", job.request_id)
+        return None
+
+
+def _release():
+    global _pending
+    with _jobs_lock:
+        _pending -= 1
+
+
+def _run(job: ExplainJob, frame, bucket_name: str, context_for_gemini: dict, marker: Future | None):
+    try:
+        _execute(job, frame, bucket_name, context_for_gemini, marker)
+    finally:
+        _release()
+
+
+def _execute(job: ExplainJob, frame, bucket_name: str, context_for_gemini: dict, marker: Future | None):
+    job.status = "running"
+    try:
+        result = build_visual_identity_confidence(
+            norm_jpg_bytes=frame,
+            bucket_name=bucket_name,
+            heatmap_object_path=job.heatmap_object_path,
+            context_for_gemini=context_for_gemini,
+        )
+    except Exception as e:
+        logging.exception("[%s] Explainability job failed", job.request_id)
+        result = {"heatmap_object_path": None, "interpretation": f"error: {e}"}
+
+    job.result = result
+    job.status = "done" if result.get("heatmap_object_path") else "error"
+    job.finished_at = time.time()
+
+    if marker is not None:
+        # The final record must land after the pending one
+        try:
+            marker.result()
+        except Exception:
+            pass
+    _store(job, bucket_name)
+
+    job.future.set_result(result)
+    logging.info(
+        "[%s] Explainability %s in %.1fs",
+        job.request_id, job.status, job.finished_at - job.submitted_at,
+    )
+
+
+def submit(
+    request_id: str,
+    frame,
+    bucket_name: str,
+    heatmap_object_path: str,
+    context_for_gemini: dict,
+) -> ExplainJob:
+    """
+    Queues Grad-CAM + overlay upload + Gemini explanation for a frame.
+    The frame's memo (e.g. the ViT pass from Branch A) is reused. With
+    EXPLAIN_MAX_PENDING jobs already in flight the job is returned
+    "skipped" and the frame is not kept.
+    """
+    global _pending
+    with _jobs_lock:
+        full = _pending >= EXPLAIN_MAX_PENDING
+        if not full:
+            _pending += 1
+
+    if full:
+        logging.warning("[%s] Explainability queue full; skipped", request_id)
+        job = ExplainJob(request_id, None, bucket_name)
+        job.finish("skipped", {
+            "heatmap_object_path": None,
+            "interpretation": "skipped: explainability queue full",
+        })
+        _remember(job)
+        _store(job, bucket_name)
+        return job
+
+    job = ExplainJob(request_id, heatmap_object_path, bucket_name)
+    _remember(job)
+    # Pending record lets other workers answer 202 instead of 404
+    marker = job.marker = _store(job, bucket_name)
+    job.task = _get_pool().submit(_run, job, frame, bucket_name, context_for_gemini, marker)
+    return job
+
+
+def get(request_id: str) -> ExplainJob | None:
+    with _jobs_lock:
+        return _jobs.get(request_id)
+
+
+async def wait(request_id: str, timeout_s: float = 0.0) -> ExplainJob | None:
+    """
+    Long-poll: the local job, after waiting up to timeout_s for it to
+    finish (capped at EXPLAIN_MAX_WAIT_S). None if this worker has no
+    such job.
+    """
+    job = get(request_id)
+    if job is None or job.done or timeout_s <= 0:
+        return job
+    try:
+        await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(job.future)),
+            min(timeout_s, EXPLAIN_MAX_WAIT_S),
+        )
+    except asyncio.TimeoutError:
+        pass
+    return job
+
+
+async def load_stored(request_id: str, bucket_name: str | None = None) -> dict | None:
+    """
+    Job record written by whichever worker ran the job (pending or
+    finished).
+    """
+    name = result_object_name(request_id)
+    try:
+        if not await storage_io.exists(name, bucket_name):
+            return None
+        return json.loads(await storage_io.get(name, bucket_name))
+    except Exception:
+        logging.exception("[%s] Explainability result read failed", request_id)
+        return None
+
+
+def stats() -> dict:
+    with _jobs_lock:
+        counts = {}
+        for job in _jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        pending = _pending
+    return {
+        "mode": EXPLAIN_MODE,
+        "workers": EXPLAIN_WORKERS,
+        "in_flight": pending,
+        "max_pending": EXPLAIN_MAX_PENDING,
+        "jobs": counts,
+    }
+
+
+def shutdown():
+    """
+    Stops the pool. Queued jobs it drops are failed so long-polls on
+    them return instead of waiting out their timeout.
+    """
+    global _pool, _pending
+    if _pool is None:
+        return
+    _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+    with _jobs_lock:
+        dropped = [j for j in _jobs.values() if j.task is not None and j.task.cancelled()]
+        _pending -= len(dropped)
+    for job in dropped:
+        job.finish("error", {"heatmap_object_path": None, "interpretation": "error: worker shut down"})
+        # Replace the stored "pending" record (after it landed), or other
+        # workers keep answering 202 for it. storage_io.shutdown() waits
+        # for these writes
+        if job.marker is not None:
+            try:
+                job.marker.result(timeout=_MARKER_WAIT_S)
+            except Exception:
+                pass
+        _store(job, job.bucket_name)
+    if dropped:
+        logging.info("Explainability shutdown dropped %d queued jobs", len(dropped))
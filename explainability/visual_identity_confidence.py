@@ -1,60 +1,47 @@
-import numpy as np
-import cv2
 import logging
-from google.cloud import storage
 
 from explainability.vit_gradcam import vit_gradcam_heatmap
 from explainability.heatmap_overlay import overlay_heatmap
 from explainability.gemini_explanations import (
     gemini_explain_match_from_bytes,
 )
-
-import os
+from pipeline.frame import Frame, as_frame
+from utils import storage_io
 
 def build_visual_identity_confidence(
-    norm_jpg_bytes: bytes,
+    norm_jpg_bytes: bytes | Frame,
     bucket_name: str,
     heatmap_object_path: str,
     context_for_gemini: dict,
+    pending_writes: list | None = None,
 ) -> dict:
+    """
+    With pending_writes, the heatmap upload is started and its future
+    appended there (it overlaps the Gemini call); otherwise it is
+    waited for before returning.
+    """
     try:
-        bgr = cv2.imdecode(
-            np.frombuffer(norm_jpg_bytes, np.uint8),
-            cv2.IMREAD_COLOR,
-        )
-        if bgr is None:
-            raise ValueError("Invalid image for explainability")
+        frame = as_frame(norm_jpg_bytes)
+        rgb = frame.rgb_float01
 
-        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-        rgb = rgb.astype(np.float32) / 255.0
-
-        cam = vit_gradcam_heatmap(rgb)
+        cam = vit_gradcam_heatmap(rgb, frame=frame)
         overlay_jpg = overlay_heatmap(rgb, cam, alpha=0.45)
 
-        local_dev = os.getenv("LOCAL_DEV", "false").lower() == "true" or os.getenv("GOOGLE_CLOUD_PROJECT") in (None, "", "unknown-project")
+        heatmap_write = storage_io.submit_put(
+            heatmap_object_path,
+            overlay_jpg,
+            content_type="image/jpeg",
+            bucket_name=bucket_name,
+        )
         heatmap_gcs_uri = f"gs://{bucket_name}/{heatmap_object_path}"
-
-        if local_dev:
-            root = os.path.join(os.getcwd(), "local_data", bucket_name)
-            os.makedirs(root, exist_ok=True)
-            path = os.path.join(root, heatmap_object_path.replace("/", os.sep))
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            with open(path, "wb") as f:
-                f.write(overlay_jpg)
-            heatmap_gcs_uri = f"file://{path}"
+        if pending_writes is not None:
+            pending_writes.append(heatmap_write)
         else:
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(bucket_name)
-            blob = bucket.blob(heatmap_object_path)
-            blob.upload_from_string(
-                overlay_jpg,
-                content_type="image/jpeg",
-            )
-
+            heatmap_write.result()
 
         try:
             gemini_json = gemini_explain_match_from_bytes(
-                norm_jpg_bytes,
+                frame.encoded,
                 context_for_gemini,
             )
         except Exception:
@@ -1,31 +1,26 @@
 import numpy as np
-import torch
-import timm
 import logging
+import threading
 
 from pytorch_grad_cam import GradCAM
-from pytorch_grad_cam.utils.image import preprocess_image
 
-# -------------------------------------------------------------------
-# Force CPU (Cloud Run safe)
-# -------------------------------------------------------------------
-
-_DEVICE = torch.device("cpu")
-
-_vit = None
-_cam = None
-
-
-def _load_vit():
-    global _vit
-    if _vit is None:
-        _vit = timm.create_model(
-            "vit_base_patch16_224",
-            pretrained=True,
-        )
-        _vit.eval()
-        _vit.to(_DEVICE)
-    return _vit
+from models.vit_backbone import (
+    get_vit,
+    input_tensor as vit_input_tensor,
+    trunk_forward,
+    trunk_tokens,
+    ViTTail,
+    VIT_SIZE,
+)
+from pipeline.frame import Frame
+from models.batcher import make_batched
+
+_tail = None
+_tail_lock = threading.Lock()
+# One CAM at a time: the hooks on the private block are per-call but
+# the block is shared by every CAM (worker thread or, with
+# INFER_BATCHING=false, the EXPLAIN_WORKERS threads)
+_cam_lock = threading.Lock()
 
 
 def _reshape_transform(tensor, height=14, width=14):
@@ -43,49 +38,60 @@ def _reshape_transform(tensor, height=14, width=14):
     return result
 
 
-def _get_cam():
-    global _cam
-    if _cam is None:
-        vit = _load_vit()
-        _cam = GradCAM(
-            model=vit,
-            target_layers=[vit.blocks[-1].norm1],
-            reshape_transform=_reshape_transform,
-        )
-    return _cam
+class _TokenGradCAM(GradCAM):
+    """
+    GradCAM fed with trunk tokens [B,197,768] instead of images; the
+    CAM target size is the ViT input resolution.
+    """
+
+    def get_target_width_height(self, input_tensor):
+        return VIT_SIZE, VIT_SIZE
+
 
+def _get_tail() -> ViTTail:
+    # Private copy of the last block: the CAM hooks go on the copy, so
+    # Branch A's features_from_trunk on the shared ViT never fires them
+    global _tail
+    if _tail is None:
+        with _tail_lock:
+            if _tail is None:
+                _tail = ViTTail(get_vit(), copy_block=True)
+    return _tail
 
-def vit_gradcam_heatmap(rgb_float01: np.ndarray) -> np.ndarray:
+
+def _cam_batch(tokens):
+    tail = _get_tail()
+    # Hooks are registered for this call only and released on exit
+    with _cam_lock, _TokenGradCAM(
+        model=tail,
+        target_layers=[tail.block.norm1],
+        reshape_transform=_reshape_transform,
+    ) as cam:
+        # ✅ NEW API — NO target_category (per-sample argmax class)
+        return cam(input_tensor=tokens, targets=None)
+
+
+# Grad-CAM passes from concurrent requests run as one batch. Branch A
+# never touches the CAM's block, and _cam_lock (not the batcher)
+# serialises CAMs, so this holds with batching off too.
+_batched_cam = make_batched("gradcam", _cam_batch)
+
+
+def vit_gradcam_heatmap(rgb_float01: np.ndarray, frame: Frame | None = None) -> np.ndarray:
     """
     Input: RGB float32 [H,W,3] in [0,1]
-    Output: grayscale CAM [H,W] in [0,1]
+    Output: grayscale CAM [224,224] in [0,1]
+
+    With a frame, the shared backbone trunk pass (already run by
+    Branch A) is reused and only the last block is re-run with grads.
     """
     try:
-        # Resize input for ViT (224x224)
-        import torch.nn.functional as F
-        
-        input_tensor = preprocess_image(
-            rgb_float01,
-            mean=[0.485, 0.456, 0.406],
-            std=[0.229, 0.224, 0.225],
-        ).to(_DEVICE)
-
-        # Resize to 224x224 if needed
-        if input_tensor.shape[2:] != (224, 224):
-            input_tensor = F.interpolate(
-                input_tensor,
-                size=(224, 224),
-                mode="bilinear",
-                align_corners=False
-            )
-
-        cam = _get_cam()
-
-        # ✅ NEW API — NO target_category
-        grayscale_cam = cam(
-            input_tensor=input_tensor,
-            targets=None,
-        )
+        if frame is not None:
+            tokens = trunk_tokens(frame)
+        else:
+            tokens = trunk_forward(vit_input_tensor(rgb_float01))
+
+        grayscale_cam = _batched_cam(tokens.detach())
 
         return grayscale_cam[0].astype(np.float32)
 
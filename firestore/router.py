@@ -2,7 +2,7 @@ from typing import List
 from enum import Enum
 from fastapi import APIRouter, File, UploadFile, Form, HTTPException
 from google.cloud import firestore
-from utils.upload import upload_file_to_gcs
+from utils.upload import upload_files_to_gcs
 
 # ---------- FIRESTORE ----------
 db = firestore.Client()
@@ -29,11 +29,8 @@ async def create_item(
     images: List[UploadFile] = File(...),  # multiple files
 ):
     try:
-        # 1️⃣ Upload files to GCS
-        image_uris = []
-        for file in images:
-            gcs_uri = await upload_file_to_gcs(file)
-            image_uris.append(gcs_uri)
+        # 1️⃣ Upload files to GCS (concurrently)
+        image_uris = await upload_files_to_gcs(images)
 
         # 2️⃣ Prepare data for Firestore
         data = {
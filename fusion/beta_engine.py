@@ -0,0 +1,70 @@
+import numpy as np
+
+# -------------------------------------------------------------------
+# NumPy-only Beta mixture posterior
+#
+# All functions broadcast over leading dims: inputs shaped (..., B)
+# for B branches, outputs shaped (...). A single request is (B,), a
+# batch of N requests is (N, B).
+# -------------------------------------------------------------------
+
+Z_95 = 1.959963984540054
+DEFAULT_SEED = 1234
+
+
+def beta_params(mean, conf):
+    """
+    Same parameterisation as the TFP path: concentration grows with
+    branch confidence (2 .. 52).
+    """
+    mean = np.clip(np.asarray(mean, dtype=np.float64), 1e-4, 1 - 1e-4)
+    conf = np.clip(np.asarray(conf, dtype=np.float64), 0.0, 1.0)
+
+    total = 2.0 + conf * 50.0
+    return mean * total, (1.0 - mean) * total
+
+
+def posterior_moments(alpha, beta, weights):
+    """
+    Exact mean / variance of sum_i w_i * Beta(alpha_i, beta_i) for
+    independent branches.
+    """
+    total = alpha + beta
+    means = alpha / total
+    variances = alpha * beta / (total * total * (total + 1.0))
+
+    mean = np.sum(weights * means, axis=-1)
+    var = np.sum(weights * weights * variances, axis=-1)
+    return mean, var
+
+
+def moment_interval(mean, var):
+    """
+    95% interval of the moment-matched normal, clipped to [0, 1].
+    """
+    sd = np.sqrt(var)
+    low = np.clip(mean - Z_95 * sd, 0.0, 1.0)
+    high = np.clip(mean + Z_95 * sd, 0.0, 1.0)
+    return low, high
+
+
+def sample_posterior(alpha, beta, weights, n_samples=256, seed=DEFAULT_SEED):
+    """
+    Monte Carlo draws of the weighted Beta sum, shape (n_samples, ...).
+    Fixed seed: identical inputs give identical intervals.
+    """
+    rng = np.random.default_rng(seed)
+    alpha = np.asarray(alpha, dtype=np.float64)
+    samples = rng.beta(
+        alpha,
+        np.asarray(beta, dtype=np.float64),
+        size=(n_samples,) + alpha.shape,
+    )
+    return np.sum(samples * weights, axis=-1)
+
+
+def sampled_summary(alpha, beta, weights, n_samples=256, seed=DEFAULT_SEED):
+    post = sample_posterior(alpha, beta, weights, n_samples, seed)
+    mean = np.mean(post, axis=0)
+    low, high = np.percentile(post, [2.5, 97.5], axis=0)
+    return mean, low, high
@@ -1,7 +1,16 @@
-from fusion.schema import BranchOutput
-from fusion.tfp_fusion import fuse_branch_outputs
+import logging
 
-def run_fusion(branches_dict: dict) -> dict:
+import numpy as np
+
+from fusion.schema import BranchOutput, FusionResult
+from fusion.tfp_fusion import (
+    _fallback_result,
+    batch_method,
+    fuse_arrays,
+    fuse_branch_outputs,
+)
+
+def _to_outputs(branches_dict: dict) -> list[BranchOutput]:
     outputs = []
 
     for name, payload in branches_dict.items():
@@ -15,8 +24,9 @@ def run_fusion(branches_dict: dict) -> dict:
             )
         )
 
-    result = fuse_branch_outputs(outputs, n_samples=256)
+    return outputs
 
+def _to_response(result: FusionResult) -> dict:
     ci = result.confidence_interval
     uncertainty = "low" if (ci[1] - ci[0]) < 0.2 else "high"
 
@@ -29,3 +39,100 @@ def run_fusion(branches_dict: dict) -> dict:
             "uncertainty_level": uncertainty,
             "method": result.method,
         }
+
+def run_fusion(branches_dict: dict) -> dict:
+    result = fuse_branch_outputs(_to_outputs(branches_dict), n_samples=256)
+    return _to_response(result)
+
+def _layouts(branches_dicts: list[dict]) -> dict:
+    # Records share a handful of branch-key orders; each one is filled
+    # as a block
+    layouts = {}
+    for i, d in enumerate(branches_dicts):
+        layouts.setdefault(tuple(d), []).append(i)
+    return layouts
+
+def _to_arrays(branches_dicts: list[dict], layouts: dict) -> tuple:
+    """
+    (names, present, p, conf) as (N, B) arrays, one column per branch
+    name.
+    """
+    names = list(dict.fromkeys(n for keys in layouts for n in keys))
+    col = {n: j for j, n in enumerate(names)}
+
+    shape = (len(branches_dicts), len(names))
+    present = np.zeros(shape, bool)
+    p = np.full(shape, 0.5)
+    conf = np.zeros(shape)
+    nan = float("nan")
+    for keys, rows in layouts.items():
+        if not keys:
+            continue
+        payloads = [pl for i in rows for pl in branches_dicts[i].values()]
+        block = (len(rows), len(keys))
+        c = np.array([pl.get("confidence", 0.5) for pl in payloads], np.float64).reshape(block)
+        # p_same_object defaults to the confidence
+        q = np.array([pl.get("p_same_object", nan) for pl in payloads], np.float64).reshape(block)
+        ix = np.ix_(rows, [col[n] for n in keys])
+        present[ix] = True
+        conf[ix] = c
+        p[ix] = np.where(np.isnan(q), c, q)
+    return names, present, p, conf
+
+def run_fusion_batch(
+    branches_dicts: list[dict],
+    reliability: dict | None = None,
+    engine: str | None = None,
+) -> list[dict]:
+    """
+    run_fusion over many records (offline re-scoring, weight-table A/B).
+    Reliability is read once for the whole batch unless supplied;
+    engine defaults to BATCH_ENGINE ("moments").
+    """
+    if not branches_dicts:
+        return []
+    layouts = _layouts(branches_dicts)
+    try:
+        names, present, p, conf = _to_arrays(branches_dicts, layouts)
+        mean, low, high, wmat = fuse_arrays(
+            names, present, p, conf,
+            n_samples=256, engine=engine, reliability=reliability,
+        )
+    except Exception:
+        logging.exception("Batch fusion failed; using fallback")
+        return [
+            _to_response(_fallback_result(_to_outputs(d))) for d in branches_dicts
+        ]
+
+    method = batch_method(engine)
+    col = {n: j for j, n in enumerate(names)}
+    mean = np.round(mean, 3)
+    low = np.round(low, 3)
+    high = np.round(high, 3)
+    low_unc = high - low < 0.2
+    wround = np.round(wmat.astype(np.float64), 3)
+
+    out = [None] * len(branches_dicts)
+    for keys, rows in layouts.items():
+        # Weight columns in the records' own key order
+        block = wround[np.ix_(rows, [col[n] for n in keys])].tolist()
+        part = [
+            {
+                "probability_same_object": pm,
+                "confidence": pm,
+                "confidence_score": pm,
+                "confidence_interval": [lo, hi],
+                "branch_weights": dict(zip(keys, w)),
+                "uncertainty_level": "low" if u else "high",
+                "method": method,
+            }
+            for pm, lo, hi, u, w in zip(
+                mean[rows].tolist(), low[rows].tolist(), high[rows].tolist(),
+                low_unc[rows].tolist(), block,
+            )
+        ]
+        if len(layouts) == 1:
+            return part
+        for i, rec in zip(rows, part):
+            out[i] = rec
+    return out
@@ -0,0 +1,193 @@
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+
+from fusion import beta_engine
+from fusion.fusion_service import _to_outputs
+from fusion.tfp_fusion import BASE_WEIGHTS, reliability_mean
+from fusion.weights_store import get_branch_reliability
+
+# -------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------
+
+EARLY_EXIT = os.environ.get("FUSION_EARLY_EXIT", "true").lower() == "true"
+# Max 95% interval width (moments engine) for a decision
+EARLY_EXIT_WIDTH = float(os.environ.get("FUSION_EARLY_EXIT_WIDTH", "0.2"))
+# Same object / different object cut on the fused probability
+DECISION_THRESHOLD = float(os.environ.get("FUSION_DECISION_THRESHOLD", "0.5"))
+# Only these branches may be left unfinished (ranking needs A, D, E)
+SKIPPABLE = tuple(
+    b.strip()
+    for b in os.environ.get(
+        "FUSION_EARLY_EXIT_SKIPPABLE", "ghost_context,partial_completion"
+    ).split(",")
+    if b.strip()
+)
+
+# -------------------------------------------------------------------
+# Incremental posterior
+# -------------------------------------------------------------------
+
+class IncrementalFusion:
+    """
+    Running fusion posterior over branch outputs as they arrive.
+
+    decided is set once every non-skippable branch has reported, the
+    interval is narrower than max_width, and even the worst case for
+    the outstanding branches (each reporting p=0 or p=1 at full
+    confidence, i.e. its largest possible weight) keeps the fused
+    probability on the same side of the decision threshold. With
+    enabled=False (FUSION_EARLY_EXIT=false) it is never set.
+    """
+
+    def __init__(
+        self,
+        expected: list,
+        skippable=SKIPPABLE,
+        max_width: float = EARLY_EXIT_WIDTH,
+        threshold: float = DECISION_THRESHOLD,
+        reliability: dict | None = None,
+        enabled: bool = EARLY_EXIT,
+    ):
+        self.expected = list(expected)
+        self.enabled = enabled
+        self.skippable = set(skippable) & set(self.expected)
+        self.max_width = max_width
+        self.threshold = threshold
+        if reliability is None:
+            try:
+                reliability = get_branch_reliability()
+            except Exception:
+                logging.exception("Branch reliability unavailable; using priors")
+                reliability = {}
+        self._base = {
+            n: BASE_WEIGHTS.get(n, 0.2) * reliability_mean(reliability, n)
+            for n in self.expected
+        }
+        self.outputs = {}
+        self.started = time.perf_counter()
+        self.decided = False
+        self.decided_at_ms = None
+        self.state = {}
+
+    @property
+    def outstanding(self) -> list:
+        return [n for n in self.expected if n not in self.outputs]
+
+    def add(self, name: str, payload: dict) -> dict:
+        self.outputs[name] = _to_outputs({name: payload})[0]
+        return self.update()
+
+    def update(self) -> dict:
+        branches = list(self.outputs.values())
+        if not branches:
+            self.state = {}
+            return self.state
+
+        # Same weighting as tfp_fusion._branch_weights, kept unnormalized
+        raw = np.array(
+            [
+                self._base.get(b.name, 0.2) * float(np.clip(b.confidence, 0.05, 1.0))
+                for b in branches
+            ]
+        )
+        wvec = raw / (raw.sum() + 1e-6)
+        alpha, beta = beta_engine.beta_params(
+            [b.p_same_object for b in branches],
+            [b.confidence for b in branches],
+        )
+        mean, var = beta_engine.posterior_moments(alpha, beta, wvec)
+        low, high = beta_engine.moment_interval(mean, var)
+
+        outstanding = self.outstanding
+        w_out = sum(self._base.get(n, 0.2) for n in outstanding)
+        frac = w_out / (raw.sum() + w_out)
+        worst_low = float(mean) * (1.0 - frac)
+        worst_high = worst_low + frac
+
+        required_done = all(n in self.skippable for n in outstanding)
+        if (
+            self.enabled
+            and not self.decided
+            and outstanding
+            and required_done
+            and float(high - low) <= self.max_width
+            and (worst_low > self.threshold or worst_high < self.threshold)
+        ):
+            self.decided = True
+            self.decided_at_ms = round((time.perf_counter() - self.started) * 1000.0, 1)
+
+        self.state = {
+            "p": round(float(mean), 3),
+            "interval_width": round(float(high - low), 3),
+            "worst_case": [round(worst_low, 3), round(worst_high, 3)],
+            "completed": list(self.outputs),
+            "decided": self.decided,
+        }
+        return self.state
+
+    def summary(self) -> dict:
+        """
+        Early-exit record attached to the fusion result.
+        """
+        return {
+            "decided": self.decided,
+            "skipped": self.outstanding if self.decided else [],
+            "decided_at_ms": self.decided_at_ms,
+            "interval_width": self.state.get("interval_width"),
+            "worst_case": self.state.get("worst_case"),
+        }
+
+# -------------------------------------------------------------------
+# Early-exit counters (process-wide)
+# -------------------------------------------------------------------
+
+_EMA_ALPHA = 0.2
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "early_exits": 0, "saved_ms_total": 0.0, "skipped": {}}
+_wall_ema = {}   # branch -> EMA of wall_ms when it ran to completion
+
+
+def record(fuser: IncrementalFusion, branch_timings: dict):
+    """
+    Counts one fused request. Saved time is estimated from the skipped
+    branches' recent wall times minus when the decision was made.
+    """
+    with _stats_lock:
+        for name, ms in branch_timings.items():
+            if ms is None:
+                continue
+            prev = _wall_ema.get(name)
+            _wall_ema[name] = ms if prev is None else prev + _EMA_ALPHA * (ms - prev)
+
+        _stats["requests"] += 1
+        if not fuser.decided:
+            return
+        skipped = fuser.outstanding
+        _stats["early_exits"] += 1
+        for name in skipped:
+            _stats["skipped"][name] = _stats["skipped"].get(name, 0) + 1
+        expected_ms = max((_wall_ema.get(n, 0.0) for n in skipped), default=0.0)
+        _stats["saved_ms_total"] += max(0.0, expected_ms - (fuser.decided_at_ms or 0.0))
+
+
+def stats() -> dict:
+    with _stats_lock:
+        n = _stats["requests"]
+        exits = _stats["early_exits"]
+        return {
+            "enabled": EARLY_EXIT,
+            "max_width": EARLY_EXIT_WIDTH,
+            "requests": n,
+            "early_exits": exits,
+            "early_exit_rate": round(exits / n, 4) if n else 0.0,
+            "skipped": dict(_stats["skipped"]),
+            "saved_ms_total": round(_stats["saved_ms_total"], 1),
+            "saved_ms_per_exit": round(_stats["saved_ms_total"] / exits, 1) if exits else 0.0,
+            "branch_wall_ms_ema": {k: round(v, 1) for k, v in _wall_ema.items()},
+        }
@@ -1,8 +1,27 @@
+import os
 import numpy as np
 import logging
 
 from fusion.schema import BranchOutput, FusionResult
 from fusion.weights_store import get_branch_reliability
+from fusion import beta_engine
+
+# "numpy_mc" (default) | "moments" (closed form) | "tfp" (validation)
+FUSION_ENGINE = os.environ.get("FUSION_ENGINE", "numpy_mc")
+
+_METHODS = {
+    "numpy_mc": "numpy_beta_bma",
+    "moments": "numpy_beta_moments",
+    "tfp": "tfp_beta_bma",
+}
+
+BASE_WEIGHTS = {
+    "manufacturing_signature": 0.22,
+    "ghost_context": 0.19,
+    "partial_completion": 0.15,
+    "negative_space": 0.23,
+    "visual_semantics": 0.21,
+}
 
 def _beta_from_mean_conf(mean: float, conf: float):
     import tensorflow_probability as tfp
@@ -16,73 +35,231 @@ def _beta_from_mean_conf(mean: float, conf: float):
     beta = (1.0 - mean) * total
     return tfd.Beta(concentration1=alpha, concentration0=beta)
 
+def reliability_mean(reliability: dict, name: str) -> float:
+    rb = reliability.get(name, {"alpha": 5.0, "beta": 5.0})
+    return rb["alpha"] / (rb["alpha"] + rb["beta"])
+
+def _branch_weights(branches: list[BranchOutput], reliability: dict) -> np.ndarray:
+    raw = np.array(
+        [
+            BASE_WEIGHTS.get(b.name, 0.2)
+            * reliability_mean(reliability, b.name)
+            * float(np.clip(b.confidence, 0.05, 1.0))
+            for b in branches
+        ],
+        dtype=np.float32,
+    )
+    return raw / (raw.sum() + 1e-6)
+
+def _tfp_summary(branches: list[BranchOutput], wvec: np.ndarray, n_samples: int):
+    dists = [
+        _beta_from_mean_conf(b.p_same_object, b.confidence)
+        for b in branches
+    ]
+
+    samples = np.stack(
+        [dist.sample(n_samples).numpy() for dist in dists],
+        axis=1,
+    )
+
+    post = np.sum(samples * wvec[None, :], axis=1)
+    low, high = np.percentile(post, [2.5, 97.5]).tolist()
+    return float(np.mean(post)), low, high
+
+def _numpy_summary(branches: list[BranchOutput], wvec: np.ndarray, n_samples: int, engine: str):
+    alpha, beta = beta_engine.beta_params(
+        [b.p_same_object for b in branches],
+        [b.confidence for b in branches],
+    )
+    if engine == "moments":
+        mean, var = beta_engine.posterior_moments(alpha, beta, wvec)
+        low, high = beta_engine.moment_interval(mean, var)
+    else:
+        mean, low, high = beta_engine.sampled_summary(
+            alpha, beta, wvec, n_samples=n_samples
+        )
+    return float(mean), float(low), float(high)
+
 def fuse_branch_outputs(
     branches: list[BranchOutput],
     n_samples: int = 256,
+    engine: str | None = None,
 ) -> FusionResult:
+    """
+    Reliability-weighted Beta mixture over branch outputs.
+
+    engine: "numpy_mc" (seeded NumPy sampler), "moments" (closed
+    form) or "tfp" (original TensorFlow Probability path, kept for
+    validation). Defaults to FUSION_ENGINE.
+    """
+    engine = engine or FUSION_ENGINE
     try:
         reliability = get_branch_reliability()
 
-        base = {
-            "manufacturing_signature": 0.22,
-            "ghost_context": 0.19,
-            "partial_completion": 0.15,
-            "negative_space": 0.23,
-            "visual_semantics": 0.21,
-        }
-
-        raw_weights = []
-        names = []
-
-        for b in branches:
-            rb = reliability.get(b.name, {"alpha": 5.0, "beta": 5.0})
-            rel_mean = rb["alpha"] / (rb["alpha"] + rb["beta"])
-            w = base.get(b.name, 0.2) * rel_mean * float(
-                np.clip(b.confidence, 0.05, 1.0)
-            )
-            raw_weights.append(w)
-            names.append(b.name)
-
-        raw = np.array(raw_weights, dtype=np.float32)
-        raw = raw / (raw.sum() + 1e-6)
-        weights = {n: float(w) for n, w in zip(names, raw)}
-
-        dists = [
-            _beta_from_mean_conf(b.p_same_object, b.confidence)
-            for b in branches
-        ]
+        names = [b.name for b in branches]
+        wvec = _branch_weights(branches, reliability)
+        weights = {n: float(w) for n, w in zip(names, wvec)}
 
-        samples = np.stack(
-            [dist.sample(n_samples).numpy() for dist in dists],
-            axis=1,
-        )
-
-        wvec = np.array([weights[n] for n in names], dtype=np.float32)
-        post = np.sum(samples * wvec[None, :], axis=1)
-
-        p_final = float(np.mean(post))
-        low, high = np.percentile(post, [2.5, 97.5]).tolist()
+        if engine == "tfp":
+            p_final, low, high = _tfp_summary(branches, wvec, n_samples)
+        else:
+            p_final, low, high = _numpy_summary(
+                branches, wvec, n_samples, engine
+            )
 
         return FusionResult(
             p_final=round(p_final, 3),
             confidence_interval=[round(low, 3), round(high, 3)],
             weights={k: round(v, 3) for k, v in weights.items()},
-            method="tfp_beta_bma",
+            method=_METHODS.get(engine, _METHODS["numpy_mc"]),
         )
 
     except Exception as e:
         logging.exception("Fusion failed; using fallback")
+        return _fallback_result(branches)
+
+def _fallback_result(branches: list[BranchOutput]) -> FusionResult:
+    avg = float(
+        np.mean([b.p_same_object for b in branches])
+        if branches else 0.5
+    )
+
+    return FusionResult(
+        p_final=round(avg, 3),
+        confidence_interval=[round(max(0.0, avg - 0.15), 3),
+                             round(min(1.0, avg + 0.15), 3)],
+        weights={b.name: round(1.0 / len(branches), 3)
+                 for b in branches} if branches else {},
+        method="fallback_mean",
+    )
 
-        avg = float(
-            np.mean([b.p_same_object for b in branches])
-            if branches else 0.5
+# -------------------------------------------------------------------
+# Batch fusion (N records x B branches)
+# -------------------------------------------------------------------
+
+# Batch default: the closed form costs O(N x B); the sampler draws
+# n_samples x N x B Betas and is only worth it for validation
+BATCH_ENGINE = os.environ.get("FUSION_BATCH_ENGINE", "moments")
+
+_BATCH_CHUNK = 2048  # bounds MC memory: n_samples x chunk x B
+
+def fuse_arrays(
+    names: list,
+    present: np.ndarray,
+    p: np.ndarray,
+    conf: np.ndarray,
+    n_samples: int = 256,
+    engine: str | None = None,
+    reliability: dict | None = None,
+) -> tuple:
+    """
+    Fusion core on (N, B) arrays, column j = branch names[j]; absent
+    branches (present False) get zero weight.
+
+    -> (mean [N], low [N], high [N], weights [N, B]), unrounded.
+    The moments engine matches fuse_branch_outputs up to the last
+    rounded digit; the sampled engine draws one seeded stream per
+    chunk, so its intervals differ by Monte Carlo noise.
+    """
+    engine = engine or BATCH_ENGINE
+    if reliability is None:
+        reliability = get_branch_reliability()
+
+    base = np.array(
+        [
+            BASE_WEIGHTS.get(n, 0.2) * reliability_mean(reliability, n)
+            for n in names
+        ],
+        dtype=np.float32,
+    )
+    raw = base[None, :] * np.clip(conf, 0.05, 1.0).astype(np.float32)
+    raw = np.where(present, raw, 0.0).astype(np.float32)
+    wmat = raw / (raw.sum(axis=1, keepdims=True) + 1e-6)
+
+    if engine == "tfp":
+        summaries = []
+        for i in range(p.shape[0]):
+            cols = np.flatnonzero(present[i])
+            branches = [
+                BranchOutput(name=names[j], p_same_object=float(p[i, j]), confidence=float(conf[i, j]))
+                for j in cols
+            ]
+            summaries.append(_tfp_summary(branches, wmat[i, cols], n_samples))
+        mean, low, high = (np.array(x) for x in zip(*summaries))
+        return mean, low, high, wmat
+
+    alpha, beta = beta_engine.beta_params(p, conf)
+    if engine == "moments":
+        mean, var = beta_engine.posterior_moments(alpha, beta, wmat)
+        low, high = beta_engine.moment_interval(mean, var)
+    else:
+        parts = [
+            beta_engine.sampled_summary(
+                alpha[s:s + _BATCH_CHUNK],
+                beta[s:s + _BATCH_CHUNK],
+                wmat[s:s + _BATCH_CHUNK],
+                n_samples=n_samples,
+            )
+            for s in range(0, p.shape[0], _BATCH_CHUNK)
+        ]
+        mean, low, high = (np.concatenate(x) for x in zip(*parts))
+    return mean, low, high, wmat
+
+def batch_method(engine: str | None = None) -> str:
+    return _METHODS.get(engine or BATCH_ENGINE, _METHODS["numpy_mc"])
+
+def fuse_branch_outputs_batch(
+    batch: list[list[BranchOutput]],
+    n_samples: int = 256,
+    engine: str | None = None,
+    reliability: dict | None = None,
+) -> list[FusionResult]:
+    """
+    Fuses N branch-output sets in one pass (see fuse_arrays).
+    Reliability is read once (or taken from `reliability`, e.g. a
+    candidate weight table under test). Defaults to BATCH_ENGINE.
+    """
+    if not batch:
+        return []
+
+    try:
+        names = list(dict.fromkeys(b.name for branches in batch for b in branches))
+        col = {n: j for j, n in enumerate(names)}
+
+        shape = (len(batch), len(names))
+        rows = np.fromiter(
+            (i for i, branches in enumerate(batch) for _ in branches), np.intp
         )
+        cols = np.fromiter((col[b.name] for branches in batch for b in branches), np.intp)
+        present = np.zeros(shape, bool)
+        p = np.full(shape, 0.5)
+        conf = np.zeros(shape)
+        present[rows, cols] = True
+        p[rows, cols] = [b.p_same_object for branches in batch for b in branches]
+        conf[rows, cols] = [b.confidence for branches in batch for b in branches]
 
-        return FusionResult(
-            p_final=round(avg, 3),
-            confidence_interval=[round(max(0.0, avg - 0.15), 3),
-                                 round(min(1.0, avg + 0.15), 3)],
-            weights={b.name: round(1.0 / len(branches), 3)
-                     for b in branches} if branches else {},
-            method="fallback_mean",
+        mean, low, high, wmat = fuse_arrays(
+            names, present, p, conf, n_samples, engine, reliability
         )
+
+        method = batch_method(engine)
+        mean = np.round(mean, 3)
+        low = np.round(low, 3)
+        high = np.round(high, 3)
+        wround = np.round(wmat.astype(np.float64), 3)
+
+        return [
+            FusionResult(
+                p_final=float(mean[i]),
+                confidence_interval=[float(low[i]), float(high[i])],
+                weights={
+                    b.name: float(wround[i, col[b.name]]) for b in branches
+                },
+                method=method,
+            )
+            for i, branches in enumerate(batch)
+        ]
+
+    except Exception:
+        logging.exception("Batch fusion failed; using fallback")
+        return [_fallback_result(branches) for branches in batch]
@@ -1,5 +1,10 @@
 import os
+import copy
+import time
+import atexit
 import logging
+import threading
+from google.api_core.exceptions import AlreadyExists
 from google.cloud import firestore
 
 PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT")
@@ -15,45 +20,215 @@ DEFAULTS = {
     "visual_semantics": {"alpha": 6.0, "beta": 4.0},
 }
 
+_NEW_BRANCH = {"alpha": 5.0, "beta": 5.0}
+
+# Cached snapshot is served for CACHE_TTL_S, then refreshed in the
+# background; feedback increments are flushed every FLUSH_INTERVAL_S.
+CACHE_TTL_S = float(os.environ.get("RELIABILITY_CACHE_TTL_S", "60"))
+FLUSH_INTERVAL_S = float(os.environ.get("RELIABILITY_FLUSH_S", "10"))
+
+_lock = threading.Lock()
+_cache = None
+_cache_at = 0.0
+_refreshing = False
+_pending = {}        # branch -> {"alpha": n, "beta": n}, not yet flushed
+_inflight = {}       # increments of the flush in progress, same shape
+_flush_seq = 0       # bumped when a flush starts and when it ends
+_flush_lock = threading.Lock()   # one flush at a time (periodic / atexit)
+_remote_known = set()  # branches known to exist in the Firestore doc
+_flusher = None
+
 def _get_db():
     global _db
     if _db is None:
         _db = firestore.Client()
     return _db
 
-def get_branch_reliability():
-    try:
-        db = _get_db()
-        ref = db.document(_DOC_PATH)
-        doc = ref.get()
+# -------------------------------------------------------------------
+# Remote snapshot
+# -------------------------------------------------------------------
 
-        if not doc.exists:
-            ref.set(DEFAULTS)
-            return DEFAULTS
+def _read_remote() -> dict:
+    ref = _get_db().document(_DOC_PATH)
+    doc = ref.get()
 
-        return doc.to_dict()
+    if not doc.exists:
+        try:
+            # Create-if-absent: never overwrite another instance's counts
+            ref.create(DEFAULTS)
+        except AlreadyExists:
+            return ref.get().to_dict()
+        return copy.deepcopy(DEFAULTS)
 
+    return doc.to_dict()
+
+def _load():
+    global _cache, _cache_at
+    with _lock:
+        seq = _flush_seq
+        flushing = bool(_inflight)
+    try:
+        snapshot = _read_remote()
+        remote = set(snapshot)
     except Exception:
         logging.exception("Failed to read fusion reliability; using defaults")
-        return DEFAULTS
+        snapshot = copy.deepcopy(DEFAULTS)
+        remote = set()
+    with _lock:
+        _remote_known.update(remote)
+        # A snapshot read while a flush was in progress may or may not
+        # hold its increments, which are folded into _cache separately:
+        # drop it (the next call refreshes again)
+        if _cache is not None and (flushing or seq != _flush_seq):
+            return
+        _cache = snapshot
+        _cache_at = time.monotonic()
+
+def _refresh_in_background():
+    global _refreshing
+
+    def work():
+        global _refreshing
+        try:
+            _load()
+        finally:
+            _refreshing = False
+
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+    threading.Thread(target=work, name="reliability-refresh", daemon=True).start()
+
+def _add_counts(table: dict, increments: dict):
+    # Caller holds the lock
+    for name, delta in increments.items():
+        rb = table.setdefault(name, dict(_NEW_BRANCH))
+        rb["alpha"] = rb.get("alpha", 5.0) + delta["alpha"]
+        rb["beta"] = rb.get("beta", 5.0) + delta["beta"]
+
+def _merged() -> dict:
+    # Snapshot plus this process's unflushed and in-flight increments
+    with _lock:
+        data = copy.deepcopy(_cache)
+        _add_counts(data, _inflight)
+        _add_counts(data, _pending)
+    return data
+
+# -------------------------------------------------------------------
+# Public API
+# -------------------------------------------------------------------
+
+def get_branch_reliability():
+    """
+    Cached reliability table. Only the first call blocks on Firestore;
+    afterwards a stale snapshot is served while a refresh runs.
+    """
+    if _cache is None:
+        _load()
+    elif time.monotonic() - _cache_at > CACHE_TTL_S:
+        _refresh_in_background()
+    return _merged()
 
 def update_branch_reliability(branch_name: str, is_correct: bool):
+    """
+    Records one feedback outcome in memory; the write reaches Firestore
+    with the next periodic flush.
+    """
+    if _cache is None:
+        _load()
+
+    with _lock:
+        delta = _pending.setdefault(branch_name, {"alpha": 0.0, "beta": 0.0})
+        delta["alpha" if is_correct else "beta"] += 1.0
+
+    _ensure_flusher()
+    return _merged().get(branch_name, dict(_NEW_BRANCH))
+
+@firestore.transactional
+def _seed_missing(transaction, ref, names: list) -> list:
+    """
+    Writes the prior for branches absent from the doc, in a transaction
+    so a branch another instance already has is left untouched.
+    """
+    snap = ref.get(transaction=transaction)
+    existing = (snap.to_dict() or {}) if snap.exists else {}
+    missing = {
+        n: dict(DEFAULTS.get(n, _NEW_BRANCH)) for n in names if n not in existing
+    }
+    if missing:
+        transaction.set(ref, missing, merge=True)
+    return list(missing)
+
+def flush_reliability_updates():
+    """
+    Writes all pending increments as one merge of firestore.Increment
+    transforms, after seeding the prior for branches the doc does not
+    have yet. On failure they are kept for the next flush.
+
+    Increments stay visible to _merged() throughout: they move from
+    _pending to _inflight, then into _cache under the same lock that
+    clears _inflight.
+    """
+    with _flush_lock:
+        _flush()
+
+def _flush():
+    global _pending, _inflight, _flush_seq
+    with _lock:
+        if not _pending:
+            return
+        pending, _pending = _pending, {}
+        _inflight = pending
+        _flush_seq += 1
+        unseeded = [n for n in pending if n not in _remote_known]
+
+    update = {
+        name: {k: firestore.Increment(v) for k, v in delta.items() if v}
+        for name, delta in pending.items()
+    }
+
     try:
         db = _get_db()
         ref = db.document(_DOC_PATH)
-        data = ref.get().to_dict() or DEFAULTS
+        seeded = _seed_missing(db.transaction(), ref, unseeded) if unseeded else []
+        with _lock:
+            _remote_known.update(unseeded)
+        ref.set(update, merge=True)
+    except Exception:
+        logging.exception("Failed to flush branch reliability updates")
+        with _lock:
+            for name, delta in pending.items():
+                cur = _pending.setdefault(name, {"alpha": 0.0, "beta": 0.0})
+                cur["alpha"] += delta["alpha"]
+                cur["beta"] += delta["beta"]
+            _inflight = {}
+            _flush_seq += 1
+        return
 
-        if branch_name not in data:
-            data[branch_name] = {"alpha": 5.0, "beta": 5.0}
+    # Fold the flushed increments into the local snapshot
+    with _lock:
+        for name in seeded:
+            _cache.setdefault(name, dict(DEFAULTS.get(name, _NEW_BRANCH)))
+        _add_counts(_cache, pending)
+        _inflight = {}
+        _flush_seq += 1
 
-        if is_correct:
-            data[branch_name]["alpha"] += 1.0
-        else:
-            data[branch_name]["beta"] += 1.0
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
 
-        ref.set(data)
-        return data[branch_name]
+    def loop():
+        while True:
+            time.sleep(FLUSH_INTERVAL_S)
+            flush_reliability_updates()
 
-    except Exception:
-        logging.exception("Failed to update branch reliability")
-        return DEFAULTS.get(branch_name, {"alpha": 5.0, "beta": 5.0})
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=loop, name="reliability-flush", daemon=True
+            )
+            _flusher.start()
+
+atexit.register(flush_reliability_updates)
@@ -1,13 +1,17 @@
 import time
+import json
 import uuid
+import asyncio
+import contextlib
+import functools
 import os
-import json
+import threading
 import logging
 import google.auth
 from fastapi import FastAPI, File, UploadFile, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from google.cloud import storage, firestore
+from fastapi.responses import JSONResponse, StreamingResponse
+from google.cloud import firestore
 from firestore.router import router as firestore_router
 
 # -------------------------------------------------------------------
@@ -61,115 +65,10 @@ app.add_middleware(
 )
 
 # -------------------------------------------------------------------
-# Lazy GCP clients
+# Lazy GCP clients (storage: utils.storage_io, pooled per process)
 # -------------------------------------------------------------------
 
-_storage_client = None
 _firestore_client = None
-_bucket = None
-
-def get_storage():
-    global _storage_client, _bucket
-    if _bucket is not None:
-        return _bucket
-
-    # Local filesystem fallback (no GCP credentials required)
-    local_dev = os.getenv("LOCAL_DEV", "false").lower() == "true" or PROJECT_ID == "unknown-project"
-
-    if local_dev:
-        root = os.path.join(os.getcwd(), "local_data", BUCKET_NAME)
-        os.makedirs(root, exist_ok=True)
-
-        class LocalBlob:
-            def __init__(self, root_dir: str, name: str):
-                self._root = root_dir
-                self._name = name
-                self.name = name
-
-            def upload_from_string(self, data: bytes, content_type: str | None = None):
-                path = os.path.join(self._root, self._name.replace("/", os.sep))
-                os.makedirs(os.path.dirname(path), exist_ok=True)
-                mode = "wb"
-                with open(path, mode) as f:
-                    f.write(data)
-                return True
-
-        class LocalBucket:
-            def __init__(self, root_dir: str):
-                self._root = root_dir
-
-            def blob(self, name: str):
-                return LocalBlob(self._root, name)
-
-        _bucket = LocalBucket(root)
-        return _bucket
-
-    # Default: use real GCS client
-    try:
-        _storage_client = storage.Client()
-        # Verify the bucket exists before returning it to avoid runtime 404s.
-        existing_bucket = _storage_client.lookup_bucket(BUCKET_NAME)
-        if existing_bucket is None:
-            logging.error(
-                f"GCS bucket '{BUCKET_NAME}' not found in project '{PROJECT_ID}'; falling back to local storage"
-            )
-            # Fallback to local filesystem if the bucket isn't present
-            root = os.path.join(os.getcwd(), "local_data", BUCKET_NAME)
-            os.makedirs(root, exist_ok=True)
-
-            class LocalBlob:
-                def __init__(self, root_dir: str, name: str):
-                    self._root = root_dir
-                    self._name = name
-                    self.name = name
-
-                def upload_from_string(self, data: bytes, content_type: str | None = None):
-                    path = os.path.join(self._root, self._name.replace("/", os.sep))
-                    os.makedirs(os.path.dirname(path), exist_ok=True)
-                    with open(path, "wb") as f:
-                        f.write(data)
-                    return True
-
-            class LocalBucket:
-                def __init__(self, root_dir: str):
-                    self._root = root_dir
-
-                def blob(self, name: str):
-                    return LocalBlob(self._root, name)
-
-            _bucket = LocalBucket(root)
-            return _bucket
-
-        _bucket = existing_bucket
-        return _bucket
-    except Exception as e:
-        logging.exception(f"GCS storage init failed: {e}")
-        # Final safety: fallback to local even if LOCAL_DEV not set
-        root = os.path.join(os.getcwd(), "local_data", BUCKET_NAME)
-        os.makedirs(root, exist_ok=True)
-
-        class LocalBlob:
-            def __init__(self, root_dir: str, name: str):
-                self._root = root_dir
-                self._name = name
-                self.name = name
-
-            def upload_from_string(self, data: bytes, content_type: str | None = None):
-                path = os.path.join(self._root, self._name.replace("/", os.sep))
-                os.makedirs(os.path.dirname(path), exist_ok=True)
-                with open(path, "wb") as f:
-                    f.write(data)
-                return True
-
-        class LocalBucket:
-            def __init__(self, root_dir: str):
-                self._root = root_dir
-
-            def blob(self, name: str):
-                return LocalBlob(self._root, name)
-
-        _bucket = LocalBucket(root)
-        return _bucket
 
 def get_firestore():
     global _firestore_client
@@ -202,8 +101,20 @@ except Exception:
 # -------------------------------------------------------------------
 
 from preprocess import normalize_image
+from pipeline.frame import Frame
+from pipeline.buffers import UploadBuffer
+from pipeline.scheduler import (
+    BranchResult,
+    BranchSpec,
+    branch_timings as branch_timings_of,
+    iter_branches,
+    shutdown as shutdown_branches,
+    stats as branch_pool_stats,
+)
+from pipeline import warmup
+from pipeline.result_cache import get_result_cache, make_key as result_cache_key
 
-from branch_a.clip_vit_signs import process_image_bytes as run_branch_a
+from branch_a.clip_vit_signs import run_branch_a
 from branch_b.ghost_context import build_ghost_context_embedding
 from branch_c.partial_completion import run_partial_object_completion
 from branch_de.branch_d_negative_space import run_branch_d_negative_space
@@ -212,17 +123,54 @@ from branch_de.branch_e_semantic_grounding import (
 )
 
 from fusion.fusion_service import run_fusion
+from fusion import incremental as incremental_fusion
 from explainability.visual_identity_confidence import (
     build_visual_identity_confidence,
 )
+from explainability import jobs as explain_jobs
 
 from ranking_improving.ranker import rank_top_k_objects
 from ranking_improving.feedback import apply_user_feedback
 from utils.sanitize import sanitize_for_logs
+from utils import gemini_cache
+from utils import storage_io
+from utils import vector_sidecar
 
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
 
-def _sanitize_and_store(uid: str, ts: int, branches: dict, bucket):
+# Branch A sub-signals computed per request (comma separated).
+# "clip_embedding" is returned with Branch A only: catalog objects do
+# not carry it, so ranking does not use it.
+BRANCH_A_OUTPUTS = tuple(
+    o.strip()
+    for o in os.getenv("BRANCH_A_OUTPUTS", "manufacturing_signature").split(",")
+    if o.strip()
+)
+
+# Everything besides the image that shapes branch / fusion / explainability
+# output; part of the result-cache key so a config change never serves
+# stale results.
+RESULT_CACHE_CONFIG = {
+    "branch_a_outputs": BRANCH_A_OUTPUTS,
+    "partial_completion_max_n": 5,
+    "fusion_engine": os.getenv("FUSION_ENGINE", "numpy_mc"),
+    "gemini_model": os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+    "imagen_model": os.getenv("IMAGEN_MODEL", "imagegeneration@002"),
+    "fusion_early_exit": (
+        os.getenv("FUSION_EARLY_EXIT", "true"),
+        os.getenv("FUSION_EARLY_EXIT_WIDTH", "0.2"),
+        os.getenv("FUSION_DECISION_THRESHOLD", "0.5"),
+        os.getenv("FUSION_EARLY_EXIT_SKIPPABLE", "ghost_context,partial_completion"),
+    ),
+}
+
+def _sanitize_and_store(uid: str, ts: int, branches: dict):
+    """
+    Moves large vectors into a binary embeddings sidecar (see
+    utils.vector_sidecar). Returns (sanitized branches, blob URI or
+    None, write future or None); the write runs in the background.
+    """
+    blob_path = f"embeddings/{ts}_{uid}.vec"
     large = {}
     def walk(obj, path):
         if isinstance(obj, dict):
@@ -231,8 +179,8 @@ def _sanitize_and_store(uid: str, ts: int, branches: dict, bucket):
                 p = f"{path}.{k}" if path else k
                 if isinstance(v, list) and len(v) > 50:
                     large[p] = v
-                    out[k] = {"vector_ref": f"gs://{BUCKET_NAME}/embeddings/{ts}_{uid}.json#{p}", "len": len(v)}
-                elif isinstance(v, dict):
+                    out[k] = {"vector_ref": vector_sidecar.make_ref(BUCKET_NAME, blob_path, p), "len": len(v)}
+                elif isinstance(v, (dict, list)):
                     out[k] = walk(v, p)
                 else:
                     out[k] = v
@@ -240,16 +188,25 @@ def _sanitize_and_store(uid: str, ts: int, branches: dict, bucket):
         elif isinstance(obj, list):
             if len(obj) > 50:
                 large[path or "list"] = obj
-                return {"list_ref": f"gs://{BUCKET_NAME}/embeddings/{ts}_{uid}.json#{path or 'list'}", "len": len(obj)}
-            return obj
+                return {"list_ref": vector_sidecar.make_ref(BUCKET_NAME, blob_path, path or "list"), "len": len(obj)}
+            # Short lists of records (e.g. Branch C completions) may hold vectors
+            return [
+                walk(v, f"{path}.{i}") if isinstance(v, (dict, list)) else v
+                for i, v in enumerate(obj)
+            ]
         return obj
     sanitized = walk(branches, "")
     ref = None
+    write = None
     if large:
-        blob_path = f"embeddings/{ts}_{uid}.json"
-        bucket.blob(blob_path).upload_from_string(json.dumps(large), content_type="application/json")
+        write = storage_io.submit_put(
+            blob_path,
+            vector_sidecar.encode(large),
+            "application/octet-stream",
+            BUCKET_NAME,
+        )
         ref = f"gs://{BUCKET_NAME}/{blob_path}"
-    return sanitized, ref
+    return sanitized, ref, write
 
 # -------------------------------------------------------------------
 # Health check (must always succeed)
@@ -263,6 +220,48 @@ async def health():
         "branches": ["A", "B", "C", "D", "E"],
     }
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness (distinct from /health): 200 only once warm-up finished.
+    """
+    state = warmup.status()
+    return JSONResponse(state, status_code=200 if warmup.is_ready() else 503)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    cache = get_result_cache()
+    return {
+        "result_cache": cache.stats() if cache is not None else None,
+        "gemini_cache": gemini_cache.stats(),
+        "explain_jobs": explain_jobs.stats(),
+    }
+
+@app.get("/fusion/stats")
+async def fusion_stats():
+    # Early-exit rate and estimated time saved (FUSION_EARLY_EXIT_*)
+    return incremental_fusion.stats()
+
+@app.get("/branches/stats")
+async def branches_stats():
+    # Pool sizes and timed-out branches still holding a slot
+    return branch_pool_stats()
+
+# -------------------------------------------------------------------
+# Lifecycle
+# -------------------------------------------------------------------
+
+@app.on_event("startup")
+async def _start_warmup():
+    # Runs in the background so /health answers during model loading
+    warmup.start_background()
+
+@app.on_event("shutdown")
+async def _shutdown_branch_pools():
+    shutdown_branches()
+    explain_jobs.shutdown()
+    storage_io.shutdown()
+
 # -------------------------------------------------------------------
 # Firestore persistence
 # -------------------------------------------------------------------
@@ -300,153 +299,367 @@ def store_analysis_in_firestore(
     doc_ref.set(payload)
 
 # -------------------------------------------------------------------
-# Main analysis endpoint
+# Branches + fusion + explainability (the cacheable part of /analyze)
 # -------------------------------------------------------------------
 
-@app.post("/analyze")
-async def analyze(file: UploadFile = File(...)):
-    ts = int(time.time())
-    uid = str(uuid.uuid4())
-    logging.info(f"[{uid}] Analyze request started")
-
+def _branch_e_after_upload(norm_upload, gcs_uri: str, **kwargs) -> dict:
+    # Branch E reads the normalized image back from GCS
+    norm_upload.result()
+    return run_branch_e_semantics_from_gcs(gcs_uri, **kwargs)
+
+
+def _branch_specs(frame: Frame, gcs_uri: str, norm_upload, cancel) -> list[BranchSpec]:
+    """
+    cancel (threading.Event) is set on early exit so the skippable
+    branches stop before their next Imagen / Gemini / embedding call;
+    it keeps B and C on the thread pool.
+    """
+    return [
+        BranchSpec(
+            key="manufacturing_signature",
+            label="A",
+            fn=run_branch_a,
+            args=(frame,),
+            kwargs={"outputs": BRANCH_A_OUTPUTS},
+            # In-process so the ViT trunk pass is shared with Grad-CAM
+            executor="thread",
+        ),
+        BranchSpec(
+            key="ghost_context",
+            label="B",
+            fn=build_ghost_context_embedding,
+            args=(frame,),
+            kwargs={"cancel": cancel},
+        ),
+        BranchSpec(
+            key="partial_completion",
+            label="C",
+            fn=run_partial_object_completion,
+            args=(frame,),
+            # n chosen per image from the occlusion estimate
+            kwargs={
+                "max_n": RESULT_CACHE_CONFIG["partial_completion_max_n"],
+                "cancel": cancel,
+            },
+        ),
+        BranchSpec(
+            key="negative_space",
+            label="D",
+            fn=run_branch_d_negative_space,
+            args=(frame,),
+            executor="process",
+        ),
+        BranchSpec(
+            key="visual_semantics",
+            label="E",
+            fn=_branch_e_after_upload,
+            args=(norm_upload, gcs_uri),
+            kwargs={"contextual_text": "Object identity grounding"},
+        ),
+    ]
+
+
+async def _explain(frame: Frame, fusion_result: dict, ts: int, uid: str):
+    """
+    -> (explainability dict, background job or None)
+    """
+    heatmap_object_path = f"heatmaps/{ts}_{uid}_vit_gradcam.jpg"
+    # Early-exit timings differ on every run; kept out of the prompt so
+    # the Gemini memo key stays stable
+    context_for_gemini = {
+        "fusion_result": {k: v for k, v in fusion_result.items() if k != "early_exit"},
+        "branch_weights": fusion_result.get("branch_weights", {}),
+    }
+    if explain_jobs.is_async():
+        # Off the critical path; fetched via GET /explain/{request_id}
+        job = explain_jobs.submit(
+            uid,
+            frame=frame,
+            bucket_name=BUCKET_NAME,
+            heatmap_object_path=heatmap_object_path,
+            context_for_gemini=context_for_gemini,
+        )
+        return explain_jobs.placeholder(uid, job.heatmap_object_path, job.status), job
+
+    # Grad-CAM + Gemini block; they run on the explain pool so the event
+    # loop keeps serving. Heatmap upload overlaps the Gemini call
+    heatmap_writes = []
+    explainability = await asyncio.get_running_loop().run_in_executor(
+        explain_jobs.executor(),
+        functools.partial(
+            build_visual_identity_confidence,
+            norm_jpg_bytes=frame,
+            bucket_name=BUCKET_NAME,
+            heatmap_object_path=heatmap_object_path,
+            context_for_gemini=context_for_gemini,
+            pending_writes=heatmap_writes,
+        ),
+    )
+    try:
+        await asyncio.gather(*(asyncio.wrap_future(w) for w in heatmap_writes))
+    except Exception:
+        logging.exception("Heatmap upload failed")
+        explainability["heatmap_url"] = None
+        explainability["heatmap_object_path"] = None
+    explainability["status"] = "done"
+    return explainability, None
+
+
+async def _iter_until_decided(specs: list[BranchSpec], fuser, cancel):
+    """
+    Branch results in completion order; stops once incremental fusion
+    is decided. Queued branches are dropped and running ones see cancel
+    set (they cannot be interrupted mid-call).
+    """
     try:
-        raw_bytes = await file.read()
+        async with contextlib.aclosing(iter_branches(specs)) as results:
+            async for r in results:
+                fuser.add(r.key, r.output)
+                yield r
+                if fuser.decided:
+                    logging.info(
+                        "Early exit after %.0fms; skipping %s",
+                        fuser.decided_at_ms, ", ".join(fuser.outstanding),
+                    )
+                    break
+    finally:
+        cancel.set()
+
+
+def _settle_branches(specs: list[BranchSpec], branch_results: dict, fuser) -> tuple:
+    """
+    Fills skipped branches, fuses what completed and records the
+    early-exit counters. -> (branch results in spec order, fusion result)
+    """
+    for spec in specs:
+        if spec.key not in branch_results:
+            branch_results[spec.key] = BranchResult(
+                key=spec.key,
+                label=spec.label,
+                output={"confidence": None, "skipped": "early_exit"},
+                status="skipped",
+                wall_ms=None,
+            )
+    branch_results = {spec.key: branch_results[spec.key] for spec in specs}
+
+    fusion_result = run_fusion({
+        k: r.output for k, r in branch_results.items() if r.status != "skipped"
+    })
+    fusion_result["early_exit"] = fuser.summary()
+    incremental_fusion.record(
+        fuser, {k: r.wall_ms for k, r in branch_results.items()}
+    )
+    return branch_results, fusion_result
 
-        bucket = get_storage()
 
-        # 1) Store raw image
-        raw_name = f"raw/{ts}_{uid}_{file.filename}"
-        bucket.blob(raw_name).upload_from_string(
-            raw_bytes, content_type=file.content_type
-        )
+def _analysis_from(branch_results: dict, fusion_result: dict, explainability: dict) -> dict:
+    return {
+        "branches": {k: r.output for k, r in branch_results.items()},
+        "branch_status": {k: r.status for k, r in branch_results.items()},
+        "fusion_result": fusion_result,
+        "explainability": explainability,
+    }
 
-        # 2) Normalize
-        norm_bytes, normalization_meta = normalize_image(raw_bytes)
-
-        # Guard: ensure normalized image is bytes (handle accidental tuple/array returns)
-        # - If normalize_image returned a tuple accidentally, take the second element
-        # - If a numpy array-like, convert via tobytes()
-        if isinstance(norm_bytes, tuple):
-            # defensive: some versions mistakenly return (meta, bytes)
-            norm_bytes = norm_bytes[1]
-        if hasattr(norm_bytes, "tobytes"):
-            try:
-                norm_bytes = norm_bytes.tobytes()
-            except Exception:
-                # Fall through; type check below will raise useful error
-                pass
-        if not isinstance(norm_bytes, (bytes, bytearray)):
-            raise TypeError(
-                f"normalize_image returned {type(norm_bytes)}; expected bytes or bytearray"
-            )
 
-        # Safe log (no raw binary in logs)
+async def _run_analysis(norm_bytes: bytes, gcs_uri: str, ts: int, uid: str, norm_upload):
+    # Decoded once, shared by every branch
+    frame = Frame.from_bytes(norm_bytes)
+
+    # 3) Branch execution (concurrent, fail-soft; stops early once the
+    # posterior is decided without the slow branches)
+    cancel = threading.Event()
+    specs = _branch_specs(frame, gcs_uri, norm_upload, cancel)
+    fuser = incremental_fusion.IncrementalFusion([spec.key for spec in specs])
+    branch_results = {}
+    async for r in _iter_until_decided(specs, fuser, cancel):
+        branch_results[r.key] = r
+
+    # 4) Fusion (over the branches that completed)
+    branch_results, fusion_result = _settle_branches(specs, branch_results, fuser)
+    branch_timings = branch_timings_of(branch_results)
+
+    # 5) Explainability
+    explainability, job = await _explain(frame, fusion_result, ts, uid)
+
+    analysis = _analysis_from(branch_results, fusion_result, explainability)
+    return analysis, branch_timings, job
+
+
+def _cacheable(analysis: dict) -> bool:
+    # Never pin a transient failure (timeouts, quota, missing heatmap)
+    if any(s not in ("ok", "skipped") for s in analysis["branch_status"].values()):
+        return False
+    return analysis["explainability"].get("heatmap_object_path") is not None
+
+
+def _cache_analysis(cache, cache_key: str, analysis: dict, job):
+    """
+    Caches now, or once the explainability job finished so cached
+    entries always carry the final explanation.
+    """
+    def put(explainability: dict):
+        entry = dict(analysis)
+        if job is not None:
+            entry["explainability"] = {**explainability, "status": job.status}
+        if not _cacheable(entry):
+            return
         try:
-            import hashlib
-
-            logging.info(
-                "[%s] normalized image: len=%d sha1=%s",
-                uid,
-                len(norm_bytes),
-                hashlib.sha1(norm_bytes).hexdigest(),
-            )
+            cache.put(cache_key, entry)
         except Exception:
-            logging.info("[%s] normalized image available (len=%d)", uid, len(norm_bytes))
-
-        norm_name = f"normalized/{ts}_{uid}.jpg"
-        # Ensure upload is passed bytes
-        bucket.blob(norm_name).upload_from_string(
-            bytes(norm_bytes), content_type="image/jpeg"
-        )
-
-        gcs_uri = f"gs://{BUCKET_NAME}/{norm_name}"
+            logging.exception("Result cache write failed")
 
-        # 3) Branch execution (fail-soft)
-        branches = {}
+    if job is None:
+        put(analysis["explainability"])
+    else:
+        job.on_done(put)
 
-        try:
-            branches["manufacturing_signature"] = run_branch_a(
-                norm_bytes
-            )["manufacturing_signature"]
-        except Exception:
-            logging.exception("Branch A failed")
-            branches["manufacturing_signature"] = {"confidence": 0.0}
+# -------------------------------------------------------------------
+# /analyze stages shared by the JSON and streaming endpoints
+# -------------------------------------------------------------------
 
-        try:
-            branches["ghost_context"] = build_ghost_context_embedding(
-                norm_bytes
-            )
-        except Exception:
-            logging.exception("Branch B failed")
-            branches["ghost_context"] = {"confidence": 0.0}
+def _ingest(file: UploadFile, ts: int, uid: str):
+    """
+    Starts the raw upload and normalizes the image.
+    -> (norm_bytes, normalization_meta, gcs_uri, writes, norm_upload)
+    """
+    raw_name = f"raw/{ts}_{uid}_{file.filename}"
+    norm_name = f"normalized/{ts}_{uid}.jpg"
+    gcs_uri = f"gs://{BUCKET_NAME}/{norm_name}"
+
+    # Upload body stays in its spooled temp file; no full read()
+    with UploadBuffer.from_upload(file) as upload:
+        # 1) Store raw image (streamed from the spool, in the background)
+        raw_upload = storage_io.submit_put_stream(
+            raw_name,
+            upload.fileobj(),
+            size=upload.size,
+            content_type=file.content_type,
+            bucket_name=BUCKET_NAME,
+        )
 
-        try:
-            branches["partial_completion"] = run_partial_object_completion(
-                norm_bytes, n=5
-            )
-        except Exception:
-            logging.exception("Branch C failed")
-            branches["partial_completion"] = {"confidence": 0.0}
+        # 2) Normalize (decodes straight from a read-only view)
+        norm_bytes, normalization_meta = normalize_image(upload.view())
 
-        try:
-            branches["negative_space"] = run_branch_d_negative_space(
-                norm_bytes
-            )
-        except Exception:
-            logging.exception("Branch D failed")
-            branches["negative_space"] = {"confidence": 0.0}
+    logging.info(
+        "[%s] normalized image: raw=%d len=%d sha256=%s",
+        uid,
+        upload.size,
+        len(norm_bytes),
+        normalization_meta.get("hash", "")[:16],
+    )
 
+    norm_upload = storage_io.submit_put(
+        norm_name, norm_bytes, "image/jpeg", BUCKET_NAME
+    )
+    # raw / normalized / heatmap / embeddings writes overlap each
+    # other and the analysis; all are awaited before responding
+    writes = [raw_upload, norm_upload]
+    return norm_bytes, normalization_meta, gcs_uri, writes, norm_upload
+
+
+def _refuse(analysis: dict) -> dict:
+    """
+    Cached analysis with its branch outputs fused again: branch
+    reliability moves with every feedback, so a cached fusion_result
+    would keep the weights of when it was stored.
+    """
+    status = analysis["branch_status"]
+    fusion_result = run_fusion({
+        k: v for k, v in analysis["branches"].items() if status.get(k) != "skipped"
+    })
+    fusion_result["early_exit"] = analysis["fusion_result"].get("early_exit")
+    return {**analysis, "fusion_result": fusion_result}
+
+
+def _cache_lookup(normalization_meta: dict):
+    """
+    -> (cache, key, cached analysis or None)
+    """
+    cache = get_result_cache()
+    image_hash = normalization_meta.get("hash")
+    cache_key = result_cache_key(image_hash, RESULT_CACHE_CONFIG) if image_hash else None
+    cached = cache.get(cache_key) if cache is not None and cache_key else None
+    if cached is not None:
         try:
-            branches["visual_semantics"] = run_branch_e_semantics_from_gcs(
-                gcs_uri,
-                contextual_text="Object identity grounding",
-            )
+            cached = _refuse(cached)
         except Exception:
-            logging.exception("Branch E failed")
-            branches["visual_semantics"] = {"confidence": 0.0}
+            logging.exception("Re-fusing cached analysis failed; recomputing")
+            cached = None
+    return cache, cache_key, cached
 
-        # 4) Fusion
-        fusion_result = run_fusion(branches)
 
-        # 5) Explainability
-        explainability = build_visual_identity_confidence(
-            norm_jpg_bytes=norm_bytes,
-            bucket_name=BUCKET_NAME,
-            heatmap_object_path=f"heatmaps/{ts}_{uid}_vit_gradcam.jpg",
-            context_for_gemini={
-                "fusion_result": fusion_result,
-                "branch_weights": fusion_result.get("branch_weights", {}),
+def _rank(branches: dict, ts: int) -> list:
+    try:
+        return rank_top_k_objects(
+            query_embeddings={
+                "semantic_embedding": branches.get(
+                    "visual_semantics", {}
+                ).get("semantic_embedding", []),
+                "negative_space_128d": branches.get(
+                    "negative_space", {}
+                ).get("void_signature_128d", []),
             },
+            query_meta={
+                "timestamp": ts,
+                "location": {"city": "Bengaluru"},
+            },
+            k=5,
         )
+    except Exception:
+        logging.exception("Ranking failed")
+        return []
 
-        # 6) Ranking
-        top_k = []
-        try:
-            top_k = rank_top_k_objects(
-                query_embeddings={
-                    "semantic_embedding": branches.get(
-                        "visual_semantics", {}
-                    ).get("semantic_embedding", []),
-                    "negative_space_128d": branches.get(
-                        "negative_space", {}
-                    ).get("void_signature_128d", []),
-                },
-                query_meta={
-                    "timestamp": ts,
-                    "location": {"city": "Bengaluru"},
-                },
-                k=5,
-            )
-        except Exception:
-            logging.exception("Ranking failed")
 
-        # 7) Sanitize and persist
+async def _finalize(
+    uid: str,
+    ts: int,
+    filename: str,
+    gcs_uri: str,
+    normalization_meta: dict,
+    analysis: dict,
+    branch_timings: dict,
+    cache_hit: bool,
+    writes: list,
+    on_uploaded=None,
+) -> dict:
+    """
+    Ranking, persistence and the final /analyze response payload.
+    on_uploaded() runs once the raw and normalized images are stored
+    (e.g. the result-cache write).
+    """
+    branches = analysis["branches"]
+    branch_status = analysis["branch_status"]
+    fusion_result = analysis["fusion_result"]
+    explainability = analysis["explainability"]
+
+    # 6) Ranking
+    top_k = _rank(branches, ts)
+
+    # 7) Sanitize and persist. The embeddings sidecar upload starts now
+    # and overlaps the image uploads; it stays best-effort
+    embeddings_ref = None
+    sanitized_branches = None
+    try:
+        sanitized_branches, embeddings_ref, embeddings_write = _sanitize_and_store(
+            uid, ts, branches
+        )
+        if embeddings_write is not None:
+            writes.append(embeddings_write)
+    except Exception:
+        logging.exception("Embeddings sidecar failed")
+
+    # Raw / normalized failures fail the request as before, and before
+    # anything that points at them (sighting, cache entry) is committed
+    await asyncio.gather(*(asyncio.wrap_future(w) for w in writes[:2]))
+    if on_uploaded is not None:
+        on_uploaded()
+
+    if sanitized_branches is not None:
         try:
-            sanitized_branches, embeddings_ref = _sanitize_and_store(uid, ts, branches, bucket)
             store_analysis_in_firestore(
                 uid=uid,
                 ts=ts,
-                filename=file.filename,
+                filename=filename,
                 gcs_uri=gcs_uri,
                 branches=sanitized_branches,
                 fusion_result=fusion_result,
@@ -455,37 +668,243 @@ async def analyze(file: UploadFile = File(...)):
         except Exception:
             logging.exception("Firestore write failed")
 
-        logging.info(f"[{uid}] Analyze request completed")
+    try:
+        await asyncio.gather(*(asyncio.wrap_future(w) for w in writes[2:]))
+    except Exception:
+        logging.exception("Embeddings upload failed")
+        embeddings_ref = None
+
+    logging.info(f"[{uid}] Analyze request completed")
+
+    response_payload = {
+        "request_id": uid,
+        "timestamp": ts,
+        "normalized_gcs_uri": gcs_uri,
+        "fusion_summary": {
+            "confidence": fusion_result.get("confidence"),
+            "branch_weights": fusion_result.get("branch_weights", {}),
+            "early_exit": fusion_result.get("early_exit"),
+        },
+        "branch_confidences": {k: v.get("confidence") for k, v in branches.items()},
+        "branch_timings_ms": branch_timings,
+        "branch_status": branch_status,
+        "result_cache": "hit" if cache_hit else "miss",
+        "explainability": {
+            "summary": explainability.get("interpretation"),
+            "heatmap_object_path": explainability.get("heatmap_object_path"),
+            # "pending": poll GET /explain/{request_id}
+            "status": explainability.get("status", "done"),
+        },
+        "embeddings_ref": embeddings_ref,
+        "top_k": [
+            {"object_id": t.get("object_id"), "score": t.get("match_probability", t.get("score"))}
+            for t in top_k
+        ],
+    }
+    if DEBUG:
+        logging.debug(sanitize_for_logs(response_payload))
+    return response_payload
+
+# -------------------------------------------------------------------
+# Main analysis endpoint
+# -------------------------------------------------------------------
+
+@app.post("/analyze")
+async def analyze(file: UploadFile = File(...)):
+    ts = int(time.time())
+    uid = str(uuid.uuid4())
+    logging.info(f"[{uid}] Analyze request started")
+
+    try:
+        norm_bytes, normalization_meta, gcs_uri, writes, norm_upload = _ingest(file, ts, uid)
+
+        # 3-5) Branches, fusion, explainability: reused for repeat uploads
+        # of the same normalized image
+        cache, cache_key, cached = _cache_lookup(normalization_meta)
+        cache_write = None
+        if cached is not None:
+            logging.info(f"[{uid}] Result cache hit for {normalization_meta['hash'][:12]}")
+            analysis = cached
+            branch_timings = {}
+        else:
+            analysis, branch_timings, explain_job = await _run_analysis(
+                norm_bytes, gcs_uri, ts, uid, norm_upload
+            )
+            if cache is not None and cache_key:
+                cache_write = functools.partial(
+                    _cache_analysis, cache, cache_key, analysis, explain_job
+                )
+
+        response_payload = await _finalize(
+            uid, ts, file.filename, gcs_uri, normalization_meta,
+            analysis, branch_timings, cached is not None, writes,
+            on_uploaded=cache_write,
+        )
+        return JSONResponse(response_payload)
 
-        response_payload = {
+    except Exception as e:
+        logging.exception(f"[{uid}] Analyze request failed")
+        return JSONResponse(
+            {"status": "error", "message": str(e)}, status_code=500
+        )
+
+# -------------------------------------------------------------------
+# Streaming analysis endpoint (server-sent events)
+#
+#   accepted  -> request_id, timestamp, normalized_gcs_uri
+#   branch    -> one per branch as it finishes (key, status, wall_ms,
+#                confidence)
+#   fusion    -> provisional over completed branches after each branch,
+#                then final (provisional: false)
+#   result    -> same payload as POST /analyze
+#   error     -> {"message"}; the stream ends
+# -------------------------------------------------------------------
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _fusion_event(fusion_result: dict, completed: list, provisional: bool) -> dict:
+    return {
+        "provisional": provisional,
+        "completed": completed,
+        "confidence": fusion_result.get("confidence"),
+        "confidence_interval": fusion_result.get("confidence_interval"),
+        "branch_weights": fusion_result.get("branch_weights", {}),
+        "early_exit": fusion_result.get("early_exit"),
+    }
+
+
+async def _analyze_events(file: UploadFile, ts: int, uid: str, prepared):
+    norm_bytes, normalization_meta, gcs_uri, writes, norm_upload = prepared
+    try:
+        yield _sse("accepted", {
             "request_id": uid,
             "timestamp": ts,
             "normalized_gcs_uri": gcs_uri,
-            "fusion_summary": {
-                "confidence": fusion_result.get("confidence"),
-                "branch_weights": fusion_result.get("branch_weights", {}),
-            },
-            "branch_confidences": {k: v.get("confidence") for k, v in branches.items()},
-            "explainability": {
-                "summary": explainability.get("interpretation"),
-                "heatmap_object_path": explainability.get("heatmap_object_path"),
-            },
-            "embeddings_ref": embeddings_ref,
-            "top_k": [
-                {"object_id": t.get("object_id"), "score": t.get("match_probability", t.get("score"))}
-                for t in top_k
-            ],
-        }
-        if DEBUG:
-            logging.debug(sanitize_for_logs(response_payload))
-        return JSONResponse(response_payload)
+        })
+
+        cache, cache_key, cached = _cache_lookup(normalization_meta)
+        cache_write = None
+        if cached is not None:
+            analysis = cached
+            branch_timings = {}
+            for key, output in analysis["branches"].items():
+                yield _sse("branch", {
+                    "key": key,
+                    "status": analysis["branch_status"].get(key, "ok"),
+                    "wall_ms": None,
+                    "confidence": output.get("confidence"),
+                })
+        else:
+            frame = Frame.from_bytes(norm_bytes)
+            cancel = threading.Event()
+            specs = _branch_specs(frame, gcs_uri, norm_upload, cancel)
+            fuser = incremental_fusion.IncrementalFusion([spec.key for spec in specs])
+            branch_results = {}
+            async for r in _iter_until_decided(specs, fuser, cancel):
+                branch_results[r.key] = r
+                yield _sse("branch", {
+                    "key": r.key,
+                    "label": r.label,
+                    "status": r.status,
+                    "wall_ms": r.wall_ms,
+                    "confidence": r.output.get("confidence"),
+                })
+                if fuser.outstanding and not fuser.decided:
+                    provisional = run_fusion(
+                        {k: b.output for k, b in branch_results.items()}
+                    )
+                    yield _sse("fusion", _fusion_event(
+                        provisional, list(branch_results), provisional=True
+                    ))
+
+            # Spec order, so the result matches POST /analyze
+            branch_results, fusion_result = _settle_branches(specs, branch_results, fuser)
+            branch_timings = branch_timings_of(branch_results)
+            for r in branch_results.values():
+                if r.status == "skipped":
+                    yield _sse("branch", {
+                        "key": r.key,
+                        "label": r.label,
+                        "status": r.status,
+                        "wall_ms": None,
+                        "confidence": None,
+                    })
+            explainability, job = await _explain(frame, fusion_result, ts, uid)
+            analysis = _analysis_from(branch_results, fusion_result, explainability)
+            if cache is not None and cache_key:
+                cache_write = functools.partial(
+                    _cache_analysis, cache, cache_key, analysis, job
+                )
+
+        yield _sse("fusion", _fusion_event(
+            analysis["fusion_result"], list(analysis["branches"]), provisional=False
+        ))
+        response_payload = await _finalize(
+            uid, ts, file.filename, gcs_uri, normalization_meta,
+            analysis, branch_timings, cached is not None, writes,
+            on_uploaded=cache_write,
+        )
+        yield _sse("result", response_payload)
 
+    except Exception as e:
+        logging.exception(f"[{uid}] Streaming analyze request failed")
+        yield _sse("error", {"message": str(e)})
+
+
+@app.post("/analyze/stream")
+async def analyze_stream(file: UploadFile = File(...)):
+    """
+    POST /analyze as server-sent events: each branch is reported as
+    soon as it finishes, with a provisional fusion over the branches
+    completed so far.
+    """
+    ts = int(time.time())
+    uid = str(uuid.uuid4())
+    logging.info(f"[{uid}] Streaming analyze request started")
+
+    try:
+        prepared = _ingest(file, ts, uid)
+        # The upload's spool is closed once this handler returns, so the
+        # raw copy must be finished before streaming starts
+        await asyncio.wrap_future(prepared[3][0])
     except Exception as e:
         logging.exception(f"[{uid}] Analyze request failed")
         return JSONResponse(
             {"status": "error", "message": str(e)}, status_code=500
         )
 
+    return StreamingResponse(
+        _analyze_events(file, ts, uid, prepared),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# -------------------------------------------------------------------
+# Explainability results (EXPLAIN_MODE=async)
+# -------------------------------------------------------------------
+
+@app.get("/explain/{request_id}")
+async def explain(request_id: str, wait_s: float = 0.0):
+    """
+    Explainability for an /analyze request. wait_s long-polls (capped
+    at EXPLAIN_MAX_WAIT_S) while the job is still running; 202 while
+    pending, 404 if unknown.
+    """
+    job = await explain_jobs.wait(request_id, wait_s)
+    if job is not None:
+        return JSONResponse(job.to_dict(), status_code=200 if job.done else 202)
+
+    # Submitted on another worker (or evicted from this one)
+    stored = await explain_jobs.load_stored(request_id, BUCKET_NAME)
+    if stored is not None:
+        done = stored.get("status") in explain_jobs.FINAL_STATUSES
+        return JSONResponse(stored, status_code=200 if done else 202)
+    return JSONResponse(
+        {"status": "error", "message": "Unknown request_id"}, status_code=404
+    )
+
 # -------------------------------------------------------------------
 # Feedback endpoint
 # -------------------------------------------------------------------
@@ -0,0 +1,113 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+import torch
+
+# -------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------
+
+BATCHING_ENABLED = os.environ.get("INFER_BATCHING", "true").lower() == "true"
+MAX_BATCH = int(os.environ.get("INFER_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.environ.get("INFER_MAX_WAIT_MS", "5"))
+
+# -------------------------------------------------------------------
+# Dynamic micro-batching
+# -------------------------------------------------------------------
+
+class MicroBatcher:
+    """
+    Queues single-item tensors ([1, ...]) from concurrent requests and
+    runs them through `batch_fn` as one batch.
+
+    A batch is flushed when it reaches max_batch items or when the
+    oldest item has waited max_wait_ms. batch_fn receives the stacked
+    [B, ...] tensor and must return a [B, ...] tensor / array; row i
+    goes back to caller i. All calls to batch_fn happen on one worker
+    thread, but only while batching is on and only for callers that go
+    through the batcher: non-reentrant models (hooks, CAM state) still
+    need their own lock.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn,
+        max_batch: int = MAX_BATCH,
+        max_wait_ms: float = MAX_WAIT_MS,
+    ):
+        self.name = name
+        self._batch_fn = batch_fn
+        self._max_batch = max(1, int(max_batch))
+        self._max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # Started on first use so module-level batchers cost nothing at import
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run,
+                        name=f"batcher-{self.name}",
+                        daemon=True,
+                    )
+                    self._worker.start()
+
+    def submit(self, item: torch.Tensor) -> Future:
+        self._ensure_worker()
+        fut = Future()
+        self._queue.put((item, fut))
+        return fut
+
+    def __call__(self, item: torch.Tensor):
+        """
+        Blocking convenience: returns this caller's [1, ...] slice.
+        """
+        return self.submit(item).result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._max_wait_s
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [fut for _, fut in batch]
+            try:
+                out = self._batch_fn(torch.cat(items, dim=0))
+                for i, fut in enumerate(futures):
+                    # Copy so a caller does not pin the whole batch
+                    row = out[i: i + 1]
+                    fut.set_result(row.clone() if hasattr(row, "clone") else row.copy())
+            except Exception as e:
+                logging.exception(f"Batched {self.name} inference failed")
+                for fut in futures:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+
+def make_batched(name: str, batch_fn):
+    """
+    Returns a callable item -> result that batches across callers when
+    INFER_BATCHING is on, and calls batch_fn directly otherwise.
+    """
+    if not BATCHING_ENABLED:
+        return batch_fn
+    return MicroBatcher(name, batch_fn)
@@ -0,0 +1,128 @@
+import copy
+import logging
+import threading
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import timm
+
+from pipeline.frame import Frame
+from models.batcher import make_batched
+
+# -------------------------------------------------------------------
+# Shared ViT-Base registry (one copy per process, CPU)
+#
+# Branch A (patch-variance signature) and the Grad-CAM explainer use
+# the same backbone. Per frame, the trunk (all blocks but the last)
+# runs once without gradients; Branch A finishes the forward from the
+# cached tokens and Grad-CAM re-runs only the last block + head with
+# gradients enabled, on a private copy of the last block so its hooks
+# never fire on Branch A's pass.
+# -------------------------------------------------------------------
+
+_DEVICE = torch.device("cpu")
+
+VIT_NAME = "vit_base_patch16_224"
+VIT_SIZE = 224
+IMAGENET_MEAN = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+IMAGENET_STD = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
+
+_vit = None
+_vit_lock = threading.Lock()
+
+
+def get_vit() -> nn.Module:
+    global _vit
+    if _vit is None:
+        with _vit_lock:
+            if _vit is None:
+                logging.info("Loading shared ViT-Base backbone (CPU)")
+                vit = timm.create_model(VIT_NAME, pretrained=True)
+                vit.eval()
+                vit.to(_DEVICE)
+                _vit = vit
+    return _vit
+
+# -------------------------------------------------------------------
+# Forward pieces
+# -------------------------------------------------------------------
+
+def input_tensor(rgb_float01: np.ndarray) -> torch.Tensor:
+    """
+    RGB float [H,W,3] in [0,1] -> ImageNet-normalized [1,3,224,224].
+    """
+    x = torch.from_numpy(
+        np.ascontiguousarray(rgb_float01.transpose(2, 0, 1))
+    ).unsqueeze(0)
+    x = (x - IMAGENET_MEAN) / IMAGENET_STD
+    if x.shape[2:] != (VIT_SIZE, VIT_SIZE):
+        x = F.interpolate(
+            x,
+            size=(VIT_SIZE, VIT_SIZE),
+            mode="bilinear",
+            align_corners=False,
+        )
+    return x.to(_DEVICE)
+
+
+def trunk_forward(x: torch.Tensor) -> torch.Tensor:
+    """
+    Patch embedding + all blocks except the last. [B,3,224,224] -> [B,197,768]
+    """
+    vit = get_vit()
+    with torch.no_grad():
+        t = vit.patch_embed(x)
+        t = vit._pos_embed(t)
+        t = vit.patch_drop(t)
+        t = vit.norm_pre(t)
+        for blk in vit.blocks[:-1]:
+            t = blk(t)
+    return t
+
+
+def features_from_trunk(tokens: torch.Tensor) -> torch.Tensor:
+    """
+    Completes forward_features from trunk tokens (last block + norm).
+    """
+    vit = get_vit()
+    with torch.no_grad():
+        return vit.norm(vit.blocks[-1](tokens))
+
+
+class ViTTail(nn.Module):
+    """
+    Last block + final norm + classifier head, fed with trunk tokens.
+    Gradients through this module are all Grad-CAM needs.
+
+    With copy_block=True the last block is deep-copied, so hooks on it
+    (e.g. Grad-CAM's) are invisible to features_from_trunk.
+    """
+
+    def __init__(self, vit: nn.Module, copy_block: bool = False):
+        super().__init__()
+        self.vit = vit
+        self.block = copy.deepcopy(vit.blocks[-1]) if copy_block else vit.blocks[-1]
+
+    def forward(self, tokens: torch.Tensor) -> torch.Tensor:
+        x = self.block(tokens)
+        x = self.vit.norm(x)
+        return self.vit.forward_head(x)
+
+# -------------------------------------------------------------------
+# Per-frame shared pass
+# -------------------------------------------------------------------
+
+# Trunk passes from concurrent requests run as one batch
+_batched_trunk = make_batched("vit_trunk", trunk_forward)
+
+
+def trunk_tokens(frame: Frame) -> torch.Tensor:
+    """
+    Trunk activations for this frame, computed once and reused by
+    Branch A and Grad-CAM.
+    """
+    return frame.memo(
+        "vit_trunk",
+        lambda: _batched_trunk(input_tensor(frame.rgb_float01)),
+    )
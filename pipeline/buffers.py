@@ -0,0 +1,80 @@
+import io
+import os
+import mmap
+import logging
+
+# -------------------------------------------------------------------
+# Upload buffer: one copy of the request body, shared as views
+# -------------------------------------------------------------------
+
+class UploadBuffer:
+    """
+    Wraps the spooled temp file behind a FastAPI UploadFile without
+    reading it into a new bytes object.
+
+    - fileobj() streams the body (e.g. into GCS upload_from_file)
+    - view() is a read-only memoryview over the same storage: the
+      BytesIO buffer while spooled in memory, an mmap once rolled to disk
+
+    Views must be released before close(); close() does it for views it
+    handed out.
+    """
+
+    def __init__(self, fileobj, content_type: str | None = None):
+        self._file = fileobj
+        self.content_type = content_type
+        self._views = []
+        self._mmap = None
+
+        self._file.seek(0, os.SEEK_END)
+        self.size = self._file.tell()
+        self._file.seek(0)
+
+    @classmethod
+    def from_upload(cls, upload) -> "UploadBuffer":
+        return cls(upload.file, content_type=upload.content_type)
+
+    def fileobj(self):
+        self._file.seek(0)
+        return self._file
+
+    def _raw(self):
+        # SpooledTemporaryFile keeps a BytesIO (in memory) or a real file
+        return getattr(self._file, "_file", self._file)
+
+    def view(self) -> memoryview:
+        raw = self._raw()
+        if isinstance(raw, io.BytesIO):
+            mv = raw.getbuffer()
+        else:
+            if self._mmap is None:
+                if self.size == 0:
+                    return memoryview(b"")
+                self._mmap = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+            mv = memoryview(self._mmap)
+        ro = mv.toreadonly()
+        # Derived view first so the base can be released after it
+        self._views.extend((ro, mv))
+        return ro
+
+    def close(self):
+        for mv in self._views:
+            try:
+                mv.release()
+            except BufferError:
+                # Still exported (e.g. a live np.frombuffer array)
+                pass
+        self._views.clear()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A caller still holds a derived view; freed with it
+                logging.warning("Upload buffer mmap still referenced at close")
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
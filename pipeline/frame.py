@@ -0,0 +1,143 @@
+import threading
+import numpy as np
+import cv2
+
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    arr.flags.writeable = False
+    return arr
+
+
+class Frame:
+    """
+    Decoded normalized image shared by every branch of one request.
+
+    Carries the encoded JPEG plus the BGR uint8 array; RGB / gray / LAB
+    views are derived lazily, once, and cached. All arrays are read-only
+    so branches can share them without defensive copies.
+
+    Pickling (process-pool branches) ships only the encoded bytes; the
+    receiving process decodes once on first access. Memoized artefacts
+    are process-local.
+    """
+
+    def __init__(self, encoded: bytes, bgr: np.ndarray | None = None):
+        self._encoded = encoded
+        self._views = {}
+        self._lock = threading.RLock()
+        self._memo = {}
+        self._memo_locks = {}
+        if bgr is not None:
+            self._views["bgr"] = _readonly(bgr)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Frame":
+        return cls(data)
+
+    # -------------------------------------------------------------------
+    # Pickle support (bytes only)
+    # -------------------------------------------------------------------
+
+    def __getstate__(self):
+        return {"encoded": self._encoded}
+
+    def __setstate__(self, state):
+        self.__init__(state["encoded"])
+
+    # -------------------------------------------------------------------
+    # Lazy views
+    # -------------------------------------------------------------------
+
+    def _view(self, name: str, factory):
+        view = self._views.get(name)
+        if view is not None:
+            return view
+        with self._lock:
+            view = self._views.get(name)
+            if view is None:
+                view = _readonly(factory())
+                self._views[name] = view
+            return view
+
+    def _decode(self) -> np.ndarray:
+        bgr = cv2.imdecode(
+            np.frombuffer(self._encoded, np.uint8), cv2.IMREAD_COLOR
+        )
+        if bgr is None:
+            raise ValueError("Invalid image bytes")
+        return bgr
+
+    def memo(self, key: str, factory):
+        """
+        Per-frame memoization for derived artefacts shared across stages
+        (e.g. backbone activations). Each key is computed once; distinct
+        keys do not block each other.
+        """
+        if key in self._memo:
+            return self._memo[key]
+        with self._lock:
+            key_lock = self._memo_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._memo:
+                self._memo[key] = factory()
+            return self._memo[key]
+
+    def peek(self, key: str):
+        """
+        Memoized artefact if some stage already computed it, else None
+        (never computes).
+        """
+        return self._memo.get(key)
+
+    @property
+    def encoded(self) -> bytes:
+        return self._encoded
+
+    @property
+    def bgr(self) -> np.ndarray:
+        return self._view("bgr", self._decode)
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self._view(
+            "rgb", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB)
+        )
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self._view(
+            "gray", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        )
+
+    @property
+    def lab(self) -> np.ndarray:
+        return self._view(
+            "lab", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2LAB)
+        )
+
+    @property
+    def rgb_float01(self) -> np.ndarray:
+        return self._view(
+            "rgb_float01", lambda: self.rgb.astype(np.float32) / 255.0
+        )
+
+    @property
+    def shape(self) -> tuple:
+        return self.bgr.shape
+
+    @property
+    def height(self) -> int:
+        return int(self.bgr.shape[0])
+
+    @property
+    def width(self) -> int:
+        return int(self.bgr.shape[1])
+
+
+def as_frame(image) -> Frame:
+    """
+    Accepts a Frame or encoded image bytes (legacy callers).
+    """
+    if isinstance(image, Frame):
+        return image
+    return Frame.from_bytes(image)
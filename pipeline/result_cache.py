@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+# -------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------
+
+# Bump when branch / fusion / explainability logic changes output
+PIPELINE_VERSION = os.environ.get("PIPELINE_VERSION", "1")
+
+CACHE_ENABLED = os.environ.get("RESULT_CACHE", "true").lower() == "true"
+MEMORY_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "256"))
+MEMORY_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Optional second tier: "" (off) | "disk" | "firestore"
+TIER2 = os.environ.get("RESULT_CACHE_TIER2", "").lower()
+TIER2_TTL_S = float(os.environ.get("RESULT_CACHE_TTL_S", str(7 * 24 * 3600)))
+DISK_DIR = os.environ.get("RESULT_CACHE_DIR", "/tmp/result_cache")
+FIRESTORE_COLLECTION = "result_cache"
+
+
+def make_key(image_hash: str, config: dict) -> str:
+    """
+    Content address: normalized image hash + pipeline version + digest
+    of the request-shaping config (models, selected outputs, ...).
+    """
+    digest = hashlib.sha256(
+        json.dumps(config, sort_keys=True, default=str).encode()
+    ).hexdigest()[:12]
+    return f"v{PIPELINE_VERSION}_{digest}_{image_hash}"
+
+# -------------------------------------------------------------------
+# Tier 1: in-process LRU, bounded by entries and serialized bytes
+# -------------------------------------------------------------------
+
+class LRUCache:
+    def __init__(self, max_entries: int, max_bytes: int):
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._data = OrderedDict()   # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            self._data.move_to_end(key)
+            return hit[0]
+
+    def put(self, key: str, value, size: int):
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while (
+                len(self._data) > self._max_entries
+                or self._bytes > self._max_bytes
+            ):
+                _, (_, evicted) = self._data.popitem(last=False)
+                self._bytes -= evicted
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+# -------------------------------------------------------------------
+# Tier 2 backends (JSON documents with a cached_at stamp)
+# -------------------------------------------------------------------
+
+class DiskTier:
+    def __init__(self, root: str):
+        self._root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._root, f"{key}.json")
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, doc: dict):
+        # Write-then-rename so readers never see a partial file
+        tmp = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(doc, f)
+        os.replace(tmp, self._path(key))
+
+
+class FirestoreTier:
+    def __init__(self):
+        from google.cloud import firestore
+        self._coll = firestore.Client().collection(FIRESTORE_COLLECTION)
+
+    def get(self, key: str):
+        doc = self._coll.document(key).get()
+        return doc.to_dict() if doc.exists else None
+
+    def put(self, key: str, doc: dict):
+        self._coll.document(key).set(doc)
+
+# -------------------------------------------------------------------
+# Tiered cache
+# -------------------------------------------------------------------
+
+class ResultCache:
+    """
+    Per-image pipeline results (branches, fusion, explainability):
+    memory LRU first, then the optional disk / Firestore tier. Tier-2
+    hits are promoted to memory.
+    """
+
+    def __init__(self):
+        self._memory = LRUCache(MEMORY_MAX_ENTRIES, MEMORY_MAX_BYTES)
+        self._tier2 = None
+        self._counters = {"hits_memory": 0, "hits_tier2": 0, "misses": 0, "writes": 0}
+        self._counter_lock = threading.Lock()
+
+        try:
+            if TIER2 == "disk":
+                self._tier2 = DiskTier(DISK_DIR)
+            elif TIER2 == "firestore":
+                self._tier2 = FirestoreTier()
+        except Exception:
+            logging.exception("Result cache tier-2 init failed; memory only")
+
+    def _count(self, name: str):
+        with self._counter_lock:
+            self._counters[name] += 1
+
+    def get(self, key: str) -> dict | None:
+        value = self._memory.get(key)
+        if value is not None:
+            self._count("hits_memory")
+            return value
+
+        if self._tier2 is not None:
+            try:
+                doc = self._tier2.get(key)
+            except Exception:
+                logging.exception("Result cache tier-2 read failed")
+                doc = None
+            if doc and time.time() - doc.get("cached_at", 0) <= TIER2_TTL_S:
+                value = doc["value"]
+                self._memory.put(key, value, len(json.dumps(value)))
+                self._count("hits_tier2")
+                return value
+
+        self._count("misses")
+        return None
+
+    def put(self, key: str, value: dict):
+        size = len(json.dumps(value))
+        self._memory.put(key, value, size)
+        self._count("writes")
+
+        if self._tier2 is not None:
+            try:
+                self._tier2.put(key, {"cached_at": time.time(), "value": value})
+            except Exception:
+                logging.exception("Result cache tier-2 write failed")
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            out = dict(self._counters)
+        out.update(
+            {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory.nbytes,
+                "tier2": TIER2 or None,
+            }
+        )
+        return out
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache | None:
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache()
+    return _cache
@@ -0,0 +1,291 @@
+import os
+import time
+import asyncio
+import logging
+import functools
+import threading
+import multiprocessing
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+
+# -------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------
+
+# /analyze requests expected in flight at once; the thread pool gets
+# a slot per thread branch (A, B, C, E) for each of them
+EXPECTED_CONCURRENCY = int(os.environ.get("BRANCH_EXPECTED_CONCURRENCY", "8"))
+THREAD_BRANCHES_PER_REQUEST = 4
+THREAD_WORKERS = int(
+    os.environ.get(
+        "BRANCH_THREAD_WORKERS",
+        str(THREAD_BRANCHES_PER_REQUEST * EXPECTED_CONCURRENCY),
+    )
+)
+PROCESS_WORKERS = int(os.environ.get("BRANCH_PROCESS_WORKERS", "2"))
+# Per-branch limit on its own run time, counted from when it starts
+DEFAULT_TIMEOUT_S = float(os.environ.get("BRANCH_TIMEOUT_S", "60"))
+# Separate limit on waiting for a free pool slot
+QUEUE_TIMEOUT_S = float(os.environ.get("BRANCH_QUEUE_TIMEOUT_S", "30"))
+
+_START_POLL_S = 0.01
+
+# Fail-soft payload used whenever a branch raises or times out
+FAILED_BRANCH = {"confidence": 0.0}
+
+# -------------------------------------------------------------------
+# Branch specification
+# -------------------------------------------------------------------
+
+@dataclass
+class BranchSpec:
+    """
+    One branch dispatch.
+
+    key:      result key in the branches dict ("negative_space", ...)
+    label:    short branch label used for logs / env overrides ("D")
+    fn:       module-level callable (must be picklable for "process")
+    executor: "thread" for I/O-bound calls, "process" for CPU-bound ones
+    pick:     optional key selected from the returned dict
+    """
+    key: str
+    label: str
+    fn: Callable[..., Any]
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    executor: str = "thread"
+    timeout_s: Optional[float] = None
+    pick: Optional[str] = None
+
+    def resolved_executor(self) -> str:
+        return os.environ.get(
+            f"BRANCH_{self.label}_EXECUTOR", self.executor
+        ).lower()
+
+    def resolved_timeout(self) -> float:
+        env = os.environ.get(f"BRANCH_{self.label}_TIMEOUT_S")
+        if env:
+            return float(env)
+        if self.timeout_s is not None:
+            return float(self.timeout_s)
+        return DEFAULT_TIMEOUT_S
+
+
+@dataclass
+class BranchResult:
+    key: str
+    label: str
+    output: dict
+    status: str          # "ok" | "error" | "timeout"
+    wall_ms: float
+    queued_ms: Optional[float] = None
+    started_at: Optional[float] = None   # perf_counter when the work started
+    work: Optional[Future] = field(default=None, repr=False)
+
+    @property
+    def abandoned(self) -> bool:
+        """
+        Timed out, but the work is still running (threads and processes
+        cannot be interrupted) and holds its pool slot.
+        """
+        return self.status == "timeout" and self.work is not None and not self.work.done()
+
+# -------------------------------------------------------------------
+# Lazy bounded executors
+# -------------------------------------------------------------------
+
+_thread_pool = None
+_process_pool = None
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=THREAD_WORKERS,
+            thread_name_prefix="branch",
+        )
+    return _thread_pool
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        from pipeline.warmup import init_process_worker
+
+        # spawn: torch / gRPC state is not fork-safe
+        _process_pool = ProcessPoolExecutor(
+            max_workers=PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_process_worker,
+        )
+    return _process_pool
+
+
+def _noop():
+    return None
+
+
+def warm_process_pool():
+    """
+    Spawns every process-pool worker (running its model preload
+    initializer) before the first request needs one.
+    """
+    if PROCESS_WORKERS <= 0:
+        return
+    pool = _get_process_pool()
+    futures = [pool.submit(_noop) for _ in range(PROCESS_WORKERS)]
+    for f in futures:
+        f.result()
+
+
+def _get_executor(kind: str):
+    if kind == "process" and PROCESS_WORKERS > 0:
+        return _get_process_pool()
+    return _get_thread_pool()
+
+
+def shutdown():
+    global _thread_pool, _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pool = None
+
+# -------------------------------------------------------------------
+# Dispatch
+# -------------------------------------------------------------------
+
+# Timed-out branches whose work is still running, by label
+_abandoned = {}
+_abandoned_lock = threading.Lock()
+
+
+def _track_abandoned(label: str, work: Future, started_at: float):
+    with _abandoned_lock:
+        _abandoned[label] = _abandoned.get(label, 0) + 1
+
+    def finished(_):
+        with _abandoned_lock:
+            _abandoned[label] -= 1
+        logging.info(
+            "Abandoned branch %s finished after %.1fs",
+            label, time.perf_counter() - started_at,
+        )
+
+    work.add_done_callback(finished)
+
+
+async def _wait_started(work: Future, limit_s: float) -> float:
+    """
+    perf_counter when the pool picked the work up (for process pools:
+    when it was handed to a worker's call queue).
+    """
+    deadline = time.perf_counter() + limit_s
+    while not (work.running() or work.done()):
+        if time.perf_counter() > deadline:
+            raise asyncio.TimeoutError
+        await asyncio.sleep(_START_POLL_S)
+    return time.perf_counter()
+
+
+async def _run_one(spec: BranchSpec) -> BranchResult:
+    kind = spec.resolved_executor()
+    timeout = spec.resolved_timeout()
+
+    start = time.perf_counter()
+    started_at = None
+    status = "ok"
+    work = None
+    try:
+        call = functools.partial(spec.fn, *spec.args, **spec.kwargs)
+        work = _get_executor(kind).submit(call)
+        try:
+            started_at = await _wait_started(work, QUEUE_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            work.cancel()
+            logging.error(
+                "Branch %s waited %.1fs for a free %s slot", spec.label, QUEUE_TIMEOUT_S, kind
+            )
+            raise
+        # The branch's own time budget starts when it starts running
+        remaining = timeout - (time.perf_counter() - started_at)
+        output = await asyncio.wait_for(asyncio.wrap_future(work), timeout=max(0.0, remaining))
+        if spec.pick is not None:
+            output = output[spec.pick]
+    except asyncio.CancelledError:
+        # Consumer stopped (e.g. early exit): drop the work if still queued
+        if work is not None:
+            work.cancel()
+        raise
+    except asyncio.TimeoutError:
+        if started_at is not None:
+            # Running work cannot be interrupted; its result is discarded
+            logging.error("Branch %s timed out after %.1fs", spec.label, timeout)
+            if not work.done():
+                _track_abandoned(spec.label, work, started_at)
+        output = dict(FAILED_BRANCH)
+        status = "timeout"
+    except Exception:
+        logging.exception(f"Branch {spec.label} failed")
+        output = dict(FAILED_BRANCH)
+        status = "error"
+
+    wall_ms = (time.perf_counter() - start) * 1000.0
+    return BranchResult(
+        key=spec.key,
+        label=spec.label,
+        output=output,
+        status=status,
+        wall_ms=round(wall_ms, 1),
+        queued_ms=round((started_at - start) * 1000.0, 1) if started_at else None,
+        started_at=started_at,
+        work=work,
+    )
+
+
+def branch_timings(results: dict) -> dict:
+    """
+    {key: wall_ms}. Timed-out branches still running in their pool
+    slot are also listed under "abandoned" as {key: ms since they
+    started}.
+    """
+    timings = {k: r.wall_ms for k, r in results.items()}
+    now = time.perf_counter()
+    abandoned = {
+        k: round((now - r.started_at) * 1000.0, 1)
+        for k, r in results.items()
+        if r.abandoned
+    }
+    if abandoned:
+        timings["abandoned"] = abandoned
+    return timings
+
+
+def stats() -> dict:
+    with _abandoned_lock:
+        abandoned = {k: v for k, v in _abandoned.items() if v}
+    return {
+        "thread_workers": THREAD_WORKERS,
+        "process_workers": PROCESS_WORKERS,
+        "abandoned_running": abandoned,
+    }
+
+
+async def iter_branches(specs: list[BranchSpec]):
+    """
+    Async iterator over BranchResults in completion order (fastest
+    branch first); total latency ~ slowest branch. Never raises:
+    failed / timed-out branches yield {"confidence": 0.0}. Branches
+    still queued when the consumer stops are dropped.
+    """
+    tasks = [asyncio.ensure_future(_run_one(s)) for s in specs]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for t in tasks:
+            t.cancel()
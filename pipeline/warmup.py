@@ -0,0 +1,207 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import cv2
+
+from pipeline.frame import Frame
+
+# -------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------
+
+# Comma separated preloader names, "all", or "none".
+# "clip" is opt-in: Branch A computes it only when selected.
+DEFAULT_PRELOAD = (
+    "manuf_vit",
+    "gradcam",
+    "mediapipe_holistic",
+    "mediapipe_selfie",
+    "vertex_embeddings",
+    "imagen",
+    "branch_pools",
+    "vector_index",
+)
+
+# Models that process-pool branch workers load in their initializer.
+# Empty by default: Branch A runs in-process to share the ViT backbone;
+# set e.g. "manuf_vit" when BRANCH_A_EXECUTOR=process.
+WORKER_PRELOAD = tuple(
+    n.strip()
+    for n in os.environ.get("BRANCH_WORKER_PRELOAD", "").split(",")
+    if n.strip()
+)
+
+
+def _dummy_frame() -> Frame:
+    yy, xx = np.mgrid[0:256, 0:256]
+    bgr = np.stack([xx, yy, (xx + yy) // 2], axis=-1).astype(np.uint8)
+    ok, jpg = cv2.imencode(".jpg", bgr)
+    return Frame(jpg.tobytes(), bgr)
+
+# -------------------------------------------------------------------
+# Preloaders: load the model and push one dummy input through it
+# -------------------------------------------------------------------
+
+def _warm_clip():
+    from branch_a.clip_vit_signs import get_clip_embedding_bytes
+    if not get_clip_embedding_bytes(_dummy_frame()):
+        raise RuntimeError("CLIP warm-up inference failed")
+
+
+def _warm_manuf_vit():
+    from branch_a.clip_vit_signs import get_manufacturing_signature_bytes
+    if not get_manufacturing_signature_bytes(_dummy_frame()).get("fingerprint_id"):
+        raise RuntimeError("ViT warm-up inference failed")
+
+
+def _warm_gradcam():
+    from explainability.vit_gradcam import vit_gradcam_heatmap
+    vit_gradcam_heatmap(np.zeros((224, 224, 3), dtype=np.float32))
+
+
+def _warm_mediapipe_holistic():
+    from branch_b.mediapipe_geometry import mediapipe_geometry_from_bytes
+    out = mediapipe_geometry_from_bytes(_dummy_frame())
+    if "error" in out:
+        raise RuntimeError(out["error"])
+
+
+def _warm_mediapipe_selfie():
+    from branch_c.mask import generate_object_mask_bytes
+    generate_object_mask_bytes(_dummy_frame())
+
+
+def _warm_vertex_embeddings():
+    # Remote model: client / model handles only; a dummy call is billed
+    from branch_c import completion_embeddings
+    from branch_de import branch_e_semantic_grounding as branch_e
+
+    completion_embeddings._init_vertex()
+    completion_embeddings._get_mm_model()
+    if branch_e.PROJECT_ID:
+        branch_e._init_vertex()
+        branch_e._get_mm_model()
+
+
+def _warm_imagen():
+    from branch_c import imagen_inpaint
+    imagen_inpaint._init_vertex()
+    imagen_inpaint._get_imagen_model()
+
+
+def _warm_branch_pools():
+    from pipeline.scheduler import warm_process_pool
+    warm_process_pool()
+
+
+def _warm_vector_index():
+    # Catalog load off the request path; readiness waits for it
+    from ranking_improving import vector_index
+    vector_index.load_index()
+
+
+PRELOADERS = {
+    "clip": _warm_clip,
+    "manuf_vit": _warm_manuf_vit,
+    "gradcam": _warm_gradcam,
+    "mediapipe_holistic": _warm_mediapipe_holistic,
+    "mediapipe_selfie": _warm_mediapipe_selfie,
+    "vertex_embeddings": _warm_vertex_embeddings,
+    "imagen": _warm_imagen,
+    "branch_pools": _warm_branch_pools,
+    "vector_index": _warm_vector_index,
+}
+
+
+def preload_set() -> tuple:
+    raw = os.environ.get("PRELOAD_MODELS", ",".join(DEFAULT_PRELOAD))
+    raw = raw.strip().lower()
+    if raw == "none" or not raw:
+        return ()
+    if raw == "all":
+        return tuple(PRELOADERS)
+    names = tuple(n.strip() for n in raw.split(",") if n.strip())
+    unknown = [n for n in names if n not in PRELOADERS]
+    if unknown:
+        logging.warning("Ignoring unknown preloaders: %s", unknown)
+    return tuple(n for n in names if n in PRELOADERS)
+
+# -------------------------------------------------------------------
+# Readiness state
+# -------------------------------------------------------------------
+
+_state_lock = threading.Lock()
+_state = {"status": "cold", "models": {}}
+
+
+def is_ready() -> bool:
+    return _state["status"] == "ready"
+
+
+def status() -> dict:
+    with _state_lock:
+        return {
+            "status": _state["status"],
+            "models": {k: dict(v) for k, v in _state["models"].items()},
+        }
+
+
+def _run_preloader(name: str):
+    start = time.perf_counter()
+    try:
+        PRELOADERS[name]()
+        result = {"status": "ok"}
+    except Exception as e:
+        # Branches stay fail-soft; a failed preload does not block readiness
+        logging.exception(f"Preload {name} failed")
+        result = {"status": "error", "error": str(e)}
+    result["ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+    with _state_lock:
+        _state["models"][name] = result
+
+
+def warm(names=None):
+    """
+    Loads the selected models in parallel and flips readiness when all
+    of them have been attempted.
+    """
+    names = preload_set() if names is None else tuple(names)
+    with _state_lock:
+        _state["status"] = "warming"
+        _state["models"] = {n: {"status": "loading"} for n in names}
+
+    start = time.perf_counter()
+    if names:
+        with ThreadPoolExecutor(
+            max_workers=len(names), thread_name_prefix="warmup"
+        ) as pool:
+            list(pool.map(_run_preloader, names))
+
+    with _state_lock:
+        _state["status"] = "ready"
+    logging.info(
+        "Warm-up finished in %.1fs: %s",
+        time.perf_counter() - start,
+        {k: v["status"] for k, v in _state["models"].items()},
+    )
+
+
+def start_background():
+    threading.Thread(target=warm, name="warmup", daemon=True).start()
+
+
+def init_process_worker():
+    """
+    ProcessPoolExecutor initializer: branch workers load their own torch
+    models before taking work.
+    """
+    for name in WORKER_PRELOAD:
+        if name in ("clip", "manuf_vit"):
+            try:
+                PRELOADERS[name]()
+            except Exception:
+                logging.exception(f"Worker preload {name} failed")
@@ -6,12 +6,15 @@ from typing import Tuple
 
 
 def normalize_image(
-    data: bytes,
+    data: bytes | memoryview,
     max_side: int = 768,
 ) -> Tuple[bytes, dict]:
     """
     Identity-safe image normalization.
 
+    data may be any read-only buffer (bytes, memoryview, mmap); it is
+    decoded in place without a copy.
+
     Returns:
         normalized_image_bytes
         normalization_metadata
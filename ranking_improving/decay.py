@@ -1,5 +1,6 @@
 import math
 import time
+import numpy as np
 
 def time_decay_score(ts_now: int, ts_old: int, half_life_hours: float = 72.0) -> float:
     """
@@ -23,3 +24,22 @@ def location_consistency_score(loc_a: dict | None, loc_b: dict | None) -> float:
     if loc_a.get("city") and loc_a.get("city") == loc_b.get("city"):
         return 0.95
     return 0.30
+
+def time_decay_scores(ts_now: int, ts_old: np.ndarray, half_life_hours: float = 72.0) -> np.ndarray:
+    """
+    Vectorized time_decay_score; NaN timestamps count as "now".
+    """
+    ts_old = np.where(np.isnan(ts_old), ts_now, ts_old)
+    hours = np.maximum(0.0, ts_now - ts_old) / 3600.0
+    lam = math.log(2) / max(1e-6, half_life_hours)
+    return np.exp(-lam * hours)
+
+def location_consistency_scores(loc_q: dict | None, has_location: np.ndarray, city: np.ndarray) -> np.ndarray:
+    """
+    Vectorized location_consistency_score over candidate rows.
+    """
+    if not loc_q:
+        return np.full(has_location.shape, 0.70)
+    q_city = loc_q.get("city")
+    same = (city == q_city) if q_city else np.zeros(has_location.shape, bool)
+    return np.where(~has_location, 0.70, np.where(same, 0.95, 0.30))
@@ -18,6 +18,10 @@ def upsert_object(object_id: str, payload: dict):
     db = _get_db()
     db.collection(_COLL_OBJECTS).document(object_id).set(payload, merge=True)
 
+    # Keep the resident vector index in step with the catalog
+    from ranking_improving.vector_index import apply_upsert
+    apply_upsert(object_id, payload)
+
 def add_sighting(sighting_id: str, payload: dict):
     db = _get_db()
     db.collection(_COLL_SIGHTINGS).document(sighting_id).set(payload, merge=False)
@@ -35,3 +39,17 @@ def list_candidate_objects(limit: int = 200):
         .limit(limit)
         .stream()
     )
+
+def iter_catalog_objects():
+    """
+    Streams (object_id, fields) for the whole catalog, restricted to
+    the fields the ranker reads.
+    """
+    db = _get_db()
+    docs = (
+        db.collection(_COLL_OBJECTS)
+        .select(["embeddings", "updated_at", "object_confidence", "location"])
+        .stream()
+    )
+    for doc in docs:
+        yield doc.id, doc.to_dict() or {}
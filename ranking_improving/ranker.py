@@ -1,13 +1,118 @@
 import time
+import logging
+import numpy as np
 from ranking.object_store import list_candidate_objects
 from ranking.similarity import cosine_sim, blend_similarity
-from ranking.decay import time_decay_score, location_consistency_score
+from ranking.decay import (
+    time_decay_score,
+    location_consistency_score,
+    time_decay_scores,
+    location_consistency_scores,
+)
+from ranking_improving.vector_index import get_index
+
+_SIM_WEIGHTS = {
+    "semantic": 0.65,
+    "negative": 0.25,
+    "mfg": 0.10,
+}
+
+# sim_scores key -> embedding family
+_FAMILY_OF = {
+    "semantic": "semantic_embedding",
+    "negative": "negative_space_128d",
+    "mfg": "mfg_embedding",
+}
 
 def rank_top_k_objects(
     query_embeddings: dict,
     query_meta: dict,
     k: int = 5,
     fetch_limit: int = 200,
+) -> list:
+    """
+    Ranks the whole catalog through the resident vector index; falls
+    back to scanning the fetch_limit most recent objects without it.
+    """
+    if not query_embeddings.get("semantic_embedding"):
+        return []
+
+    index = get_index()
+    if index is not None:
+        try:
+            return _rank_with_index(index, query_embeddings, query_meta, k)
+        except Exception:
+            logging.exception("Index ranking failed; scanning Firestore")
+
+    return _rank_by_scan(query_embeddings, query_meta, k, fetch_limit)
+
+def _finalize(results: list, k: int) -> list:
+    results.sort(key=lambda x: x["match_probability"], reverse=True)
+    top = results[:k]
+
+    for i, r in enumerate(top, start=1):
+        r["rank"] = i
+
+    return top
+
+def _rank_with_index(index, query_embeddings: dict, query_meta: dict, k: int) -> list:
+    ts_now = int(query_meta.get("timestamp", time.time()))
+    q_loc = query_meta.get("location")
+
+    cand = index.search(
+        {f: query_embeddings.get(f) for f in _FAMILY_OF.values()}
+    )
+    if len(cand) == 0 or "semantic_embedding" not in cand.sims:
+        return []
+
+    # Same blend as blend_similarity: "semantic" and "negative" always
+    # count, "mfg" only when both sides carry the vector.
+    num = np.zeros(len(cand), np.float64)
+    den = np.zeros(len(cand), np.float64)
+    for key, family in _FAMILY_OF.items():
+        w = _SIM_WEIGHTS[key]
+        if family in cand.sims:
+            pres = cand.present[family]
+            num += w * np.where(pres, cand.sims[family], 0.0)
+        else:
+            pres = np.zeros(len(cand), bool)
+        if key in ("semantic", "negative"):
+            den += w
+        else:
+            den += w * pres
+    sim = num / (den + 1e-6)
+
+    tscore = time_decay_scores(ts_now, cand.updated_at, half_life_hours=72.0)
+    lscore = location_consistency_scores(q_loc, cand.has_location, cand.city)
+
+    match_prob = np.clip(
+        0.55 * sim
+        + 0.20 * cand.object_confidence
+        + 0.15 * tscore
+        + 0.10 * lscore,
+        0.0,
+        1.0,
+    )
+
+    top = np.argpartition(-match_prob, min(k, len(cand) - 1))[:k]
+
+    results = [
+        {
+            "object_id": cand.object_id(i),
+            "match_probability": round(float(match_prob[i]), 3),
+            "similarity": round(float(sim[i]), 3),
+            "location_consistency_score": round(float(lscore[i]), 3),
+            "time_decay_score": round(float(tscore[i]), 3),
+        }
+        for i in top
+    ]
+    return _finalize(results, k)
+
+def _rank_by_scan(
+    query_embeddings: dict,
+    query_meta: dict,
+    k: int,
+    fetch_limit: int,
 ) -> list:
     ts_now = int(query_meta.get("timestamp", time.time()))
     q_loc = query_meta.get("location")
@@ -42,10 +147,7 @@ def rank_top_k_objects(
                 q_mfg, emb.get("mfg_embedding")
             )
 
-        sim = blend_similarity(
-            sim_scores,
-            weights={"semantic": 0.65, "negative": 0.25, "mfg": 0.10},
-        )
+        sim = blend_similarity(sim_scores, weights=_SIM_WEIGHTS)
 
         ts_old = int(obj.get("updated_at", ts_now))
         tscore = time_decay_score(ts_now, ts_old, half_life_hours=72.0)
@@ -74,10 +176,4 @@ def rank_top_k_objects(
             }
         )
 
-    results.sort(key=lambda x: x["match_probability"], reverse=True)
-    top = results[:k]
-
-    for i, r in enumerate(top, start=1):
-        r["rank"] = i
-
-    return top
+    return _finalize(results, k)
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import logging
+
+import numpy as np
+
+from ranking_improving.vector_index import FAMILIES, VectorIndex
+
+# -------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------
+
+SHARD_DIR = os.environ.get("EMBEDDING_SHARD_DIR", "/tmp/embedding_shards")
+SHARD_DTYPE = os.environ.get("EMBEDDING_SHARD_DTYPE", "float32")  # float32 | float16
+SHARD_KEEP = int(os.environ.get("EMBEDDING_SHARD_KEEP", "2"))
+
+_CURRENT = "CURRENT"
+_LOCK = ".build.lock"
+_MANIFEST = "manifest.json"
+
+# -------------------------------------------------------------------
+# On-disk layout (one directory per generation, published atomically)
+#
+#   <root>/CURRENT                       -> "gen-<ms>"
+#   <root>/gen-<ms>/manifest.json        rows, families, dims, dtype, cities
+#   <root>/gen-<ms>/ids.npy              id column (fixed-width unicode)
+#   <root>/gen-<ms>/<family>.npy         [rows, dim] normalized matrix
+#   <root>/gen-<ms>/<family>.present.npy bool
+#   <root>/gen-<ms>/{updated_at,object_confidence,has_location,city}.npy
+#
+# Every worker np.load(mmap_mode="r")s the same files, so the page
+# cache holds one copy of the catalog per machine. Generations are
+# written compacted, so there is no tombstone file: deletes after the
+# build live in each worker's private tombstone array.
+# -------------------------------------------------------------------
+
+def _gen_dir(root: str, generation: str) -> str:
+    return os.path.join(root, generation)
+
+
+def current_generation(root: str = SHARD_DIR) -> str | None:
+    try:
+        with open(os.path.join(root, _CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_shard(index: VectorIndex, snapshot_started: float, root: str = SHARD_DIR, dtype: str = SHARD_DTYPE) -> str:
+    """
+    Writes the index's live rows (tombstones compacted away) as a new
+    generation and points CURRENT at it.
+    """
+    cols = index.export_columns()
+    n = len(cols["ids"])
+    generation = f"gen-{int(time.time() * 1000)}"
+    tmp = os.path.join(root, f".{generation}.tmp")
+    os.makedirs(tmp, exist_ok=True)
+
+    np.save(os.path.join(tmp, "ids.npy"), np.asarray(cols["ids"], dtype=str))
+    families = {}
+    for family, mat in cols["mats"].items():
+        np.save(os.path.join(tmp, f"{family}.npy"), mat.astype(dtype))
+        np.save(os.path.join(tmp, f"{family}.present.npy"), cols["present"][family])
+        families[family] = {"dim": int(mat.shape[1]), "dtype": dtype}
+
+    np.save(os.path.join(tmp, "updated_at.npy"), cols["updated_at"].astype(np.float64))
+    np.save(os.path.join(tmp, "object_confidence.npy"), cols["object_confidence"].astype(np.float32))
+    np.save(os.path.join(tmp, "has_location.npy"), cols["has_location"].astype(bool))
+
+    # City as int codes into the manifest's table (-1 = unknown)
+    cities = sorted({c for c in cols["city"] if c is not None})
+    code_of = {c: i for i, c in enumerate(cities)}
+    codes = np.fromiter(
+        (code_of.get(c, -1) if c is not None else -1 for c in cols["city"]),
+        dtype=np.int32,
+        count=n,
+    )
+    np.save(os.path.join(tmp, "city.npy"), codes)
+
+    manifest = {
+        "generation": generation,
+        "created_at": time.time(),
+        "snapshot_started": snapshot_started,
+        "rows": n,
+        "families": families,
+        "cities": cities,
+    }
+    with open(os.path.join(tmp, _MANIFEST), "w") as f:
+        json.dump(manifest, f)
+
+    os.replace(tmp, _gen_dir(root, generation))
+    pointer = os.path.join(root, f".{_CURRENT}.tmp")
+    with open(pointer, "w") as f:
+        f.write(generation)
+    os.replace(pointer, os.path.join(root, _CURRENT))
+
+    _prune(root, keep=SHARD_KEEP)
+    return generation
+
+
+def _prune(root: str, keep: int):
+    # Open mmaps keep unlinked files alive, so old readers are unaffected
+    gens = sorted(d for d in os.listdir(root) if d.startswith("gen-"))
+    for d in gens[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(root, d), ignore_errors=True)
+
+
+def open_generation(generation: str, root: str = SHARD_DIR) -> tuple:
+    """
+    -> (read-only VectorIndex over memory-mapped columns, manifest)
+    """
+    gdir = _gen_dir(root, generation)
+    with open(os.path.join(gdir, _MANIFEST)) as f:
+        manifest = json.load(f)
+    def mm(name):
+        return np.load(os.path.join(gdir, f"{name}.npy"), mmap_mode="r")
+
+    city_table = np.array(list(manifest["cities"]) + [None], dtype=object)
+    cols = {
+        "ids": mm("ids"),
+        "mats": {f: mm(f) for f in manifest["families"]},
+        "present": {f: mm(f"{f}.present") for f in manifest["families"]},
+        "updated_at": mm("updated_at"),
+        "object_confidence": mm("object_confidence"),
+        "has_location": mm("has_location"),
+        # -1 indexes the trailing None
+        "city": city_table[np.asarray(mm("city"))],
+    }
+    return VectorIndex.from_columns(cols), manifest
+
+
+def open_current(root: str = SHARD_DIR) -> tuple | None:
+    generation = current_generation(root)
+    if generation is None:
+        return None
+    return open_generation(generation, root)
+
+# -------------------------------------------------------------------
+# Rebuild / compaction from Firestore
+# -------------------------------------------------------------------
+
+def build_from_firestore(root: str = SHARD_DIR, wait: bool = False) -> str | None:
+    """
+    Streams the catalog into a fresh generation. One builder per
+    machine: with wait=False a worker that finds another build running
+    returns None instead of duplicating it.
+    """
+    from ranking_improving.object_store import iter_catalog_objects
+
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, _LOCK), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return None
+        try:
+            if wait and current_generation(root) is not None:
+                # Another worker finished the first build while we waited
+                return current_generation(root)
+
+            start = time.perf_counter()
+            snapshot_started = time.time()
+            index = VectorIndex()
+            for object_id, obj in iter_catalog_objects():
+                index.upsert(object_id, obj)
+            generation = write_shard(index, snapshot_started, root)
+            logging.info(
+                "Embedding shard %s written: %d objects in %.1fs",
+                generation, len(index), time.perf_counter() - start,
+            )
+            return generation
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def shard_age_s(manifest: dict) -> float:
+    return time.time() - manifest.get("created_at", 0)
+
+
+__all__ = [
+    "FAMILIES",
+    "build_from_firestore",
+    "current_generation",
+    "open_current",
+    "open_generation",
+    "shard_age_s",
+    "write_shard",
+]
@@ -0,0 +1,717 @@
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+# -------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------
+
+FAMILIES = (
+    "semantic_embedding",
+    "negative_space_128d",
+    "mfg_embedding",
+)
+
+INDEX_ENABLED = os.environ.get("VECTOR_INDEX", "true").lower() == "true"
+INDEX_MODE = os.environ.get("VECTOR_INDEX_MODE", "exact")  # exact | ivf
+REFRESH_S = float(os.environ.get("VECTOR_INDEX_REFRESH_S", "600"))
+# Minimum gap between load attempts after a failed load
+RETRY_S = float(os.environ.get("VECTOR_INDEX_RETRY_S", "60"))
+
+# Serve from a memory-mapped shard (ranking_improving.shard_store)
+# shared by all workers; off = every worker builds from Firestore
+SHARD_STORE = os.environ.get("EMBEDDING_SHARDS", "true").lower() == "true"
+SHARD_POLL_S = float(os.environ.get("EMBEDDING_SHARD_POLL_S", "30"))
+
+IVF_MIN_ROWS = int(os.environ.get("VECTOR_INDEX_IVF_MIN_ROWS", "50000"))
+IVF_NPROBE = int(os.environ.get("VECTOR_INDEX_IVF_NPROBE", "8"))
+IVF_TRAIN_ITERS = 10
+
+_EPS = 1e-6
+
+
+def _normalize(vec) -> np.ndarray:
+    # Same epsilon convention as similarity.cosine_sim
+    v = np.asarray(vec, dtype=np.float32).ravel()
+    return v / (np.linalg.norm(v) + _EPS)
+
+
+def _matvec(mat: np.ndarray, q: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """
+    mat @ q in float32; float16 shards are upcast chunk by chunk since
+    numpy has no BLAS path for half precision.
+    """
+    if mat.dtype == np.float32:
+        return mat @ q
+    out = np.empty(mat.shape[0], np.float32)
+    for i in range(0, mat.shape[0], chunk):
+        out[i: i + chunk] = mat[i: i + chunk].astype(np.float32) @ q
+    return out
+
+
+def _as_float(value, default=np.nan) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+# -------------------------------------------------------------------
+# Search result (struct of arrays over candidate rows)
+# -------------------------------------------------------------------
+
+class _ChainedIds:
+    """
+    Id lookup over two indexes' id lists; rows >= offset belong to the
+    second.
+    """
+
+    def __init__(self, first, offset: int, second):
+        self._first = first
+        self._offset = offset
+        self._second = second
+
+    def __getitem__(self, row: int):
+        if row < self._offset:
+            return self._first[row]
+        return self._second[row - self._offset]
+
+
+@dataclass
+class Candidates:
+    rows: np.ndarray                 # index rows; ids via object_id()
+    id_table: Any                    # row -> object id (the index's id list)
+    sims: dict                       # family -> cosine similarity
+    present: dict                    # family -> bool, vector on both sides
+    updated_at: np.ndarray           # NaN when unknown
+    object_confidence: np.ndarray
+    city: np.ndarray                 # object array, None when unknown
+    has_location: np.ndarray
+
+    def __len__(self):
+        return int(self.rows.shape[0])
+
+    def object_id(self, i: int) -> str:
+        # Only the ranked top-k are mapped, never the whole id column
+        return str(self.id_table[int(self.rows[i])])
+
+# -------------------------------------------------------------------
+# Resident catalog index
+# -------------------------------------------------------------------
+
+class VectorIndex:
+    """
+    In-memory catalog of object embeddings.
+
+    Each family is a contiguous, pre-normalized float32 matrix whose
+    rows line up with the shared id column, so a query is one matmul
+    per family over the whole catalog. Rows are updated in place from
+    object_store.upsert_object; capacity grows geometrically.
+
+    mode="ivf" adds a coarse k-means quantizer over the semantic family
+    and restricts search to the nprobe nearest lists (approximate).
+    """
+
+    def __init__(self, capacity: int = 1024, mode: str = "exact"):
+        self._lock = threading.RLock()
+        self._cap = max(1, int(capacity))
+        self._n = 0
+        self._ids = []
+        self._row_of = {}
+        self._mats = {}
+        self._present = {f: np.zeros(self._cap, bool) for f in FAMILIES}
+        self._updated_at = np.full(self._cap, np.nan, np.float64)
+        self._confidence = np.full(self._cap, 0.5, np.float32)
+        self._city = np.full(self._cap, None, dtype=object)
+        self._has_loc = np.zeros(self._cap, bool)
+        self._tomb = np.zeros(self._cap, bool)
+
+        self.mode = mode
+        self._centroids = None
+        self._assign = np.full(self._cap, -1, np.int32)
+        self.loaded_at = None
+
+    def __len__(self):
+        return self._n
+
+    # ---------------------------------------------------------------
+    # Storage management
+    # ---------------------------------------------------------------
+
+    def _grow(self, need: int):
+        if need <= self._cap:
+            return
+        cap = self._cap
+        while cap < need:
+            cap *= 2
+
+        def grown(arr, fill):
+            out = np.empty((cap,) + arr.shape[1:], dtype=arr.dtype)
+            out[: self._n] = arr[: self._n]
+            out[self._n:] = fill
+            return out
+
+        self._mats = {f: grown(m, 0.0) for f, m in self._mats.items()}
+        self._present = {f: grown(p, False) for f, p in self._present.items()}
+        self._updated_at = grown(self._updated_at, np.nan)
+        self._confidence = grown(self._confidence, 0.5)
+        self._city = grown(self._city, None)
+        self._has_loc = grown(self._has_loc, False)
+        self._tomb = grown(self._tomb, False)
+        self._assign = grown(self._assign, -1)
+        self._cap = cap
+
+    def _row(self, object_id: str) -> int:
+        row = self._row_of.get(object_id)
+        if row is None:
+            self._grow(self._n + 1)
+            row = self._n
+            self._ids.append(object_id)
+            self._row_of[object_id] = row
+            self._n += 1
+        self._tomb[row] = False
+        return row
+
+    def _set_vector(self, family: str, row: int, vec):
+        if vec is None or len(vec) == 0:
+            return
+        v = _normalize(vec)
+        mat = self._mats.get(family)
+        if mat is None:
+            mat = np.zeros((self._cap, v.shape[0]), np.float32)
+            self._mats[family] = mat
+        if mat.shape[1] != v.shape[0]:
+            logging.warning(
+                "Vector index: %s dim %d != %d; skipping row",
+                family, v.shape[0], mat.shape[1],
+            )
+            return
+        mat[row] = v
+        self._present[family][row] = True
+        if family == "semantic_embedding" and self._centroids is not None:
+            self._assign[row] = int(np.argmax(self._centroids @ v))
+
+    # ---------------------------------------------------------------
+    # Updates
+    # ---------------------------------------------------------------
+
+    def upsert(self, object_id: str, payload: dict):
+        """
+        Merge-upsert with the same semantics as Firestore set(merge=True):
+        only fields present in the payload are touched.
+        """
+        with self._lock:
+            row = self._row(object_id)
+
+            emb = payload.get("embeddings") or {}
+            for family in FAMILIES:
+                if family in emb:
+                    self._set_vector(family, row, emb[family])
+
+            if "updated_at" in payload:
+                self._updated_at[row] = _as_float(payload["updated_at"])
+            if "object_confidence" in payload:
+                self._confidence[row] = _as_float(
+                    payload["object_confidence"], 0.5
+                )
+            if "location" in payload:
+                loc = payload.get("location")
+                self._has_loc[row] = bool(loc)
+                self._city[row] = loc.get("city") if loc else None
+
+    def delete(self, object_id: str):
+        """
+        Tombstones the row; it stops matching and is dropped on the next
+        shard compaction.
+        """
+        with self._lock:
+            row = self._row_of.get(object_id)
+            if row is not None:
+                self._tomb[row] = True
+
+    def __contains__(self, object_id: str) -> bool:
+        row = self._row_of.get(object_id)
+        return row is not None and not self._tomb[row]
+
+    def row_payload(self, object_id: str) -> dict | None:
+        """
+        The row as an upsert payload (normalized vectors), for seeding
+        a delta layer.
+        """
+        with self._lock:
+            row = self._row_of.get(object_id)
+            if row is None or self._tomb[row]:
+                return None
+            city = self._city[row]
+            return {
+                "embeddings": {
+                    f: self._mats[f][row].astype(np.float32)
+                    for f in FAMILIES
+                    if f in self._mats and self._present[f][row]
+                },
+                "updated_at": float(self._updated_at[row]),
+                "object_confidence": float(self._confidence[row]),
+                "location": {"city": city} if self._has_loc[row] else None,
+            }
+
+    # ---------------------------------------------------------------
+    # Columnar export / import (ranking_improving.shard_store)
+    # ---------------------------------------------------------------
+
+    def export_columns(self) -> dict:
+        """
+        Live rows only (tombstones compacted away), trimmed to size.
+        """
+        with self._lock:
+            keep = np.flatnonzero(~self._tomb[: self._n])
+            return {
+                "ids": np.asarray(self._ids, dtype=object)[keep],
+                "mats": {f: m[keep] for f, m in self._mats.items()},
+                "present": {f: p[keep] for f, p in self._present.items()},
+                "updated_at": self._updated_at[keep],
+                "object_confidence": self._confidence[keep],
+                "city": self._city[keep],
+                "has_location": self._has_loc[keep],
+            }
+
+    @classmethod
+    def from_columns(cls, cols: dict, tombstones: np.ndarray | None = None) -> "VectorIndex":
+        """
+        Read-only index over existing columns (e.g. memory-mapped shard
+        matrices); nothing is copied except the id lookup, built once
+        per generation here rather than per query.
+        """
+        ids = cols["ids"]
+        n = len(ids)
+        index = cls(capacity=max(1, n), mode="exact")
+        index._n = n
+        index._cap = n
+        index._ids = [str(oid) for oid in ids]
+        index._row_of = {oid: i for i, oid in enumerate(index._ids)}
+        index._mats = dict(cols["mats"])
+        index._present = {
+            f: np.asarray(cols["present"].get(f, np.zeros(n, bool)))
+            for f in FAMILIES
+        }
+        index._updated_at = np.asarray(cols["updated_at"])
+        index._confidence = np.asarray(cols["object_confidence"])
+        index._city = cols["city"]
+        index._has_loc = np.asarray(cols["has_location"])
+        index._tomb = (
+            np.array(tombstones, dtype=bool) if tombstones is not None
+            else np.zeros(n, bool)
+        )
+        index._assign = np.full(n, -1, np.int32)
+        return index
+
+    def build_ivf(self, n_lists: int | None = None):
+        """
+        Trains the coarse quantizer (spherical k-means) on the semantic
+        family. No-op for small catalogs, which stay exact.
+        """
+        with self._lock:
+            mat = self._mats.get("semantic_embedding")
+            pres = self._present["semantic_embedding"][: self._n]
+            if mat is None or pres.sum() < IVF_MIN_ROWS:
+                self._centroids = None
+                return
+
+            data = mat[: self._n][pres]
+            n_lists = min(
+                n_lists or int(np.sqrt(data.shape[0])), data.shape[0]
+            )
+            rng = np.random.default_rng(0)
+            cent = data[rng.choice(data.shape[0], n_lists, replace=False)]
+
+            for _ in range(IVF_TRAIN_ITERS):
+                labels = np.argmax(data @ cent.T, axis=1)
+                sums = np.zeros_like(cent)
+                np.add.at(sums, labels, data)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                empty = norms[:, 0] == 0
+                cent = np.where(empty[:, None], cent, sums / (norms + _EPS))
+
+            self._centroids = cent.astype(np.float32)
+            assign = np.full(self._cap, -1, np.int32)
+            rows = np.flatnonzero(pres)
+            assign[rows] = np.argmax(
+                mat[rows] @ self._centroids.T, axis=1
+            )
+            self._assign = assign
+
+    # ---------------------------------------------------------------
+    # Search
+    # ---------------------------------------------------------------
+
+    def search(self, queries: dict, nprobe: int = IVF_NPROBE) -> Candidates:
+        """
+        Scores every catalog row holding a semantic embedding.
+
+        queries: family -> query vector (missing / empty = unused).
+        Returns cosine similarity per family for all candidate rows.
+        """
+        with self._lock:
+            n = self._n
+            rows_mask = self._present["semantic_embedding"][:n] & ~self._tomb[:n]
+            probed = False
+
+            q_sem = queries.get("semantic_embedding")
+            if (
+                self.mode == "ivf"
+                and self._centroids is not None
+                and q_sem is not None
+                and len(q_sem) == self._centroids.shape[1]
+            ):
+                probe = np.argsort(
+                    -(self._centroids @ _normalize(q_sem))
+                )[:nprobe]
+                rows_mask &= np.isin(self._assign[:n], probe)
+                probed = True
+
+            rows = np.flatnonzero(rows_mask)
+
+            sims = {}
+            present = {}
+            for family, q in queries.items():
+                mat = self._mats.get(family)
+                if q is None or len(q) == 0 or mat is None:
+                    continue
+                if len(q) != mat.shape[1]:
+                    logging.warning(
+                        "Vector index: query %s dim %d != %d",
+                        family, len(q), mat.shape[1],
+                    )
+                    continue
+                if probed:
+                    # Gather only the probed rows
+                    sims[family] = _matvec(mat[rows], _normalize(q))
+                else:
+                    # One matmul over the contiguous block, then select
+                    sims[family] = _matvec(mat[:n], _normalize(q))[rows]
+                present[family] = self._present[family][rows]
+
+            return Candidates(
+                rows=rows,
+                id_table=self._ids,
+                sims=sims,
+                present=present,
+                updated_at=self._updated_at[rows],
+                object_confidence=self._confidence[rows],
+                city=self._city[rows],
+                has_location=self._has_loc[rows],
+            )
+
+# -------------------------------------------------------------------
+# Base segment + delta (memory-mapped shard underneath live updates)
+# -------------------------------------------------------------------
+
+def _concat_candidates(a: Candidates, b: Candidates) -> Candidates:
+    if len(a) == 0:
+        return b
+    if len(b) == 0:
+        return a
+    sims, present = {}, {}
+    for family in set(a.sims) | set(b.sims):
+        parts_s, parts_p = [], []
+        for c in (a, b):
+            if family in c.sims:
+                parts_s.append(c.sims[family])
+                parts_p.append(c.present[family])
+            else:
+                parts_s.append(np.zeros(len(c), np.float32))
+                parts_p.append(np.zeros(len(c), bool))
+        sims[family] = np.concatenate(parts_s)
+        present[family] = np.concatenate(parts_p)
+    # a's rows all lie below len(a.id_table); b's are shifted past it
+    offset = len(a.id_table)
+    return Candidates(
+        rows=np.concatenate([a.rows, b.rows + offset]),
+        id_table=_ChainedIds(a.id_table, offset, b.id_table),
+        sims=sims,
+        present=present,
+        updated_at=np.concatenate([a.updated_at, b.updated_at]),
+        object_confidence=np.concatenate([a.object_confidence, b.object_confidence]),
+        city=np.concatenate([a.city, b.city]),
+        has_location=np.concatenate([a.has_location, b.has_location]),
+    )
+
+
+class LayeredIndex:
+    """
+    Read-only base segment (shard_store mmap) plus an in-memory delta
+    VectorIndex. An object written after the shard was built moves to
+    the delta (seeded from its base row, so partial upserts still merge)
+    and its base row is tombstoned.
+    """
+
+    def __init__(self, base: VectorIndex, delta: VectorIndex | None = None, manifest: dict | None = None):
+        manifest = manifest or {}
+        self.base = base
+        self.delta = delta or VectorIndex(mode=INDEX_MODE)
+        self.manifest = manifest
+        self.generation = manifest.get("generation")
+        self.built_at = manifest.get("created_at", time.time())
+        self.snapshot_started = manifest.get("snapshot_started", self.built_at)
+        self.loaded_at = time.time()   # last generation check
+        self._lock = threading.RLock()
+        self._touched = {}   # object_id -> wall time of last delta write
+
+    def __len__(self):
+        return len(self.base) + len(self.delta)
+
+    def upsert(self, object_id: str, payload: dict):
+        with self._lock:
+            if object_id not in self.delta and object_id in self.base:
+                seed = self.base.row_payload(object_id)
+                if seed is not None:
+                    self.delta.upsert(object_id, seed)
+                self.base.delete(object_id)
+            self.delta.upsert(object_id, payload)
+            self._touched[object_id] = time.time()
+
+    def delete(self, object_id: str):
+        with self._lock:
+            self.base.delete(object_id)
+            self.delta.delete(object_id)
+
+    def search(self, queries: dict, nprobe: int = IVF_NPROBE) -> Candidates:
+        with self._lock:
+            return _concat_candidates(
+                self.base.search(queries, nprobe),
+                self.delta.search(queries, nprobe),
+            )
+
+    def carry_delta(self, newer: "LayeredIndex", since: float):
+        """
+        Replays rows written at or after `since` (the newer shard's
+        snapshot start) into a freshly opened generation. Rows are full
+        merged payloads, so replay order does not matter; rows the newer
+        index already saw a later write for are left alone.
+        """
+        with self._lock:
+            for object_id, touched in list(self._touched.items()):
+                if touched < since or newer._touched.get(object_id, 0) >= touched:
+                    continue
+                payload = self.delta.row_payload(object_id)
+                if payload is not None:
+                    newer.upsert(object_id, payload)
+                    newer._touched[object_id] = touched
+
+# -------------------------------------------------------------------
+# Process-wide index (background load + periodic full refresh)
+# -------------------------------------------------------------------
+
+_index = None
+_index_lock = threading.Lock()
+_load_lock = threading.Lock()
+_loading = False
+_load_failed_at = None   # monotonic time of the last failed load
+_refreshing = False
+_pending = None   # upserts seen while a (re)build is streaming
+
+
+def _build_from_firestore() -> VectorIndex:
+    global _pending
+    from ranking_improving.object_store import iter_catalog_objects
+
+    start = time.perf_counter()
+    _pending = []
+    try:
+        index = VectorIndex(mode=INDEX_MODE)
+        for object_id, obj in iter_catalog_objects():
+            index.upsert(object_id, obj)
+        if INDEX_MODE == "ivf":
+            index.build_ivf()
+        index.loaded_at = time.time()
+    finally:
+        # Replay writes that raced with the stream
+        pending, _pending = _pending, None
+    for object_id, payload in pending:
+        index.upsert(object_id, payload)
+
+    logging.info(
+        "Vector index loaded: %d objects in %.1fs",
+        len(index), time.perf_counter() - start,
+    )
+    return index
+
+
+def _open_shard(wait_for_build: bool) -> LayeredIndex | None:
+    from ranking_improving import shard_store
+
+    opened = shard_store.open_current()
+    if opened is None and wait_for_build:
+        # First worker on the machine builds; the rest block on its lock
+        shard_store.build_from_firestore(wait=True)
+        opened = shard_store.open_current()
+    if opened is None:
+        return None
+    base, manifest = opened
+    logging.info(
+        "Vector index: shard %s mapped (%d objects)",
+        manifest["generation"], len(base),
+    )
+    return LayeredIndex(base, manifest=manifest)
+
+
+def _load_index():
+    global _pending
+    if SHARD_STORE:
+        _pending = []
+        try:
+            index = _open_shard(wait_for_build=True)
+        except Exception:
+            logging.exception("Vector index shard load failed; building from Firestore")
+            index = None
+        finally:
+            pending, _pending = _pending, None
+        if index is not None:
+            for object_id, payload in pending:
+                index.upsert(object_id, payload)
+            return index
+    return _build_from_firestore()
+
+
+def _swap_to(current: LayeredIndex, newer: LayeredIndex) -> LayeredIndex:
+    global _index
+    current.carry_delta(newer, since=newer.snapshot_started)
+    _index = newer
+    # Writes that landed on the old index while we swapped
+    current.carry_delta(newer, since=newer.snapshot_started)
+    return newer
+
+
+def _refresh_shard(current: LayeredIndex) -> LayeredIndex:
+    """
+    Switches to a newer generation when one was published (carrying
+    recent delta rows across); otherwise rebuilds once the published
+    shard is older than REFRESH_S (one worker per machine does the
+    work).
+    """
+    from ranking_improving import shard_store
+
+    current.loaded_at = time.time()
+    if shard_store.current_generation() == current.generation:
+        if REFRESH_S <= 0 or shard_store.shard_age_s(current.manifest) <= REFRESH_S:
+            return current
+        # None: another worker holds the build lock; a later poll
+        # picks its generation up
+        if shard_store.build_from_firestore() in (None, current.generation):
+            return current
+
+    newer = _open_shard(wait_for_build=False)
+    if newer is None or newer.generation == current.generation:
+        return current
+    return _swap_to(current, newer)
+
+
+def _refresh_in_background():
+    global _index, _refreshing
+
+    def work():
+        global _index, _refreshing
+        try:
+            current = _index
+            if isinstance(current, LayeredIndex):
+                _refresh_shard(current)
+            else:
+                _index = _build_from_firestore()
+        except Exception:
+            logging.exception("Vector index refresh failed")
+        finally:
+            _refreshing = False
+
+    with _index_lock:
+        if _refreshing:
+            return
+        _refreshing = True
+    threading.Thread(target=work, name="vector-index", daemon=True).start()
+
+
+def _backing_off() -> bool:
+    failed_at = _load_failed_at
+    return failed_at is not None and time.monotonic() - failed_at < RETRY_S
+
+
+def load_index() -> VectorIndex | LayeredIndex | None:
+    """
+    Blocking first load (warm-up, or the background loader). Raises on
+    failure; within RETRY_S of a failed load it returns None instead of
+    trying again.
+    """
+    global _index, _load_failed_at
+    if not INDEX_ENABLED:
+        return None
+    with _load_lock:
+        if _index is None and not _backing_off():
+            try:
+                _index = _load_index()
+            except Exception:
+                _load_failed_at = time.monotonic()
+                raise
+            _load_failed_at = None
+    return _index
+
+
+def _load_in_background():
+    global _loading
+
+    def work():
+        global _loading
+        try:
+            load_index()
+        except Exception:
+            logging.exception("Vector index load failed; retrying in %.0fs", RETRY_S)
+        finally:
+            _loading = False
+
+    with _index_lock:
+        if _loading or _index is not None:
+            return
+        _loading = True
+    threading.Thread(target=work, name="vector-index-load", daemon=True).start()
+
+
+def get_index() -> VectorIndex | LayeredIndex | None:
+    """
+    Returns the resident index without ever blocking on a load: None
+    (callers fall back to a Firestore scan) until the background load
+    finishes. Stale indexes keep serving while a rebuild runs. None if
+    disabled / unavailable.
+    """
+    if not INDEX_ENABLED:
+        return None
+
+    if _index is None:
+        if not _backing_off():
+            _load_in_background()
+        return None
+    elif isinstance(_index, LayeredIndex):
+        if time.time() - _index.loaded_at > SHARD_POLL_S:
+            _refresh_in_background()
+    elif REFRESH_S > 0 and time.time() - _index.loaded_at > REFRESH_S:
+        _refresh_in_background()
+
+    return _index
+
+
+def apply_upsert(object_id: str, payload: dict):
+    """
+    Incremental update hook for object_store.upsert_object. Does not
+    trigger a load; an unloaded index picks the write up when it loads.
+    """
+    pending = _pending
+    if pending is not None:
+        pending.append((object_id, payload))
+
+    index = _index
+    if index is None:
+        return
+    try:
+        index.upsert(object_id, payload)
+    except Exception:
+        logging.exception("Vector index update failed")
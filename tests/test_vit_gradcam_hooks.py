@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+timm = pytest.importorskip("timm")
+pytest.importorskip("pytorch_grad_cam")
+
+from models import vit_backbone
+from explainability import vit_gradcam
+
+
+@pytest.fixture
+def small_vit(monkeypatch):
+    # Random weights: the test is about hooks, not heatmap quality
+    vit = timm.create_model(vit_backbone.VIT_NAME, pretrained=False).eval()
+    monkeypatch.setattr(vit_backbone, "_vit", vit)
+    monkeypatch.setattr(vit_gradcam, "_tail", None)
+    return vit
+
+
+def test_branch_a_tail_runs_while_cam_in_flight(small_vit):
+    tokens = vit_backbone.trunk_forward(torch.rand(1, 3, 224, 224))
+    expected = vit_backbone.features_from_trunk(tokens)
+
+    tail = vit_gradcam._get_tail()
+    in_cam = threading.Event()
+    release = threading.Event()
+    hooked = tail.block.norm1
+
+    # Hold the CAM inside its forward so Branch A runs with the hooks live
+    def stall(module, inputs, output):
+        in_cam.set()
+        release.wait(10)
+
+    stall_handle = hooked.register_forward_hook(stall)
+    result = {}
+
+    def run_cam():
+        result["cam"] = vit_gradcam._cam_batch(tokens.detach())
+
+    t = threading.Thread(target=run_cam)
+    t.start()
+    try:
+        assert in_cam.wait(10)
+        # The CAM's activation hook is live on the private copy only
+        assert len(hooked._forward_hooks) >= 2
+        assert not small_vit.blocks[-1].norm1._forward_hooks
+
+        for _ in range(3):
+            got = vit_backbone.features_from_trunk(tokens)
+            assert torch.allclose(got, expected)
+    finally:
+        release.set()
+        t.join(30)
+        stall_handle.remove()
+
+    assert result["cam"].shape == (1, vit_backbone.VIT_SIZE, vit_backbone.VIT_SIZE)
+    # Released on exit: nothing left to accumulate activations
+    assert not hooked._forward_hooks
+    assert not small_vit.blocks[-1].norm1._forward_hooks
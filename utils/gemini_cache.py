@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+# -------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------
+
+CACHE_ENABLED = os.environ.get("GEMINI_CACHE", "true").lower() == "true"
+CACHE_PATH = os.environ.get("GEMINI_CACHE_PATH", "/tmp/gemini_cache.sqlite3")
+CACHE_TTL_S = float(os.environ.get("GEMINI_CACHE_TTL_S", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get("GEMINI_CACHE_MAX_ENTRIES", "20000"))
+
+# Evict in batches so the common put path stays a single insert
+_EVICT_SLACK = max(1, CACHE_MAX_ENTRIES // 20)
+
+
+def _digest(data) -> str:
+    if isinstance(data, str):
+        data = data.encode()
+    elif not isinstance(data, (bytes, bytearray, memoryview)):
+        data = json.dumps(data, sort_keys=True, default=str).encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(
+    image_bytes: bytes,
+    model: str,
+    prompt_template: str,
+    config: dict | None = None,
+    context=None,
+) -> str:
+    """
+    (image hash, model, prompt template + generation config, context digest)
+    """
+    return ":".join(
+        (
+            _digest(image_bytes),
+            model,
+            _digest([prompt_template, config or {}])[:16],
+            _digest(context)[:16] if context is not None else "-",
+        )
+    )
+
+# -------------------------------------------------------------------
+# SQLite-backed store (survives restarts)
+# -------------------------------------------------------------------
+
+class GeminiCache:
+    """
+    Response-text memo for deterministic-enough Gemini calls. Entries
+    expire after ttl_s; above max_entries the least recently used are
+    dropped.
+    """
+
+    def __init__(self, path: str, ttl_s: float, max_entries: int):
+        self._ttl_s = ttl_s
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "writes": 0, "expired": 0, "evicted": 0}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS gemini_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS gemini_cache_accessed"
+            " ON gemini_cache (accessed_at)"
+        )
+        self._count = self._db.execute("SELECT COUNT(*) FROM gemini_cache").fetchone()[0]
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM gemini_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            value, created_at = row
+            if now - created_at > self._ttl_s:
+                self._db.execute("DELETE FROM gemini_cache WHERE key = ?", (key,))
+                self._count -= 1
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._db.execute(
+                "UPDATE gemini_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._counters["hits"] += 1
+            return value
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT OR REPLACE INTO gemini_cache VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # Approximate (replacements count too); resynced on eviction
+            self._count += 1 if cur.rowcount else 0
+            self._counters["writes"] += 1
+            if self._count > self._max_entries + _EVICT_SLACK:
+                self._evict()
+
+    def _evict(self):
+        # Caller holds the lock
+        before = self._db.execute("SELECT COUNT(*) FROM gemini_cache").fetchone()[0]
+        self._db.execute(
+            "DELETE FROM gemini_cache WHERE created_at < ?",
+            (time.time() - self._ttl_s,),
+        )
+        count = self._db.execute("SELECT COUNT(*) FROM gemini_cache").fetchone()[0]
+        excess = count - self._max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM gemini_cache WHERE key IN ("
+                " SELECT key FROM gemini_cache ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+        self._count = self._db.execute("SELECT COUNT(*) FROM gemini_cache").fetchone()[0]
+        self._counters["evicted"] += before - self._count
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._counters)
+            out["entries"] = self._count
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 4) if lookups else None
+        return out
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_gemini_cache() -> GeminiCache | None:
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = GeminiCache(CACHE_PATH, CACHE_TTL_S, CACHE_MAX_ENTRIES)
+                except Exception:
+                    logging.exception("Gemini cache init failed; caching disabled")
+                    return None
+    return _cache
+
+
+def memoized_text(key: str, generate, validate=None) -> str:
+    """
+    Returns the cached response text for key, or calls generate() and
+    stores a non-empty result. Exceptions from generate() propagate and
+    are never cached; neither is text that validate(text) rejects
+    (e.g. malformed JSON), so the next call asks Gemini again.
+    """
+    cache = get_gemini_cache()
+    if cache is not None:
+        try:
+            text = cache.get(key)
+            if text is not None:
+                return text
+        except Exception:
+            logging.exception("Gemini cache read failed")
+
+    text = generate()
+
+    if cache is not None and text and text.strip():
+        try:
+            if validate is not None and not validate(text):
+                logging.warning("Gemini response failed validation; not cached")
+                return text
+            cache.put(key, text)
+        except Exception:
+            logging.exception("Gemini cache write failed")
+    return text
+
+
+def stats() -> dict | None:
+    cache = get_gemini_cache()
+    return cache.stats() if cache is not None else None
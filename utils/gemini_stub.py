@@ -0,0 +1,50 @@
+import json
+import threading
+
+# -------------------------------------------------------------------
+# Offline stand-in for genai.Client (tests / local runs)
+#
+#   from branch_b import gemini_vision
+#   gemini_vision.set_client(StubGeminiClient({"object_type": "bag"}))
+# -------------------------------------------------------------------
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StubModels:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def generate_content(self, model, contents, config=None):
+        return self._owner._respond(model, contents, config)
+
+
+class StubGeminiClient:
+    """
+    Mimics client.models.generate_content. `response` is a dict (sent
+    as JSON), a string, or a callable (model, contents, config) -> either.
+    Every call is recorded in .calls.
+    """
+
+    def __init__(self, response=None):
+        self._response = {} if response is None else response
+        self.calls = []
+        self._lock = threading.Lock()
+        self.models = _StubModels(self)
+
+    def _respond(self, model, contents, config):
+        with self._lock:
+            self.calls.append({"model": model, "contents": contents, "config": config})
+        out = self._response
+        if callable(out):
+            out = out(model, contents, config)
+        if not isinstance(out, str):
+            out = json.dumps(out)
+        return _StubResponse(out)
+
+    @property
+    def call_count(self) -> int:
+        return len(self.calls)
@@ -0,0 +1,327 @@
+import os
+import shutil
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# -------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------
+
+# "auto" (GCS, local disk under LOCAL_DEV or when GCS init fails),
+# "gcs", "local" or "memory" (process-local, for tests)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "auto").lower()
+LOCAL_STORAGE_ROOT = os.environ.get(
+    "LOCAL_STORAGE_ROOT", os.path.join(os.getcwd(), "local_data")
+)
+
+# Resumable-upload chunk size; GCS requires a multiple of 256 KiB
+_CHUNK_UNIT = 256 * 1024
+UPLOAD_CHUNK_BYTES = max(
+    _CHUNK_UNIT,
+    int(float(os.environ.get("UPLOAD_CHUNK_MB", "8")) * 1024 * 1024)
+    // _CHUNK_UNIT * _CHUNK_UNIT,
+)
+STORAGE_IO_WORKERS = int(os.environ.get("STORAGE_IO_WORKERS", "8"))
+
+_COPY_BUFSIZE = 1024 * 1024
+
+
+def _project_id() -> str:
+    project = os.environ.get("GOOGLE_CLOUD_PROJECT")
+    if project:
+        return project
+    try:
+        import google.auth
+        _, project = google.auth.default()
+    except Exception:
+        project = None
+    return project or "unknown-project"
+
+
+def default_bucket_name() -> str:
+    bucket = os.environ.get("BUCKET_NAME")
+    return bucket or f"object-identity-images-{_project_id()}"
+
+
+def _backend_kind() -> str:
+    if STORAGE_BACKEND in ("gcs", "local", "memory"):
+        return STORAGE_BACKEND
+    if os.environ.get("LOCAL_DEV", "false").lower() == "true":
+        return "local"
+    return "gcs"
+
+
+def _as_bytes(data):
+    # upload_from_string accepts text too; mirror that for local backends
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+def _stream_size(fileobj) -> int:
+    pos = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(pos)
+    return size
+
+# -------------------------------------------------------------------
+# Pooled GCS client (one per process)
+# -------------------------------------------------------------------
+
+_gcs_client = None
+_gcs_lock = threading.Lock()
+
+
+def get_gcs_client():
+    global _gcs_client
+    if _gcs_client is None:
+        with _gcs_lock:
+            if _gcs_client is None:
+                from google.cloud import storage
+                _gcs_client = storage.Client()
+    return _gcs_client
+
+# -------------------------------------------------------------------
+# Backends
+#
+# Objects are addressed as gs://<bucket>/<name> in both backends so
+# stored URIs do not depend on where the service ran.
+# -------------------------------------------------------------------
+
+class GCSBackend:
+    kind = "gcs"
+
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+        self._bucket = get_gcs_client().bucket(bucket_name)
+
+    def uri(self, name: str) -> str:
+        return f"gs://{self.bucket_name}/{name}"
+
+    def put_stream(self, name: str, fileobj, size: int | None = None, content_type: str | None = None) -> str:
+        """
+        Streams fileobj from its start; above 8 MB the client switches
+        to a resumable upload sent in UPLOAD_CHUNK_BYTES chunks.
+        """
+        blob = self._bucket.blob(name, chunk_size=UPLOAD_CHUNK_BYTES)
+        fileobj.seek(0)
+        blob.upload_from_file(fileobj, size=size, content_type=content_type)
+        return self.uri(name)
+
+    def put_bytes(self, name: str, data, content_type: str | None = None) -> str:
+        self._bucket.blob(name).upload_from_string(data, content_type=content_type)
+        return self.uri(name)
+
+    def get(self, name: str, start: int | None = None, end: int | None = None) -> bytes:
+        """
+        Object bytes; start/end (inclusive) fetch a byte range only.
+        """
+        return self._bucket.blob(name).download_as_bytes(start=start, end=end)
+
+    def exists(self, name: str) -> bool:
+        return self._bucket.blob(name).exists()
+
+
+class LocalBackend:
+    kind = "local"
+
+    def __init__(self, bucket_name: str, root: str = LOCAL_STORAGE_ROOT):
+        self.bucket_name = bucket_name
+        self.root = os.path.join(root, bucket_name)
+        os.makedirs(self.root, exist_ok=True)
+
+    def uri(self, name: str) -> str:
+        return f"gs://{self.bucket_name}/{name}"
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name.replace("/", os.sep))
+
+    def put_stream(self, name: str, fileobj, size: int | None = None, content_type: str | None = None) -> str:
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fileobj.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(fileobj, f, _COPY_BUFSIZE)
+        return self.uri(name)
+
+    def put_bytes(self, name: str, data, content_type: str | None = None) -> str:
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so concurrent readers never see partial objects
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_as_bytes(data))
+        os.replace(tmp, path)
+        return self.uri(name)
+
+    def get(self, name: str, start: int | None = None, end: int | None = None) -> bytes:
+        with open(self.path(name), "rb") as f:
+            if start is None and end is None:
+                return f.read()
+            start = start or 0
+            f.seek(start)
+            return f.read(-1 if end is None else end - start + 1)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+
+class MemoryBackend:
+    kind = "memory"
+
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def uri(self, name: str) -> str:
+        return f"gs://{self.bucket_name}/{name}"
+
+    def put_stream(self, name: str, fileobj, size: int | None = None, content_type: str | None = None) -> str:
+        fileobj.seek(0)
+        return self.put_bytes(name, fileobj.read(), content_type)
+
+    def put_bytes(self, name: str, data, content_type: str | None = None) -> str:
+        with self._lock:
+            self._objects[name] = bytes(_as_bytes(data))
+        return self.uri(name)
+
+    def get(self, name: str, start: int | None = None, end: int | None = None) -> bytes:
+        with self._lock:
+            data = self._objects[name]
+        if start is None and end is None:
+            return data
+        return data[start or 0: None if end is None else end + 1]
+
+    def exists(self, name: str) -> bool:
+        with self._lock:
+            return name in self._objects
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(bucket_name: str | None = None):
+    """
+    Cached backend per bucket (process-wide, so every caller shares the
+    one GCS client and its connection pool). In "auto" mode a GCS init
+    failure or a missing bucket falls back to local disk instead of
+    failing requests.
+    """
+    bucket_name = bucket_name or default_bucket_name()
+    backend = _backends.get(bucket_name)
+    if backend is not None:
+        return backend
+    with _backends_lock:
+        backend = _backends.get(bucket_name)
+        if backend is None:
+            kind = _backend_kind()
+            if kind == "memory":
+                backend = MemoryBackend(bucket_name)
+            elif kind == "local":
+                backend = LocalBackend(bucket_name)
+            else:
+                try:
+                    backend = GCSBackend(bucket_name)
+                    if STORAGE_BACKEND == "auto" and get_gcs_client().lookup_bucket(bucket_name) is None:
+                        raise RuntimeError(f"GCS bucket '{bucket_name}' not found")
+                except Exception:
+                    if STORAGE_BACKEND == "gcs":
+                        raise
+                    logging.exception("GCS storage init failed; using local storage")
+                    backend = LocalBackend(bucket_name)
+            _backends[bucket_name] = backend
+    return backend
+
+# -------------------------------------------------------------------
+# Async API (blocking client calls on a shared I/O pool)
+#
+# submit_* return concurrent futures so sync code (and branches running
+# in worker threads) can start writes without waiting; the async
+# wrappers await the same futures.
+# -------------------------------------------------------------------
+
+_io_pool = None
+_io_pool_lock = threading.Lock()
+
+
+def _get_io_pool() -> ThreadPoolExecutor:
+    global _io_pool
+    if _io_pool is None:
+        with _io_pool_lock:
+            if _io_pool is None:
+                _io_pool = ThreadPoolExecutor(
+                    max_workers=max(1, STORAGE_IO_WORKERS),
+                    thread_name_prefix="storage-io",
+                )
+    return _io_pool
+
+
+def submit_put(name: str, data, content_type: str | None = None, bucket_name: str | None = None) -> Future:
+    backend = get_backend(bucket_name)
+    return _get_io_pool().submit(backend.put_bytes, name, data, content_type)
+
+
+def submit_put_stream(
+    name: str,
+    fileobj,
+    size: int | None = None,
+    content_type: str | None = None,
+    bucket_name: str | None = None,
+) -> Future:
+    backend = get_backend(bucket_name)
+    return _get_io_pool().submit(backend.put_stream, name, fileobj, size, content_type)
+
+
+async def put(name: str, data, content_type: str | None = None, bucket_name: str | None = None) -> str:
+    return await asyncio.wrap_future(submit_put(name, data, content_type, bucket_name))
+
+
+async def get(name: str, bucket_name: str | None = None, start: int | None = None, end: int | None = None) -> bytes:
+    backend = get_backend(bucket_name)
+    return await asyncio.wrap_future(
+        _get_io_pool().submit(backend.get, name, start, end)
+    )
+
+
+async def exists(name: str, bucket_name: str | None = None) -> bool:
+    backend = get_backend(bucket_name)
+    return await asyncio.wrap_future(_get_io_pool().submit(backend.exists, name))
+
+
+async def upload_file(upload, name: str, bucket_name: str | None = None) -> str:
+    """
+    Streams a FastAPI UploadFile's spooled temp file into storage
+    without reading it into memory. Returns the object URI.
+    """
+    fileobj = upload.file
+    return await asyncio.wrap_future(
+        submit_put_stream(
+            name,
+            fileobj,
+            size=_stream_size(fileobj),
+            content_type=upload.content_type,
+            bucket_name=bucket_name,
+        )
+    )
+
+
+async def upload_files(uploads: list, names: list, bucket_name: str | None = None) -> list:
+    """
+    Uploads several files concurrently (bounded by STORAGE_IO_WORKERS);
+    URIs come back in input order.
+    """
+    return list(
+        await asyncio.gather(
+            *(upload_file(u, n, bucket_name) for u, n in zip(uploads, names))
+        )
+    )
+
+
+def shutdown():
+    global _io_pool
+    if _io_pool is not None:
+        _io_pool.shutdown(wait=True)
+        _io_pool = None
@@ -1,20 +1,26 @@
-from google.cloud import storage
 import uuid
 from fastapi import UploadFile
 
-GCS_BUCKET_NAME = "object-identity-images-neat-planet-483104-t8"
+from utils import storage_io
+
+# Same bucket as /analyze (BUCKET_NAME, else object-identity-images-<project>)
+GCS_BUCKET_NAME = None
 
-async def upload_file_to_gcs(file: UploadFile) -> str:
-    client = storage.Client()
-    bucket = client.bucket(GCS_BUCKET_NAME)
 
+def _raw_name(file: UploadFile) -> str:
     # Generate a unique filename in the /raw folder
-    blob_name = f"raw/{uuid.uuid4()}_{file.filename}"
-    blob = bucket.blob(blob_name)
+    return f"raw/{uuid.uuid4()}_{file.filename}"
+
+
+async def upload_file_to_gcs(file: UploadFile) -> str:
+    # Streamed from the spooled upload through the shared client
+    return await storage_io.upload_file(file, _raw_name(file), GCS_BUCKET_NAME)
 
-    # Upload contents
-    contents = await file.read()  # read file into memory
-    blob.upload_from_string(contents, content_type=file.content_type)
 
-    # Return GCS URI
-    return f"gs://{GCS_BUCKET_NAME}/{blob_name}"
\ No newline at end of file
+async def upload_files_to_gcs(files: list[UploadFile]) -> list[str]:
+    """
+    Concurrent upload of several files; URIs in input order.
+    """
+    return await storage_io.upload_files(
+        files, [_raw_name(f) for f in files], GCS_BUCKET_NAME
+    )
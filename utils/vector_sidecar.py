@@ -0,0 +1,185 @@
+import os
+import json
+import mmap
+import struct
+import numpy as np
+
+# -------------------------------------------------------------------
+# Binary embedding sidecar (.vec)
+#
+#   [0:12]   header: magic "OIVS", version u16, entry count u16,
+#            table length u32 (little endian)
+#   [12:..]  entry table: UTF-8 JSON list of
+#            {"name", "dtype", "shape", "offset", "nbytes"}
+#   payload: arrays, each starting on a 64-byte boundary
+#
+# float32 / float16 entries are raw little-endian arrays, readable in
+# place with np.frombuffer or an mmap. Values that are not numeric
+# arrays are stored as dtype "json".
+# -------------------------------------------------------------------
+
+MAGIC = b"OIVS"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHI")
+ALIGN = 64
+
+# Ranged readers fetch this much first; covers header + typical table
+HEAD_PROBE_BYTES = 4096
+
+SIDECAR_DTYPE = os.environ.get("EMBEDDING_SIDECAR_DTYPE", "float32")
+_NUMERIC = {"float32": "<f4", "float16": "<f2"}
+
+
+def _pad(n: int) -> int:
+    return (-n) % ALIGN
+
+
+def _as_array(value, dtype: str):
+    try:
+        arr = np.asarray(value, dtype=_NUMERIC[dtype])
+    except (TypeError, ValueError):
+        return None
+    return arr if arr.ndim in (1, 2) else None
+
+
+def encode(arrays: dict, dtype: str = SIDECAR_DTYPE) -> bytes:
+    """
+    {name: vector | matrix | other JSON value} -> sidecar bytes.
+    """
+    if dtype not in _NUMERIC:
+        raise ValueError(f"Unsupported sidecar dtype: {dtype}")
+
+    blobs = []
+    entries = []
+    for name, value in arrays.items():
+        arr = _as_array(value, dtype)
+        if arr is not None:
+            data = np.ascontiguousarray(arr).tobytes()
+            entries.append({"name": name, "dtype": dtype, "shape": list(arr.shape)})
+        else:
+            data = json.dumps(value).encode("utf-8")
+            entries.append({"name": name, "dtype": "json", "shape": []})
+        blobs.append(data)
+
+    # Offsets depend on the table length, which depends on the offsets'
+    # digits; iterate until the layout is stable (normally 2 passes).
+    table = b""
+    while True:
+        offset = _HEADER.size + len(table)
+        offset += _pad(offset)
+        for entry, data in zip(entries, blobs):
+            entry["offset"] = offset
+            entry["nbytes"] = len(data)
+            offset += len(data) + _pad(len(data))
+        new_table = json.dumps(entries, separators=(",", ":")).encode("utf-8")
+        if len(new_table) == len(table):
+            table = new_table
+            break
+        table = new_table
+
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, len(entries), len(table)))
+    out += table
+    out += b"\0" * _pad(len(out))
+    for data in blobs:
+        out += data
+        out += b"\0" * _pad(len(data))
+    return bytes(out)
+
+# -------------------------------------------------------------------
+# Readers
+# -------------------------------------------------------------------
+
+def header_length(head) -> int:
+    """
+    Bytes needed (from the start) to read the entry table.
+    """
+    magic, version, _, table_len = _HEADER.unpack_from(head, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a vector sidecar")
+    if version != VERSION:
+        raise ValueError(f"Unsupported sidecar version {version}")
+    return _HEADER.size + table_len
+
+
+def read_table(buf) -> dict:
+    """
+    {name: entry} from a buffer holding at least header_length() bytes.
+    """
+    end = header_length(buf)
+    table = json.loads(bytes(memoryview(buf)[_HEADER.size:end]).decode("utf-8"))
+    return {e["name"]: e for e in table}
+
+
+def _decode(entry: dict, data):
+    if entry["dtype"] == "json":
+        return json.loads(bytes(data).decode("utf-8"))
+    arr = np.frombuffer(data, dtype=_NUMERIC[entry["dtype"]])
+    return arr.reshape(entry["shape"])
+
+
+def load(buf, name: str):
+    """
+    One named value from a whole sidecar buffer (bytes / mmap). Numeric
+    arrays are read-only views into buf, not copies.
+    """
+    entry = read_table(buf)[name]
+    start = entry["offset"]
+    return _decode(entry, memoryview(buf)[start: start + entry["nbytes"]])
+
+
+def load_all(buf) -> dict:
+    return {name: load(buf, name) for name in read_table(buf)}
+
+
+def open_local(path: str):
+    """
+    Read-only mmap of a sidecar file for load() / load_all().
+    """
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_vector(read_range, name: str):
+    """
+    Loads one named value through a ranged reader without fetching the
+    whole file. read_range(start, end) returns bytes [start, end]
+    inclusive (e.g. GCS download_as_bytes(start=, end=)).
+    """
+    head = read_range(0, HEAD_PROBE_BYTES - 1)
+    need = header_length(head)
+    if need > len(head):
+        head = read_range(0, need - 1)
+    entry = read_table(head)[name]
+    start = entry["offset"]
+    if entry["nbytes"] == 0:
+        return _decode(entry, b"")
+    return _decode(entry, read_range(start, start + entry["nbytes"] - 1))
+
+# -------------------------------------------------------------------
+# vector_ref addressing: gs://<bucket>/<object>#<name>
+# -------------------------------------------------------------------
+
+def make_ref(bucket_name: str, object_name: str, name: str) -> str:
+    return f"gs://{bucket_name}/{object_name}#{name}"
+
+
+def parse_ref(ref: str) -> tuple:
+    """
+    -> (bucket, object name, entry name)
+    """
+    if not ref.startswith("gs://") or "#" not in ref:
+        raise ValueError(f"Not a sidecar vector_ref: {ref}")
+    path, name = ref[len("gs://"):].split("#", 1)
+    bucket, object_name = path.split("/", 1)
+    return bucket, object_name, name
+
+
+def fetch_ref(ref: str):
+    """
+    Resolves a vector_ref with ranged reads through utils.storage_io.
+    """
+    from utils import storage_io
+
+    bucket, object_name, name = parse_ref(ref)
+    backend = storage_io.get_backend(bucket)
+    return read_vector(lambda s, e: backend.get(object_name, s, e), name)